@@ -0,0 +1,333 @@
+"""
+Face Artifact Store for Inpainting Pipeline
+Upload-time face preprocessing shared between the web backend and the pipeline
+
+Per source face image (keyed by content hash):
+    - InsightFace detection (bbox, 5-point kps) + 512-dim normed embedding
+    - BiSeNet segmentation map (19 labels, working resolution)
+    - Hair-only region (CLIP input for hairstyle)
+    - Working-resolution copy of the face image
+
+Layout:
+    <root>/<key[:2]>/<key>/meta.json          (written last - marks entry ready)
+    <root>/<key[:2]>/<key>/working.png
+    <root>/<key[:2]>/<key>/embedding.npy
+    <root>/<key[:2]>/<key>/segmentation.png
+    <root>/<key[:2]>/<key>/hair_region.png
+
+Usage:
+    preprocess_face_image("face.png", "artifacts/")   # CPU worker
+    artifacts = FaceArtifactStore("artifacts/").load_for_image("face.png")
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# Working copy max side (source faces are rarely useful above this)
+WORKING_MAX_SIDE = 1024
+
+# Bump when the artifact format/semantics change - old entries are recomputed
+ARTIFACT_VERSION = 1
+
+
+class FaceArtifacts:
+    """Precomputed per-face inputs consumed by AutoIDPhotoCompositor."""
+
+    def __init__(
+        self,
+        key: str,
+        working_image: Image.Image,
+        source_size: Tuple[int, int],
+        face_detected: Optional[bool] = None,
+        bbox: Optional[list] = None,
+        kps: Optional[list] = None,
+        embedding: Optional[np.ndarray] = None,
+        segmentation: Optional[np.ndarray] = None,
+        hair_region: Optional[Image.Image] = None,
+    ):
+        """
+        Args:
+            key: Content hash of the source image
+            working_image: Working-resolution RGB copy
+            source_size: Original (width, height)
+            face_detected: True/False, or None if InsightFace was unavailable
+            bbox: Face bbox (x1, y1, x2, y2) in working-image coordinates
+            kps: 5-point landmarks in working-image coordinates
+            embedding: (512,) float32 normed embedding
+            segmentation: BiSeNet label map, same size as working_image (None if unavailable)
+            hair_region: Hair-only image (None if parsing unavailable or no hair)
+        """
+        self.key = key
+        self.working_image = working_image
+        self.source_size = source_size
+        self.face_detected = face_detected
+        self.bbox = bbox
+        self.kps = kps
+        self.embedding = embedding
+        self.segmentation = segmentation
+        self.hair_region = hair_region
+
+
+class FaceArtifactStore:
+    """Content-addressed on-disk store of FaceArtifacts."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def content_key(image_path: str) -> str:
+        """sha256 of the file contents (same bytes -> same artifacts)."""
+        h = hashlib.sha256()
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def is_ready(self, key: str) -> bool:
+        meta = self._read_meta(key)
+        return meta is not None and meta.get("version") == ARTIFACT_VERSION
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        meta_path = os.path.join(self.entry_dir(key), "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, key: str) -> Optional[FaceArtifacts]:
+        """Load a ready entry, or None if missing/incomplete/stale."""
+        meta = self._read_meta(key)
+        if meta is None or meta.get("version") != ARTIFACT_VERSION:
+            return None
+
+        entry = self.entry_dir(key)
+        try:
+            working = Image.open(os.path.join(entry, "working.png")).convert("RGB")
+
+            embedding = None
+            if meta.get("has_embedding"):
+                embedding = np.load(os.path.join(entry, "embedding.npy")).astype(np.float32)
+
+            segmentation = None
+            if meta.get("has_segmentation"):
+                segmentation = np.array(Image.open(os.path.join(entry, "segmentation.png")))
+
+            hair_region = None
+            if meta.get("has_hair_region"):
+                hair_region = Image.open(os.path.join(entry, "hair_region.png")).convert("RGB")
+        except Exception as e:
+            print(f"Failed to load face artifacts {key[:12]}: {e}")
+            return None
+
+        return FaceArtifacts(
+            key=key,
+            working_image=working,
+            source_size=tuple(meta["source_size"]),
+            face_detected=meta.get("face_detected"),
+            bbox=meta.get("bbox"),
+            kps=meta.get("kps"),
+            embedding=embedding,
+            segmentation=segmentation,
+            hair_region=hair_region,
+        )
+
+    def load_for_image(self, image_path: str) -> Optional[FaceArtifacts]:
+        """Hash image_path and load its entry if ready."""
+        try:
+            key = self.content_key(image_path)
+        except OSError:
+            return None
+        return self.load(key)
+
+    def save(self, artifacts: FaceArtifacts, elapsed: float = 0.0) -> str:
+        """
+        Write an entry atomically.
+
+        Files go to a temp dir which is renamed into place; if another worker
+        finished the same key first, its entry is kept.
+
+        Returns:
+            Entry directory
+        """
+        entry = self.entry_dir(artifacts.key)
+        shard = os.path.dirname(entry)
+        os.makedirs(shard, exist_ok=True)
+
+        tmp_dir = tempfile.mkdtemp(prefix=f".{artifacts.key[:12]}_", dir=shard)
+        try:
+            # compress_level=1: these are re-read once or twice, size matters less than latency
+            artifacts.working_image.save(os.path.join(tmp_dir, "working.png"), compress_level=1)
+            if artifacts.embedding is not None:
+                np.save(os.path.join(tmp_dir, "embedding.npy"), artifacts.embedding.astype(np.float32))
+            if artifacts.segmentation is not None:
+                Image.fromarray(artifacts.segmentation.astype(np.uint8)).save(
+                    os.path.join(tmp_dir, "segmentation.png"), compress_level=1)
+            if artifacts.hair_region is not None:
+                artifacts.hair_region.save(os.path.join(tmp_dir, "hair_region.png"), compress_level=1)
+
+            meta = {
+                "version": ARTIFACT_VERSION,
+                "key": artifacts.key,
+                "source_size": list(artifacts.source_size),
+                "working_size": list(artifacts.working_image.size),
+                "face_detected": artifacts.face_detected,
+                "bbox": artifacts.bbox,
+                "kps": artifacts.kps,
+                "has_embedding": artifacts.embedding is not None,
+                "has_segmentation": artifacts.segmentation is not None,
+                "has_hair_region": artifacts.hair_region is not None,
+                "elapsed": round(elapsed, 3),
+                "created_at": time.time(),
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            if os.path.isdir(entry):
+                # Stale version or partial entry: replace
+                if self.is_ready(artifacts.key):
+                    return entry
+                shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.rename(tmp_dir, entry)
+                tmp_dir = None
+            except OSError:
+                # Lost the race to another worker - keep theirs
+                pass
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return entry
+
+
+# Per-process model cache (executor workers load models once, reuse across uploads)
+_MODELS = {}
+
+
+def _get_models(device: str = "cpu"):
+    """Lazily create FaceIDExtractor / FaceParser for this process."""
+    if device not in _MODELS:
+        from face_id import FaceIDExtractor, HAS_INSIGHTFACE
+        from face_parsing import FaceParser
+
+        extractor = FaceIDExtractor(device=device) if HAS_INSIGHTFACE else None
+        parser = FaceParser(device=device)
+        _MODELS[device] = (extractor, parser)
+    return _MODELS[device]
+
+
+def compute_face_artifacts(image_path: str, key: str, device: str = "cpu") -> FaceArtifacts:
+    """
+    Run detection, embedding, BiSeNet parsing and hair extraction on one face image.
+
+    Args:
+        image_path: Source face image path
+        key: Content hash of image_path
+        device: Inference device (backend workers use "cpu")
+
+    Returns:
+        FaceArtifacts (fields are None where a model is unavailable)
+    """
+    extractor, parser = _get_models(device)
+
+    image = Image.open(image_path).convert("RGB")
+    source_size = image.size
+
+    working = image
+    if max(image.size) > WORKING_MAX_SIDE:
+        scale = WORKING_MAX_SIDE / max(image.size)
+        working = image.resize(
+            (int(image.width * scale), int(image.height * scale)), Image.LANCZOS)
+
+    face_detected, bbox, kps, embedding = None, None, None, None
+    if extractor is not None and extractor.load():
+        face = extractor.detect_face(working)
+        face_detected = face is not None
+        if face is not None:
+            bbox = [float(v) for v in face.bbox]
+            kps = [[float(x), float(y)] for x, y in face.kps]
+            embedding = np.asarray(face.normed_embedding, dtype=np.float32)
+
+    segmentation = parser.get_segmentation(working, working.size)
+    hair_region = None
+    if segmentation is not None:
+        hair_region = parser.extract_hair_region(working, seg_map=segmentation)
+
+    return FaceArtifacts(
+        key=key,
+        working_image=working,
+        source_size=source_size,
+        face_detected=face_detected,
+        bbox=bbox,
+        kps=kps,
+        embedding=embedding,
+        segmentation=segmentation,
+        hair_region=hair_region,
+    )
+
+
+def preprocess_face_image(image_path: str, store_root: str, device: str = "cpu") -> dict:
+    """
+    Executor entry point: compute and store artifacts for one image.
+
+    Already-ready entries are not recomputed (same bytes uploaded twice).
+
+    Returns:
+        Picklable status dict: {"status", "key", "face_detected", "elapsed"[, "error"]}
+    """
+    start = time.time()
+    store = FaceArtifactStore(store_root)
+
+    try:
+        key = store.content_key(image_path)
+    except OSError as e:
+        return {"status": "failed", "key": None, "face_detected": None,
+                "elapsed": 0.0, "error": str(e)}
+
+    meta = store._read_meta(key)
+    if meta is not None and meta.get("version") == ARTIFACT_VERSION:
+        return {"status": "ready", "key": key, "face_detected": meta.get("face_detected"),
+                "elapsed": 0.0, "cached": True}
+
+    try:
+        artifacts = compute_face_artifacts(image_path, key, device=device)
+        elapsed = time.time() - start
+        store.save(artifacts, elapsed=elapsed)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "key": key, "face_detected": None,
+                "elapsed": time.time() - start, "error": str(e)}
+
+    print(f"Face artifacts ready: {key[:12]} ({elapsed:.2f}s)")
+    return {"status": "ready", "key": key, "face_detected": artifacts.face_detected,
+            "elapsed": round(elapsed, 3)}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python face_artifacts.py <face_image> <store_root>")
+        sys.exit(1)
+
+    result = preprocess_face_image(sys.argv[1], sys.argv[2])
+    print(result)
+
+    loaded = FaceArtifactStore(sys.argv[2]).load_for_image(sys.argv[1])
+    if loaded is not None:
+        print(f"Working size: {loaded.working_image.size}, face: {loaded.face_detected}, "
+              f"segmentation: {loaded.segmentation is not None}, hair: {loaded.hair_region is not None}")
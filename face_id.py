@@ -21,14 +21,25 @@ Usage:
 
 import os
 import sys
+import hashlib
+import threading
+from collections import OrderedDict
 import torch
 import numpy as np
 from PIL import Image
-from typing import Optional, Tuple, Union, Literal
+from typing import List, Optional, Sequence, Tuple, Union, Literal
+
+import ort_sessions
 
 # Face swap model type
 FaceSwapModel = Literal["insightface", "ghost"]
 
+# Analyzed source faces kept per FaceSwapper (a batch reuses one source image)
+SOURCE_FACE_CACHE_SIZE = 8
+
+# Max aligned faces per AEI-Net forward in GhostFaceSwapper.swap_many
+GHOST_MAX_BATCH = 8
+
 # InsightFace is optional
 try:
     print("[DEBUG face_id.py] Attempting to import insightface...")
@@ -60,6 +71,9 @@ class FaceSwapper:
         self.swapper = None
         self.face_analyzer = None
         self._initialized = False
+        # source image hash -> analyzed Face (LRU)
+        self._source_cache = OrderedDict()
+        self._source_cache_lock = threading.Lock()
 
     def _get_providers(self) -> list:
         """Get ONNX Runtime providers based on device."""
@@ -88,14 +102,11 @@ class FaceSwapper:
             return True
 
         try:
-            import insightface
-            from insightface.app import FaceAnalysis
-
             providers = self._get_providers()
 
-            # Initialize face analyzer
+            # Initialize face analyzer (sessions shared with other buffalo_l users in this process)
             print(f"Loading FaceSwapper on {self.device}...")
-            self.face_analyzer = FaceAnalysis(
+            self.face_analyzer = ort_sessions.face_analysis(
                 name="buffalo_l",
                 providers=providers
             )
@@ -105,7 +116,7 @@ class FaceSwapper:
             if model_path is None:
                 # Try inswapper_512 first (higher quality), fallback to 128
                 try:
-                    model_path = insightface.model_zoo.get_model(
+                    model_path = ort_sessions.get_model(
                         "inswapper_512.onnx",
                         download=True,
                         providers=providers
@@ -114,7 +125,7 @@ class FaceSwapper:
                     self._model_name = "inswapper_512"
                 except Exception:
                     print("inswapper_512 not available, using inswapper_128")
-                    model_path = insightface.model_zoo.get_model(
+                    model_path = ort_sessions.get_model(
                         "inswapper_128.onnx",
                         download=True,
                         providers=providers
@@ -122,8 +133,7 @@ class FaceSwapper:
                     self.swapper = model_path
                     self._model_name = "inswapper_128"
             else:
-                import onnxruntime as ort
-                self.swapper = insightface.model_zoo.get_model(
+                self.swapper = ort_sessions.get_model(
                     model_path,
                     providers=providers
                 )
@@ -139,66 +149,120 @@ class FaceSwapper:
             traceback.print_exc()
             return False
 
+    @staticmethod
+    def _to_rgb_array(image: Union[str, Image.Image, np.ndarray]) -> np.ndarray:
+        """Path / PIL / numpy -> RGB numpy array."""
+        if isinstance(image, str):
+            image = Image.open(image).convert("RGB")
+        if isinstance(image, Image.Image):
+            return np.array(image)
+        return image
+
+    @staticmethod
+    def _largest_face(faces):
+        return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+
+    def analyze_source(self, source_image: Union[str, Image.Image, np.ndarray]):
+        """
+        Detect and embed the source face, cached by image content.
+
+        Args:
+            source_image: Image containing the source face
+
+        Returns:
+            InsightFace Face (largest face), or None if no face was found
+        """
+        if not self.load():
+            return None
+
+        source_np = np.ascontiguousarray(self._to_rgb_array(source_image))
+        key = hashlib.sha1(source_np.tobytes()).hexdigest() + str(source_np.shape)
+
+        with self._source_cache_lock:
+            face = self._source_cache.get(key)
+            if face is not None:
+                self._source_cache.move_to_end(key)
+                return face
+
+        source_faces = self.face_analyzer.get(source_np[:, :, ::-1].copy())
+        if len(source_faces) == 0:
+            print("No face detected in source image")
+            return None
+        face = self._largest_face(source_faces)
+
+        with self._source_cache_lock:
+            self._source_cache[key] = face
+            while len(self._source_cache) > SOURCE_FACE_CACHE_SIZE:
+                self._source_cache.popitem(last=False)
+        return face
+
     def swap_face(
         self,
         target_image: Union[str, Image.Image, np.ndarray],
-        source_image: Union[str, Image.Image, np.ndarray],
-    ) -> Optional[Image.Image]:
+        source_image: Union[str, Image.Image, np.ndarray, None] = None,
+        source_face=None,
+        return_target_face: bool = False,
+    ):
         """
         Swap face from source to target image.
 
         Args:
             target_image: Image where face will be replaced
-            source_image: Image containing the source face
+            source_image: Image containing the source face (analyzed once, then cached)
+            source_face: Pre-analyzed source face from analyze_source (skips source detection)
+            return_target_face: Also return the detected target face (its bbox/kps
+                still locate the swapped face, e.g. for FaceEnhancer.enhance_roi)
 
         Returns:
             Result image with swapped face, or None if failed
+            ((result, target_face) if return_target_face)
         """
+        failed = (None, None) if return_target_face else None
         if not self.load():
-            return None
+            return failed
 
-        # Convert to numpy arrays
-        if isinstance(target_image, str):
-            target_image = Image.open(target_image).convert("RGB")
-        if isinstance(source_image, str):
-            source_image = Image.open(source_image).convert("RGB")
-
-        if isinstance(target_image, Image.Image):
-            target_np = np.array(target_image)
-        else:
-            target_np = target_image
-
-        if isinstance(source_image, Image.Image):
-            source_np = np.array(source_image)
-        else:
-            source_np = source_image
+        if source_face is None:
+            if source_image is None:
+                raise ValueError("swap_face needs source_image or source_face")
+            source_face = self.analyze_source(source_image)
+            if source_face is None:
+                return failed
 
         # Convert RGB to BGR for InsightFace
-        target_bgr = target_np[:, :, ::-1].copy()
-        source_bgr = source_np[:, :, ::-1].copy()
+        target_bgr = self._to_rgb_array(target_image)[:, :, ::-1].copy()
 
-        # Detect faces
+        # Detect target face
         target_faces = self.face_analyzer.get(target_bgr)
-        source_faces = self.face_analyzer.get(source_bgr)
-
         if len(target_faces) == 0:
             print("No face detected in target image")
-            return None
-        if len(source_faces) == 0:
-            print("No face detected in source image")
-            return None
-
-        # Get largest faces
-        target_face = max(target_faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
-        source_face = max(source_faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+            return failed
+        target_face = self._largest_face(target_faces)
 
         # Swap face
         result_bgr = self.swapper.get(target_bgr, target_face, source_face, paste_back=True)
 
         # Convert BGR back to RGB
-        result_rgb = result_bgr[:, :, ::-1]
+        result = Image.fromarray(result_bgr[:, :, ::-1])
+
+        return (result, target_face) if return_target_face else result
+
+    def swap_many(
+        self,
+        targets: Sequence[Union[str, Image.Image, np.ndarray]],
+        source_image: Union[str, Image.Image, np.ndarray],
+    ) -> List[Optional[Image.Image]]:
+        """
+        Swap one source face into several targets (e.g. all results of a batch).
 
-        return Image.fromarray(result_rgb)
+        The source is analyzed once; each target costs one detection + swap.
+
+        Returns:
+            One result per target (None where the swap failed)
+        """
+        source_face = self.analyze_source(source_image)
+        if source_face is None:
+            return [None] * len(targets)
+        return [self.swap_face(target, source_face=source_face) for target in targets]
 
 
 # Ghost Face Swap imports (optional)
@@ -236,7 +300,7 @@ class InsightFaceAligner:
     def __init__(self):
         self.face_analyzer = None
         if HAS_INSIGHTFACE:
-            self.face_analyzer = FaceAnalysis(
+            self.face_analyzer = ort_sessions.face_analysis(
                 name="buffalo_l",
                 providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
             )
@@ -317,6 +381,19 @@ class GhostFaceSwapper:
         self.arcface = None
         self.coord_handler = None
         self._initialized = False
+        # InsightFace swapper used when Ghost can't handle a face (created on first fallback)
+        self._fallback_swapper = None
+        self._fallback_failed = False  # first load failed: don't retry (download + buffalo_l) per swap
+        self._fallback_lock = threading.Lock()
+        # Swap counters by outcome (fallback reasons counted separately)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "ghost": 0,
+            "fallback_alignment": 0,
+            "fallback_embedding": 0,
+            "fallback_error": 0,
+            "fallback_failed": 0,
+        }
 
     def load(self, model_dir: str = None) -> bool:
         """
@@ -374,7 +451,7 @@ class GhostFaceSwapper:
                 # Use InsightFace as fallback for embeddings
                 print("ArcFace not found, using InsightFace for embeddings")
                 if HAS_INSIGHTFACE:
-                    self.arcface = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
+                    self.arcface = ort_sessions.face_analysis(name="buffalo_l", providers=["CPUExecutionProvider"])
                     self.arcface.prepare(ctx_id=0)
 
             # Initialize face aligner (InsightFace-based, no mxnet needed)
@@ -477,43 +554,151 @@ class GhostFaceSwapper:
 
             if target_aligned is None or source_aligned is None:
                 print("Face alignment failed, falling back to InsightFace")
-                return self._fallback_swap(target_np, source_np)
+                return self._fallback_swap(target_np, source_np, reason="alignment")
 
             # Get source face embedding
             source_embedding = self._get_face_embedding(source_aligned)
             if source_embedding is None:
                 print("Face embedding failed, falling back to InsightFace")
-                return self._fallback_swap(target_np, source_np)
-
-            # Convert aligned images to tensors
-            target_tensor = torch.from_numpy(target_aligned).permute(2, 0, 1).unsqueeze(0).float().to(self.device) / 255.0
-            target_tensor = target_tensor * 2 - 1  # Normalize to [-1, 1]
+                return self._fallback_swap(target_np, source_np, reason="embedding")
 
             # Generate swapped face
-            with torch.no_grad():
-                swapped_tensor, _ = self.generator(target_tensor, source_embedding)
-
-            # Convert back to numpy
-            swapped = ((swapped_tensor[0].permute(1, 2, 0).cpu().numpy() + 1) / 2 * 255).astype(np.uint8)
+            swapped = self._generate([target_aligned], source_embedding)[0]
 
             # Paste back to original image
             result = self._paste_back(target_np, swapped, target_matrix)
 
+            self._count("ghost")
             return Image.fromarray(result)
 
         except Exception as e:
             print(f"Ghost swap failed: {e}")
             import traceback
             traceback.print_exc()
-            return self._fallback_swap(target_np, source_np)
+            return self._fallback_swap(target_np, source_np, reason="error")
 
-    def _fallback_swap(self, target_np: np.ndarray, source_np: np.ndarray) -> Optional[Image.Image]:
+    def _generate(self, aligned_faces: List[np.ndarray], source_embedding: torch.Tensor) -> List[np.ndarray]:
+        """
+        Run AEI-Net on aligned target faces in one forward.
+
+        Args:
+            aligned_faces: Aligned RGB faces (same size)
+            source_embedding: (1, 512) source identity, broadcast across the batch
+
+        Returns:
+            Swapped aligned faces (uint8 RGB), same order
+        """
+        # (N, H, W, 3) uint8 -> (N, 3, H, W) in [-1, 1]
+        target_tensor = torch.from_numpy(np.stack(aligned_faces)).permute(0, 3, 1, 2).float().to(self.device) / 255.0
+        target_tensor = target_tensor * 2 - 1
+        embeddings = source_embedding.expand(target_tensor.shape[0], -1)
+
+        with torch.no_grad():
+            swapped_tensor, _ = self.generator(target_tensor, embeddings)
+
+        swapped = ((swapped_tensor.permute(0, 2, 3, 1).cpu().numpy() + 1) / 2 * 255).astype(np.uint8)
+        return list(swapped)
+
+    def swap_many(
+        self,
+        targets: Sequence[Union[str, Image.Image, np.ndarray]],
+        source_image: Union[str, Image.Image, np.ndarray],
+    ) -> List[Optional[Image.Image]]:
+        """
+        Swap one source face into several targets with batched AEI-Net inference.
+
+        The source is aligned and embedded once, all targets are aligned, and
+        the generator runs on stacks of up to GHOST_MAX_BATCH faces. Targets
+        that can't be aligned go through the InsightFace fallback one by one.
+
+        Returns:
+            One result per target (None where the swap failed)
+        """
+        if not self.load():
+            return [None] * len(targets)
+
+        target_nps = [np.array(FaceSwapper._to_rgb_array(t)) for t in targets]
+        source_np = np.array(FaceSwapper._to_rgb_array(source_image))
+        results: List[Optional[Image.Image]] = [None] * len(target_nps)
+
+        source_aligned, _ = self._align_face(source_np)
+        source_embedding = self._get_face_embedding(source_aligned) if source_aligned is not None else None
+        if source_embedding is None:
+            reason = "alignment" if source_aligned is None else "embedding"
+            print(f"Source face {reason} failed, falling back to InsightFace for {len(target_nps)} targets")
+            return [self._fallback_swap(t, source_np, reason=reason) for t in target_nps]
+
+        # Align every target; unalignable ones fall back individually
+        aligned = []  # (index, aligned_face, matrix)
+        for i, target_np in enumerate(target_nps):
+            target_aligned, matrix = self._align_face(target_np)
+            if target_aligned is None:
+                results[i] = self._fallback_swap(target_np, source_np, reason="alignment")
+            else:
+                aligned.append((i, target_aligned, matrix))
+
+        for start in range(0, len(aligned), GHOST_MAX_BATCH):
+            chunk = aligned[start:start + GHOST_MAX_BATCH]
+            try:
+                swapped_faces = self._generate([face for _, face, _ in chunk], source_embedding)
+            except Exception as e:
+                print(f"Ghost batch swap failed: {e}")
+                for i, _, _ in chunk:
+                    results[i] = self._fallback_swap(target_nps[i], source_np, reason="error")
+                continue
+
+            for (i, _, matrix), swapped in zip(chunk, swapped_faces):
+                results[i] = Image.fromarray(self._paste_back(target_nps[i], swapped, matrix))
+                self._count("ghost")
+
+        return results
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _get_fallback_swapper(self) -> Optional["FaceSwapper"]:
+        """Lazily create the InsightFace fallback once and keep it for the life of this swapper."""
+        with self._fallback_lock:
+            if self._fallback_swapper is None and not self._fallback_failed:
+                swapper = FaceSwapper(device=self.device)
+                if swapper.load():
+                    self._fallback_swapper = swapper
+                else:
+                    print("InsightFace fallback unavailable; not retrying")
+                    self._fallback_failed = True
+            return self._fallback_swapper
+
+    def _fallback_swap(
+        self,
+        target_np: np.ndarray,
+        source_np: np.ndarray,
+        reason: str = "error",
+    ) -> Optional[Image.Image]:
         """Fallback to InsightFace if Ghost fails."""
-        if HAS_INSIGHTFACE:
-            print("Using InsightFace fallback...")
-            fallback = FaceSwapper(device=self.device)
-            return fallback.swap_face(target_np, source_np)
-        return None
+        self._count(f"fallback_{reason}")
+        if not HAS_INSIGHTFACE:
+            self._count("fallback_failed")
+            return None
+
+        print(f"Using InsightFace fallback ({reason})...")
+        fallback = self._get_fallback_swapper()
+        result = fallback.swap_face(target_np, source_np) if fallback is not None else None
+        if result is None:
+            self._count("fallback_failed")
+        return result
+
+    def fallback_stats(self) -> dict:
+        """Swap counters plus the share of swaps that went to the InsightFace fallback."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        fallbacks = stats["fallback_alignment"] + stats["fallback_embedding"] + stats["fallback_error"]
+        total = stats["ghost"] + fallbacks
+        stats["fallback_total"] = fallbacks
+        stats["fallback_rate"] = round(fallbacks / total, 3) if total else 0.0
+        stats["fallback_loaded"] = self._fallback_swapper is not None
+        stats["fallback_load_failed"] = self._fallback_failed
+        return stats
 
     def _paste_back(self, original: np.ndarray, swapped: np.ndarray, matrix: np.ndarray) -> np.ndarray:
         """Paste swapped face back to original image."""
@@ -617,8 +802,9 @@ class FaceIDExtractor:
 
             print(f"Loading InsightFace ({self.model_name}) on {self.device}...")
             print(f"  Providers: {providers}")
+            print(f"  Session options: {ort_sessions.describe_options()}")
 
-            self.app = FaceAnalysis(
+            self.app = ort_sessions.face_analysis(
                 name=self.model_name,
                 providers=providers,
                 provider_options=provider_options
@@ -922,6 +1108,17 @@ except Exception as e:
     print("This may be due to torchvision compatibility issues")
 
 
+# FFHQ 5-point template for GFPGAN's 512x512 aligned input
+# (left eye, right eye, nose tip, left mouth corner, right mouth corner)
+FFHQ_TEMPLATE_512 = np.array([
+    [192.98138, 239.94708],
+    [318.90277, 240.1936],
+    [256.63416, 314.01935],
+    [201.26117, 371.41043],
+    [313.08905, 371.15118]
+], dtype=np.float32)
+
+
 class FaceEnhancer:
     """
     GFPGAN-based face enhancement/restoration.
@@ -1062,11 +1259,100 @@ class FaceEnhancer:
             print(f"Face enhancement failed: {e}")
             return None
 
+    def enhance_roi(
+        self,
+        image: Union[str, Image.Image, np.ndarray],
+        kps,
+        blend_ratio: float = 1.0,
+    ) -> Optional[Image.Image]:
+        """
+        Restore one face from known landmarks, touching only its ROI.
+
+        The face is warped onto the FFHQ 512 template from kps and restored with
+        has_aligned=True (GFPGAN's own RetinaFace detector is skipped). The result
+        is warped back and blended with a feathered mask inside the face ROI only.
+
+        Args:
+            image: Input image
+            kps: 5-point landmarks (InsightFace order) in image coordinates
+            blend_ratio: How much to blend enhanced face (0=original, 1=enhanced)
+
+        Returns:
+            Image with the restored face, or None if failed
+        """
+        if not self.load():
+            return None
+
+        import cv2
+
+        if isinstance(image, str):
+            image = Image.open(image).convert("RGB")
+        img_np = np.array(image) if isinstance(image, Image.Image) else image
+        h, w = img_np.shape[:2]
+        size = 512
+
+        try:
+            kps = np.asarray(kps, dtype=np.float32).reshape(5, 2)
+            matrix, _ = cv2.estimateAffinePartial2D(kps, FFHQ_TEMPLATE_512, method=cv2.LMEDS)
+            if matrix is None:
+                return None
+
+            # Aligned crop (BGR for GFPGAN), same border fill as facexlib
+            aligned_bgr = cv2.warpAffine(
+                img_np[:, :, ::-1], matrix, (size, size),
+                borderMode=cv2.BORDER_CONSTANT, borderValue=(135, 133, 132)
+            )
+            _, restored_faces, _ = self.enhancer.enhance(
+                np.ascontiguousarray(aligned_bgr),
+                has_aligned=True,
+                only_center_face=True,
+                paste_back=False
+            )
+            if not restored_faces:
+                return None
+            restored_rgb = restored_faces[0][:, :, ::-1]
+
+            # ROI = inverse-warped crop square, clipped to the image
+            inv_matrix = cv2.invertAffineTransform(matrix)
+            corners = np.array([[0, 0, 1], [size, 0, 1], [0, size, 1], [size, size, 1]], dtype=np.float32)
+            mapped = corners @ inv_matrix.T
+            x0 = max(int(np.floor(mapped[:, 0].min())), 0)
+            y0 = max(int(np.floor(mapped[:, 1].min())), 0)
+            x1 = min(int(np.ceil(mapped[:, 0].max())), w)
+            y1 = min(int(np.ceil(mapped[:, 1].max())), h)
+            if x1 <= x0 or y1 <= y0:
+                return None
+            roi_w, roi_h = x1 - x0, y1 - y0
+
+            inv_roi = inv_matrix.copy()
+            inv_roi[:, 2] -= (x0, y0)
+            warped = cv2.warpAffine(restored_rgb, inv_roi, (roi_w, roi_h))
+
+            # Feathered mask: eroded crop footprint, blurred in proportion to face size
+            mask = cv2.warpAffine(np.ones((size, size), dtype=np.float32), inv_roi, (roi_w, roi_h))
+            face_px = int(np.sqrt(mask.sum()))
+            erode = max(face_px // 20, 1)
+            mask = cv2.erode(mask, np.ones((erode, erode), np.uint8))
+            blur = max(face_px // 10, 1) * 2 + 1
+            mask = cv2.GaussianBlur(mask, (blur, blur), 0)
+            alpha = (mask * blend_ratio)[:, :, None]
+
+            result = img_np.copy()
+            roi = result[y0:y1, x0:x1].astype(np.float32)
+            result[y0:y1, x0:x1] = np.clip(roi * (1 - alpha) + warped * alpha, 0, 255).astype(np.uint8)
+
+            return Image.fromarray(result)
+
+        except Exception as e:
+            print(f"ROI face enhancement failed: {e}")
+            return None
+
     def enhance_face_region(
         self,
         image: Union[str, Image.Image, np.ndarray],
         face_bbox: tuple = None,
         blend_ratio: float = 0.8,
+        kps=None,
     ) -> Optional[Image.Image]:
         """
         Enhance only the face region and blend with original.
@@ -1075,6 +1361,8 @@ class FaceEnhancer:
             image: Input image
             face_bbox: Face bounding box (x1, y1, x2, y2), auto-detect if None
             blend_ratio: How much to blend enhanced face (0=original, 1=enhanced)
+            kps: 5-point landmarks from InsightFace; when given, only the face
+                ROI is restored (enhance_roi) and GFPGAN's detector is skipped
 
         Returns:
             Image with enhanced face region
@@ -1088,6 +1376,12 @@ class FaceEnhancer:
         elif isinstance(image, np.ndarray):
             image = Image.fromarray(image)
 
+        if kps is not None:
+            enhanced = self.enhance_roi(image, kps, blend_ratio=blend_ratio)
+            if enhanced is not None:
+                return enhanced
+            print("ROI enhancement failed, falling back to full-image GFPGAN")
+
         # Enhance full image
         enhanced = self.enhance(image, only_center_face=True, paste_back=True)
 
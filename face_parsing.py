@@ -5,18 +5,43 @@ BiSeNet-based face+hair segmentation
 Labels:
     17: hair
     1-13: face features (skin, eyes, nose, mouth, etc.)
+
+Inference backends (BiSeNetEngine):
+    eager:        PyTorch module (default)
+    torchscript:  traced + frozen graph, cached as 79999_iter.torchscript.pt
+    onnx:         ONNX Runtime session (ort_sessions), cached as 79999_iter.onnx
+
+Exports live next to 79999_iter.pth, are written once (re-exported when the
+weights are newer) and take a dynamic batch, so several images are parsed in
+one call. Argmax runs inside the graph; only uint8 label maps leave it.
+
+Crop-aware parsing (face_box=(x, y, w, h)): instead of squashing the whole
+image to 512x512, a padded square around the face (raised for hair) is
+parsed at 512 and its labels are written back into a background-filled
+full-size map. Only the crop ROI is upscaled, so a small face in a large
+reference gets the full 512 input and the label map costs a memset plus
+one ROI resize.
+
+Usage:
+    parser = FaceParser(device="cpu", backend="torchscript")   # or BISENET_BACKEND=onnx
+    seg = parser.get_segmentation(image)                       # (H, W) uint8 labels
+    segs = parser.get_segmentations([img_a, img_b, img_c])     # one batch
+    seg = parser.get_segmentation(reference, face_box=(x, y, w, h))   # crop-aware
 """
 
 import os
+import warnings
+import cv2
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 from PIL import Image, ImageFilter
-from typing import Optional, Tuple, Union
-import torchvision.transforms as transforms
+from typing import List, Optional, Sequence, Tuple, Union
 from torchvision.models import resnet18
 
+import ort_sessions
+
 
 # BiSeNet Labels (19 classes)
 # 0: background, 1: skin, 2-3: brows, 4-5: eyes, 6: glasses, 7-8: ears,
@@ -27,6 +52,19 @@ BISENET_HAIR_LABELS = [17]  # Hair only
 BISENET_NECK_LABELS = [14]  # Neck
 BISENET_FACE_HAIR_LABELS = BISENET_FACE_LABELS + BISENET_HAIR_LABELS
 
+# Inference input size (512x512 for best results) and ImageNet normalization
+BISENET_INPUT_SIZE = 512
+BISENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+BISENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Crop-aware parsing: square side = CROP_SCALE x the larger face box side,
+# centre raised by CROP_SHIFT_UP x box height (detector boxes stop at the brows)
+CROP_SCALE = 2.2
+CROP_SHIFT_UP = 0.15
+
+BISENET_BACKENDS = ("eager", "torchscript", "onnx")
+DEFAULT_BISENET_BACKEND = "eager"  # BISENET_BACKEND environment variable overrides
+
 
 # BiSeNet Model Components
 class ConvBNReLU(nn.Module):
@@ -143,18 +181,291 @@ class BiSeNet(nn.Module):
         return feat_out
 
 
+class BiSeNetLabels(nn.Module):
+    """BiSeNet + argmax: (N, 3, 512, 512) float -> (N, 512, 512) uint8 labels (the exported graph)."""
+
+    def __init__(self, model: BiSeNet):
+        super(BiSeNetLabels, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x).argmax(1).to(torch.uint8)
+
+
+def load_bisenet(model_path: str, device: str = "cpu") -> BiSeNet:
+    """BiSeNet with 79999_iter.pth weights, in eval mode on device."""
+    model = BiSeNet(n_classes=19)
+    state_dict = torch.load(model_path, map_location=device, weights_only=True)
+    model.load_state_dict(state_dict, strict=False)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def export_path(model_path: str, backend: str) -> str:
+    """Cached export next to the weights: 79999_iter.torchscript.pt / 79999_iter.onnx"""
+    suffix = {"torchscript": ".torchscript.pt", "onnx": ".onnx"}[backend]
+    return os.path.splitext(model_path)[0] + suffix
+
+
+def _is_fresh(path: str, model_path: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def export_bisenet(model_path: str, backend: str) -> str:
+    """
+    Export BiSeNetLabels (CPU, float32, dynamic batch) to export_path().
+
+    Written to a per-process temp file and renamed, so concurrent workers
+    never load a half-written export.
+
+    Returns:
+        Export path
+    """
+    path = export_path(model_path, backend)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    wrapper = BiSeNetLabels(load_bisenet(model_path, "cpu")).eval()
+    example = torch.zeros(2, 3, BISENET_INPUT_SIZE, BISENET_INPUT_SIZE)
+
+    try:
+        with torch.no_grad(), warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # tracer warnings: pooling kernels are fixed at 512 input
+            if backend == "torchscript":
+                traced = torch.jit.trace(wrapper, example)
+                torch.jit.save(torch.jit.freeze(traced), tmp_path)
+            else:
+                torch.onnx.export(
+                    wrapper, example, tmp_path,
+                    input_names=["input"], output_names=["labels"],
+                    dynamic_axes={"input": {0: "batch"}, "labels": {0: "batch"}},
+                    opset_version=17, dynamo=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print(f"BiSeNet exported ({backend}): {path}")
+    return path
+
+
+def face_crop_box(
+    face_box: Sequence[float],
+    image_size: Tuple[int, int],
+    scale: float = CROP_SCALE,
+    shift_up: float = CROP_SHIFT_UP
+) -> Tuple[int, int, int, int]:
+    """
+    Padded square parsing crop around a face, kept inside the image.
+
+    The square is shifted (not shrunk) to fit; only when it is larger than
+    the image's short side is it clipped to a rectangle.
+
+    Args:
+        face_box: Face (x, y, w, h) in image coordinates
+        image_size: (width, height)
+
+    Returns:
+        (x1, y1, x2, y2)
+    """
+    x, y, w, h = face_box
+    width, height = image_size
+    side = min(max(w, h) * scale, max(width, height))
+    cx = x + w / 2
+    cy = y + h / 2 - h * shift_up
+    x1 = min(max(cx - side / 2, 0), max(width - side, 0))
+    y1 = min(max(cy - side / 2, 0), max(height - side, 0))
+    x2 = min(x1 + side, width)
+    y2 = min(y1 + side, height)
+    return int(round(x1)), int(round(y1)), int(round(x2)), int(round(y2))
+
+
+def upscale_labels(labels: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Nearest-neighbour resize of a label map to (width, height) (no-op at the same size)."""
+    if labels.shape[1] == size[0] and labels.shape[0] == size[1]:
+        return labels
+    return cv2.resize(labels, tuple(size), interpolation=cv2.INTER_NEAREST)
+
+
+def paste_labels(
+    labels: np.ndarray,
+    crop_box: Tuple[int, int, int, int],
+    image_size: Tuple[int, int],
+    target_size: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Write crop labels back into a full-size map (background elsewhere).
+
+    Args:
+        labels: Label map of the crop (any size, usually 512x512)
+        crop_box: (x1, y1, x2, y2) of the crop in image coordinates
+        image_size: (width, height) the crop was taken from
+        target_size: (width, height) of the output map
+
+    Returns:
+        (H, W) uint8 label map at target_size
+    """
+    tw, th = target_size
+    sx, sy = tw / image_size[0], th / image_size[1]
+    x1, y1, x2, y2 = crop_box
+    x1, x2 = int(round(x1 * sx)), min(int(round(x2 * sx)), tw)
+    y1, y2 = int(round(y1 * sy)), min(int(round(y2 * sy)), th)
+
+    full = np.zeros((th, tw), dtype=np.uint8)  # 0 = background
+    if x2 > x1 and y2 > y1:
+        full[y1:y2, x1:x2] = upscale_labels(labels, (x2 - x1, y2 - y1))
+    return full
+
+
+class BiSeNetEngine:
+    """
+    Batched BiSeNet inference through eager PyTorch, TorchScript or ONNX Runtime.
+
+    Exported backends are loaded from (or exported to) files next to the
+    weights; if export or load fails the engine falls back to eager and
+    self.backend says so.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        device: str = "cpu",
+        backend: str = DEFAULT_BISENET_BACKEND,
+        channels_last: bool = False,
+        max_batch: int = 8
+    ):
+        """
+        Args:
+            model_path: 79999_iter.pth
+            device: Inference device
+            backend: "eager" / "torchscript" / "onnx"
+            channels_last: NHWC inputs/weights for the torch backends
+            max_batch: Images per forward pass (larger lists are chunked)
+        """
+        if backend not in BISENET_BACKENDS:
+            raise ValueError(f"Unknown BiSeNet backend '{backend}' (available: {', '.join(BISENET_BACKENDS)})")
+        self.model_path = model_path
+        self.device = device
+        self.channels_last = channels_last
+        self.max_batch = max(1, max_batch)
+        self.model = None    # eager BiSeNet
+        self.module = None   # TorchScript BiSeNetLabels
+        self.session = None  # ONNX Runtime session
+        self.backend = backend
+
+        if backend != "eager":
+            try:
+                self._load_exported(backend)
+            except Exception as e:
+                print(f"BiSeNet {backend} backend unavailable ({e}), using eager")
+                self.backend = "eager"
+        if self.backend == "eager":
+            self.model = load_bisenet(model_path, device)
+            if channels_last:
+                self.model.to(memory_format=torch.channels_last)
+
+    def _load_exported(self, backend: str):
+        path = export_path(self.model_path, backend)
+        if not _is_fresh(path, self.model_path):
+            export_bisenet(self.model_path, backend)
+        try:
+            self._open(backend, path)
+        except Exception:
+            # Export from an older torch/onnxruntime: rebuild once
+            export_bisenet(self.model_path, backend)
+            self._open(backend, path)
+
+    def _open(self, backend: str, path: str):
+        if backend == "torchscript":
+            module = torch.jit.load(path, map_location=self.device).eval()
+            try:
+                module = torch.jit.optimize_for_inference(module)
+            except Exception:
+                pass  # frozen graph still runs unoptimized
+            self.module = module
+        else:
+            providers = ["CPUExecutionProvider"]
+            if self.device == "cuda":
+                providers.insert(0, "CUDAExecutionProvider")
+            self.session = ort_sessions.get_session(path, providers=providers)
+
+    @staticmethod
+    def preprocess(images: Sequence[Image.Image]) -> np.ndarray:
+        """RGB images -> normalized (N, 3, 512, 512) float32 batch."""
+        size = (BISENET_INPUT_SIZE, BISENET_INPUT_SIZE)
+        batch = np.empty((len(images), BISENET_INPUT_SIZE, BISENET_INPUT_SIZE, 3), dtype=np.float32)
+        for i, image in enumerate(images):
+            batch[i] = np.asarray(image.convert("RGB").resize(size, Image.LANCZOS), dtype=np.float32)
+        batch *= 1.0 / 255.0
+        batch -= BISENET_MEAN
+        batch /= BISENET_STD
+        return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        if self.session is not None:
+            return self.session.run(None, {"input": batch})[0]
+
+        x = torch.from_numpy(batch).to(self.device)
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            if self.module is not None:
+                labels = self.module(x)
+            else:
+                labels = self.model(x).argmax(1).to(torch.uint8)
+        return labels.cpu().numpy()
+
+    def predict(self, images: Sequence[Image.Image]) -> np.ndarray:
+        """
+        Parse images at 512x512.
+
+        Returns:
+            (N, 512, 512) uint8 label maps
+        """
+        outputs = []
+        for start in range(0, len(images), self.max_batch):
+            chunk = images[start:start + self.max_batch]
+            outputs.append(self._run(self.preprocess(chunk)))
+        return np.concatenate(outputs) if outputs else np.empty((0, BISENET_INPUT_SIZE, BISENET_INPUT_SIZE), np.uint8)
+
+    def segment(
+        self,
+        images: Sequence[Image.Image],
+        target_sizes: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[np.ndarray]:
+        """
+        Parse images in one batch and resize each label map (nearest, OpenCV).
+
+        Args:
+            images: RGB PIL images
+            target_sizes: (width, height) per image (None = each image's own size)
+
+        Returns:
+            List of (H, W) uint8 label maps
+        """
+        if target_sizes is None:
+            target_sizes = [image.size for image in images]
+        labels = self.predict(images)
+        return [upscale_labels(label, size) for label, size in zip(labels, target_sizes)]
+
+
 class FaceParser:
     """BiSeNet-based face parser for face+hair segmentation."""
 
     MODEL_FILENAME = "79999_iter.pth"
 
-    def __init__(self, device: str = "cpu"):
+    def __init__(
+        self,
+        device: str = "cpu",
+        channels_last: bool = False,
+        backend: Optional[str] = None,
+        max_batch: int = 8
+    ):
         self.device = device
-        self.model = None
-        self.transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
-        ])
+        self.channels_last = channels_last  # NHWC convolutions (faster with oneDNN on CPU)
+        self.backend = backend or os.environ.get("BISENET_BACKEND") or DEFAULT_BISENET_BACKEND
+        self.max_batch = max_batch
+        self.engine = None
+        self.model = None  # eager BiSeNet (None for exported backends)
 
     def _find_model_path(self) -> Optional[str]:
         """Find existing model in various cache locations."""
@@ -214,7 +525,7 @@ class FaceParser:
 
     def load(self) -> bool:
         """Load BiSeNet model."""
-        if self.model is not None:
+        if self.engine is not None:
             return True
 
         try:
@@ -230,13 +541,11 @@ class FaceParser:
                     print("All download attempts failed")
                     return False
 
-            # Load model
-            self.model = BiSeNet(n_classes=19)
-            state_dict = torch.load(model_path, map_location=self.device, weights_only=True)
-            self.model.load_state_dict(state_dict, strict=False)
-            self.model.to(self.device)
-            self.model.eval()
-            print(f"BiSeNet loaded on {self.device}")
+            # Load model (exported backends are built/loaded next to the weights)
+            self.engine = BiSeNetEngine(model_path, device=self.device, backend=self.backend,
+                                        channels_last=self.channels_last, max_batch=self.max_batch)
+            self.model = self.engine.model
+            print(f"BiSeNet loaded on {self.device} ({self.engine.backend})")
             return True
 
         except Exception as e:
@@ -248,31 +557,47 @@ class FaceParser:
     def get_segmentation(
         self,
         image: Image.Image,
-        target_size: Tuple[int, int] = None
+        target_size: Tuple[int, int] = None,
+        face_box: Optional[Sequence[float]] = None
     ) -> Optional[np.ndarray]:
-        """Get segmentation map from image."""
+        """Get segmentation map from image (face_box=(x, y, w, h): parse a padded face crop only)."""
+        segs = self.get_segmentations(
+            [image],
+            None if target_size is None else [target_size],
+            None if face_box is None else [face_box])
+        return segs[0] if segs is not None else None
+
+    def get_segmentations(
+        self,
+        images: Sequence[Image.Image],
+        target_sizes: Optional[Sequence[Tuple[int, int]]] = None,
+        face_boxes: Optional[Sequence[Optional[Sequence[float]]]] = None
+    ) -> Optional[List[np.ndarray]]:
+        """
+        Get segmentation maps for several images in batched forward passes.
+
+        Args:
+            images: RGB PIL images
+            target_sizes: Output (width, height) per image (None = image sizes)
+            face_boxes: Face (x, y, w, h) per image (None entries = whole image).
+                With a box only a padded square around the face is parsed;
+                labels outside it are background.
+        """
         if not self.load():
             return None
-
-        if target_size is None:
-            target_size = image.size
-
-        # Resize for inference (512x512 for best results)
-        inference_size = 512
-        img_resized = image.resize((inference_size, inference_size), Image.LANCZOS)
-
-        # Transform
-        img_tensor = self.transform(img_resized).unsqueeze(0).to(self.device)
-
-        with torch.no_grad():
-            output = self.model(img_tensor)
-            pred = output.argmax(1).squeeze().cpu().numpy()
-
-        # Resize to target size
-        pred_pil = Image.fromarray(pred.astype(np.uint8))
-        pred_resized = pred_pil.resize(target_size, Image.NEAREST)
-
-        return np.array(pred_resized)
+        images = list(images)
+        if target_sizes is None:
+            target_sizes = [image.size for image in images]
+        if face_boxes is None:
+            return self.engine.segment(images, target_sizes)
+
+        crop_boxes = [face_crop_box(box, image.size) if box is not None else None
+                      for image, box in zip(images, face_boxes)]
+        crops = [image.crop(crop) if crop is not None else image
+                 for image, crop in zip(images, crop_boxes)]
+        labels = self.engine.predict(crops)
+        return [paste_labels(label, crop, image.size, size) if crop is not None else upscale_labels(label, size)
+                for label, crop, image, size in zip(labels, crop_boxes, images, target_sizes)]
 
     def get_face_hair_mask(
         self,
@@ -281,7 +606,9 @@ class FaceParser:
         include_hair: bool = True,
         include_neck: bool = False,
         blur_radius: int = 10,
-        expand_ratio: float = 1.2
+        expand_ratio: float = 1.2,
+        seg_map: Optional[np.ndarray] = None,
+        face_box: Optional[Sequence[float]] = None
     ) -> Optional[Image.Image]:
         """
         Extract face+hair+neck mask from image.
@@ -293,6 +620,8 @@ class FaceParser:
             include_neck: Include neck in mask
             blur_radius: Gaussian blur for soft edges
             expand_ratio: Mask expansion ratio
+            seg_map: Precomputed segmentation of image (skips inference)
+            face_box: Face (x, y, w, h) in image - parse only a padded crop around it
         """
         if isinstance(image, str):
             image = Image.open(image).convert("RGB")
@@ -300,7 +629,10 @@ class FaceParser:
         if target_size is None:
             target_size = image.size
 
-        seg_map = self.get_segmentation(image, target_size)
+        if seg_map is None:
+            seg_map = self.get_segmentation(image, target_size, face_box=face_box)
+        elif seg_map.shape[::-1] != tuple(target_size):
+            seg_map = upscale_labels(seg_map.astype(np.uint8), target_size)
 
         if seg_map is None:
             return None
@@ -346,15 +678,18 @@ class FaceParser:
     def extract_hair_region(
         self,
         image: Image.Image,
-        background_color: Tuple[int, int, int] = (128, 128, 128)
+        background_color: Tuple[int, int, int] = (128, 128, 128),
+        seg_map: Optional[np.ndarray] = None
     ) -> Optional[Image.Image]:
         """
         Extract hair-only region from image.
 
         Returns image with only hair visible, rest is neutral gray.
         This can be used for CLIP encoding to capture hairstyle.
+        Pass a precomputed seg_map (same size as image) to skip inference.
         """
-        seg_map = self.get_segmentation(image, image.size)
+        if seg_map is None:
+            seg_map = self.get_segmentation(image, image.size)
 
         if seg_map is None:
             return None
@@ -389,21 +724,22 @@ class FaceParser:
 
         return Image.fromarray(result)
 
-    def get_hair_coverage(self, image: Image.Image) -> float:
+    def get_hair_coverage(self, image: Image.Image, seg_map: Optional[np.ndarray] = None) -> float:
         """Get hair coverage percentage in image."""
-        seg_map = self.get_segmentation(image, image.size)
+        if seg_map is None:
+            seg_map = self.get_segmentation(image, image.size)
         if seg_map is None:
             return 0.0
         return np.sum(seg_map == 17) / seg_map.size * 100
 
-    def detect_gender_from_hair(self, image: Image.Image) -> str:
+    def detect_gender_from_hair(self, image: Image.Image, seg_map: Optional[np.ndarray] = None) -> str:
         """
         Simple gender hint based on hair coverage.
 
         Note: This is a very rough heuristic. High hair coverage
         often (but not always) correlates with longer hair.
         """
-        coverage = self.get_hair_coverage(image)
+        coverage = self.get_hair_coverage(image, seg_map=seg_map)
 
         if coverage > 15:
             return "likely female (long hair)"
@@ -20,8 +20,17 @@ import os
 import shutil
 import sys
 import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 
+import ort_sessions
+from turbo_presets import TURBO_PRESETS
+from performance import PROFILES, DEFAULT_PROFILE, apply_profile, autocast_context, describe_profile, \
+    peak_memory_mb, reset_peak_memory, resolve_profile
+
 
 def cleanup_gpu_memory():
     """GPU 메모리 정리 - 생성 완료 후 호출"""
@@ -31,6 +40,75 @@ def cleanup_gpu_memory():
     gc.collect()
 
 
+# 디버그 아티팩트 레벨
+#   none:   최종 결과만 (params.txt 없음)
+#   result: 최종 결과 + params.txt
+#   debug:  + 마스크 오버레이 / pre-paste / swap / enhance 중간 결과
+#   full:   + 입력 이미지 복사본
+ARTIFACT_LEVELS = ("none", "result", "debug", "full")
+
+
+class AsyncArtifactWriter:
+    """디버그/중간 이미지 비동기 저장기
+
+    PNG 인코딩과 디스크 I/O를 백그라운드 스레드에서 수행해서 생성 스레드를 막지 않음.
+    중간 결과는 빠른 압축 (compress_level=1) 사용.
+    """
+
+    def __init__(self, max_workers: int = 2, compress_level: int = 1):
+        self.compress_level = compress_level
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact_writer")
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def save(self, image, path: str):
+        """이미지 저장 예약 (PIL Image 또는 numpy 배열)
+
+        Args:
+            image: 저장할 이미지 (호출 시점 스냅샷 저장 - 이후 수정돼도 안전)
+            path: 저장 경로
+
+        Returns:
+            저장 Future (완료 여부 확인용 - 완료 통지는 호출 스레드에서 처리)
+        """
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(np.array(image, copy=True))
+        else:
+            image = image.copy()
+        return self._submit(self._write_image, image, path)
+
+    def copy(self, src: str, dst: str):
+        """파일 복사 예약"""
+        self._submit(shutil.copy2, src, dst)
+
+    def _write_image(self, image, path):
+        image.save(path, compress_level=self.compress_level)
+
+    def _submit(self, fn, *args):
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+        return future
+
+    def drain(self) -> int:
+        """대기 중인 저장 작업 완료까지 대기
+
+        Returns:
+            실패한 작업 수
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        errors = 0
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                errors += 1
+                print(f"   아티팩트 저장 실패: {e}")
+        return errors
+
+
 def get_input_path(input_path: str) -> str:
     """입력 경로 처리 - inputs/ 폴더 자동 확인
 
@@ -88,7 +166,8 @@ def setup_run_folder(run_name: str = None) -> str:
 
 
 def save_run_params(run_folder: str, args, command: str, actual_seed: int,
-                    background_path: str, face_path: str, actual_prompt: str = None):
+                    background_path: str, face_path: str, actual_prompt: str = None,
+                    steps_used: dict = None):
     """실행 파라미터를 텍스트 파일로 저장
 
     Args:
@@ -99,6 +178,7 @@ def save_run_params(run_folder: str, args, command: str, actual_seed: int,
         background_path: 배경 이미지 경로
         face_path: 얼굴 이미지 경로
         actual_prompt: 실제 사용된 프롬프트 (auto-prompt 시 생성된 프롬프트)
+        steps_used: 실제 디노이징 스텝 {"used", "total", "early_stopped"[, "cfg_cutoff", "unet_cache"]} (compositor.last_run_steps)
     """
     params_path = os.path.join(run_folder, "params.txt")
 
@@ -126,6 +206,22 @@ def save_run_params(run_folder: str, args, command: str, actual_seed: int,
         f.write(f"denoising: {args.denoising}\n")
         f.write(f"guidance: {args.guidance}\n")
         f.write(f"steps: {args.steps}\n")
+        if steps_used:
+            stopped = "  # 조기 종료" if steps_used.get("early_stopped") else ""
+            f.write(f"steps_used: {steps_used['used']}/{steps_used['total']}{stopped}\n")
+        if getattr(args, 'early_stop_threshold', 0):
+            f.write(f"early_stop: threshold={args.early_stop_threshold}, patience={args.early_stop_patience}\n")
+        if steps_used and steps_used.get("profile"):
+            f.write(f"profile: {steps_used['profile']}\n")
+            if steps_used.get("peak_memory_mb") is not None:
+                f.write(f"peak_memory: {steps_used['peak_memory_mb']} MB\n")
+        if steps_used and steps_used.get("cfg_cutoff") and steps_used["cfg_cutoff"]["cutoff"] < 1.0:
+            cfg = steps_used["cfg_cutoff"]
+            f.write(f"cfg_cutoff: {cfg['cutoff']}  # 조건부만 {cfg['cond_only_steps']} 스텝, "
+                    f"스텝당 {cfg['cfg_step_ms']}ms (CFG) / {cfg['cond_step_ms']}ms (조건부)\n")
+        if steps_used and steps_used.get("unet_cache"):
+            cache = steps_used["unet_cache"]
+            f.write(f"unet_cache: interval={cache['interval']}, full={cache['full']}, cached={cache['cached']}\n")
         f.write(f"mask_expand: {args.mask_expand}\n")
         f.write(f"mask_blur: {args.mask_blur}\n")
         f.write(f"mask_padding: {args.mask_padding}\n")
@@ -141,11 +237,13 @@ def save_run_params(run_folder: str, args, command: str, actual_seed: int,
         f.write(f"use_clip_blend: {args.use_clip_blend}\n")
         f.write(f"detection: {args.detection}\n")
         f.write(f"no_bisenet: {args.no_bisenet}\n")
+        f.write(f"crop_aware_parsing: {getattr(args, 'crop_aware_parsing', False)}\n")
         f.write(f"no_hair: {args.no_hair}\n")
         f.write(f"include_neck: {args.include_neck}\n")
         f.write(f"no_gender_detect: {args.no_gender_detect}\n")
         f.write(f"use_background_size: {args.use_background_size}\n")
         f.write(f"stop_at: {args.stop_at}\n")
+        f.write(f"turbo: {getattr(args, 'turbo', None)}\n")
         f.write(f"auto_prompt: {args.auto_prompt}\n\n")
 
         # CLIP Blending 파라미터
@@ -178,10 +276,29 @@ def save_run_params(run_folder: str, args, command: str, actual_seed: int,
             reproduce_cmd += " --no-hair"
         if args.include_neck:
             reproduce_cmd += " --include-neck"
+        if getattr(args, 'crop_aware_parsing', False):
+            reproduce_cmd += " --crop-aware-parsing"
         if args.stop_at < 1.0:
             reproduce_cmd += f" --stop-at {args.stop_at}"
         if args.auto_prompt:
             reproduce_cmd += " --auto-prompt"
+        if getattr(args, 'early_stop_threshold', 0):
+            reproduce_cmd += f" --early-stop-threshold {args.early_stop_threshold}"
+            reproduce_cmd += f" --early-stop-patience {args.early_stop_patience}"
+        if getattr(args, 'profile', DEFAULT_PROFILE) != DEFAULT_PROFILE:
+            reproduce_cmd += f" --profile {args.profile}"
+        if getattr(args, 'compile_unet', False):
+            reproduce_cmd += " --compile-unet"
+        if getattr(args, 'bisenet_backend', None):
+            reproduce_cmd += f" --bisenet-backend {args.bisenet_backend}"
+        if getattr(args, 'cfg_cutoff', 1.0) < 1.0:
+            reproduce_cmd += f" --cfg-cutoff {args.cfg_cutoff}"
+        if getattr(args, 'unet_cache_interval', 0) > 1:
+            reproduce_cmd += f" --unet-cache-interval {args.unet_cache_interval}"
+        if getattr(args, 'turbo', None):
+            reproduce_cmd += f" --turbo {args.turbo}"
+            if args.turbo_lora:
+                reproduce_cmd += f" --turbo-lora {args.turbo_lora}"
         if hasattr(args, 'use_pre_paste') and args.use_pre_paste:
             reproduce_cmd += " --use-pre-paste"
             reproduce_cmd += f" --pre-paste-denoising {args.pre_paste_denoising}"
@@ -235,11 +352,207 @@ except ImportError as e:
 
 # Gemini Vision 프롬프트 생성기 (optional)
 try:
-    from prompt_generator import generate_prompt_from_face_image
+    from prompt_generator import generate_prompt_from_face_image, DEFAULT_PROMPT
     HAS_PROMPT_GENERATOR = True
 except ImportError:
     HAS_PROMPT_GENERATOR = False
 
+# 업로드 시 전처리된 얼굴 아티팩트 저장소 (optional)
+try:
+    from face_artifacts import FaceArtifactStore
+    HAS_FACE_ARTIFACTS = True
+except ImportError:
+    HAS_FACE_ARTIFACTS = False
+
+# 스텝 간 UNet 특징 캐시 (DeepCache 방식, optional)
+try:
+    from unet_cache import create_unet_cache
+    HAS_UNET_CACHE = True
+except ImportError:
+    HAS_UNET_CACHE = False
+
+
+# Swap Refinement 크롭 생성 해상도 (긴 변, SDXL 호환 8의 배수)
+SWAP_REFINE_SIZE = 768
+
+# Pre-paste: Haar 감지 해상도 (긴 변), seamlessClone ROI 최소 패딩(px), 배경 감지 캐시 크기
+PRE_PASTE_DETECT_SIDE = 640
+PRE_PASTE_ROI_PAD = 16
+PRE_PASTE_BOX_CACHE_SIZE = 16
+
+# Few-step(turbo) 생성 프리셋은 turbo_presets.TURBO_PRESETS (웹 API 기본값과 공유), LoRA는 TURBO_LORA_DIR 기준
+TURBO_LORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "turbo")
+# turbo 미사용 시 기본값 (--steps/--guidance/--denoising 미지정 시)
+BASELINE_DEFAULTS = {"steps": 50, "guidance": 7.5, "denoising": 0.92}
+
+# 수렴 기반 조기 종료: 이 진행률 이전에는 판정하지 않음 (초반 구도 형성 단계 보호)
+EARLY_STOP_MIN_PROGRESS = 0.3
+
+
+def detect_face_box(face_cascade, image_array, max_side=PRE_PASTE_DETECT_SIDE):
+    """
+    Haar 얼굴 감지 (긴 변 max_side로 축소한 그레이스케일에서 감지, 가장 큰 얼굴)
+
+    Args:
+        face_cascade: cv2.CascadeClassifier (None이면 감지 안 함)
+        image_array: RGB numpy 배열
+        max_side: 감지 해상도 (긴 변, 0이면 원본 해상도)
+
+    Returns:
+        원본 좌표 (x, y, w, h) 또는 None
+    """
+    if face_cascade is None:
+        return None
+    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+    scale = 1.0
+    if max_side and max(gray.shape[:2]) > max_side:
+        scale = max_side / max(gray.shape[:2])
+        gray = cv2.resize(gray, (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale))),
+                          interpolation=cv2.INTER_AREA)
+    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return tuple(int(round(v / scale)) for v in (x, y, w, h))
+
+
+def seamless_clone_roi(dst, src, mask, top_left, pad=PRE_PASTE_ROI_PAD):
+    """
+    패딩된 ROI 안에서만 cv2.seamlessClone 실행 (dst를 제자리 수정)
+
+    Poisson 블렌딩은 마스크 경계 주변 픽셀만 참조하므로 전체 프레임 대상과 결과가 같고,
+    전체 프레임 복사/BGR 변환이 필요 없음 (채널별 연산이라 RGB 그대로 사용)
+
+    Args:
+        dst: RGB numpy 배열 (H, W, 3), 제자리 수정됨
+        src: 붙여넣을 RGB 패치 (mask와 같은 크기)
+        mask: 이진 마스크 (uint8, 0/255)
+        top_left: dst 안 패치 위치 (x1, y1)
+        pad: ROI 최소 패딩 (패치 크기의 10%와 비교해 큰 값)
+
+    Returns:
+        dst
+    """
+    x1, y1 = top_left
+    patch_h, patch_w = mask.shape[:2]
+    pad = max(pad, int(max(patch_w, patch_h) * 0.1))
+    rx1, ry1 = max(0, x1 - pad), max(0, y1 - pad)
+    rx2, ry2 = min(dst.shape[1], x1 + patch_w + pad), min(dst.shape[0], y1 + patch_h + pad)
+
+    roi = np.ascontiguousarray(dst[ry1:ry2, rx1:rx2])
+    center = (x1 - rx1 + patch_w // 2, y1 - ry1 + patch_h // 2)
+    dst[ry1:ry2, rx1:rx2] = cv2.seamlessClone(src, roi, mask, center, cv2.NORMAL_CLONE)
+    return dst
+
+
+def estimate_final_latents(scheduler, prev_latents, latents, timestep):
+    """
+    직전 두 스텝의 latents로 최종(노이즈 0) latents 추정 -> 남은 스텝을 건너뛰고 바로 디코딩
+
+    결정적 1차 스텝 가정: x_t = a_t * x0 + b_t * eps 에서 두 스텝 사이 x0, eps가 같다고 보고 x0를 풂
+      - VE 스케줄러 (Euler 계열, init_noise_sigma > 1): a = 1, b = sigma
+      - VP 스케줄러 (DDIM, DPM++, LCM 등): a = sqrt(alpha_bar), b = sqrt(1 - alpha_bar)
+
+    Args:
+        scheduler: 파이프라인 스케줄러 (scheduler.step 직후 상태)
+        prev_latents: 이전 스텝 결과 latents (timestep 시점)
+        latents: 이번 스텝 결과 latents (다음 timestep 시점)
+        timestep: 이번 스텝의 timestep
+
+    Returns:
+        추정 latents 또는 None (지원하지 않는 스케줄러)
+    """
+    if getattr(scheduler, "init_noise_sigma", 1.0) > 1.0:
+        sigmas = getattr(scheduler, "sigmas", None)
+        step_index = getattr(scheduler, "step_index", None)
+        if sigmas is None or step_index is None or not 1 <= step_index < len(sigmas):
+            return None
+        a_cur = a_next = 1.0
+        b_cur, b_next = float(sigmas[step_index - 1]), float(sigmas[step_index])
+    else:
+        alphas_cumprod = getattr(scheduler, "alphas_cumprod", None)
+        timesteps = getattr(scheduler, "timesteps", None)
+        if alphas_cumprod is None or timesteps is None:
+            return None
+        matches = (timesteps == timestep).nonzero()
+        if len(matches) == 0:
+            return None
+        index = int(matches[0])
+        alpha_cur = float(alphas_cumprod[int(timestep)])
+        alpha_next = float(alphas_cumprod[int(timesteps[index + 1])]) if index + 1 < len(timesteps) else 1.0
+        a_cur, b_cur = alpha_cur ** 0.5, (1.0 - alpha_cur) ** 0.5
+        a_next, b_next = alpha_next ** 0.5, (1.0 - alpha_next) ** 0.5
+
+    denom = b_next * a_cur - b_cur * a_next
+    if abs(denom) < 1e-8:
+        return None
+    final = (b_next * prev_latents.float() - b_cur * latents.float()) / denom
+    return final.to(latents.dtype)
+
+
+def bypass_ip_adapter(unet):
+    """
+    IP-Adapter를 UNet에서 분리 -> 이후 스텝은 일반 SDXL 비용으로 실행
+
+    scale=0은 이미지 토큰(Plus v2: 257 CLIP 토큰) 프로젝션과 IP key/value 어텐션을 그대로 계산함.
+    여기서는 IP 프로세서를 일반 어텐션으로 바꾸고 encoder_hid_proj를 떼어내 이미지 토큰 자체를 없앰.
+    (파이프라인이 루프 전에 만든 image_embeds는 UNet이 더 이상 참조하지 않음)
+
+    Args:
+        unet: 파이프라인 UNet
+
+    Returns:
+        restore_ip_adapter에 넘길 상태 (IP-Adapter가 없으면 None)
+    """
+    from diffusers.models.attention_processor import AttnProcessor2_0, XFormersAttnProcessor
+
+    processors = unet.attn_processors
+    if unet.encoder_hid_proj is None or not any(hasattr(p, "to_k_ip") for p in processors.values()):
+        return None
+
+    plain_processor = AttnProcessor2_0()
+    plain = {}
+    for name, processor in processors.items():
+        if not hasattr(processor, "to_k_ip"):
+            plain[name] = processor
+        elif "XFormers" in type(processor).__name__:
+            plain[name] = XFormersAttnProcessor(attention_op=processor.attention_op)
+        else:
+            plain[name] = plain_processor
+
+    state = (processors, unet.encoder_hid_proj)
+    unet.set_attn_processor(plain)
+    unet.encoder_hid_proj = None
+    return state
+
+
+def restore_ip_adapter(unet, state):
+    """bypass_ip_adapter 되돌리기 (IP 프로세서의 가중치/scale은 그대로 보존됨)"""
+    if state is None:
+        return
+    processors, encoder_hid_proj = state
+    unet.set_attn_processor(processors)
+    unet.encoder_hid_proj = encoder_hid_proj
+
+
+def drop_uncond_image_embeds(_module, args, kwargs):
+    """
+    UNet forward pre-hook: 입력 배치가 CFG 배치의 절반이면 image_embeds도 조건부 절반만 남김
+
+    파이프라인은 IP-Adapter image_embeds를 루프 전에 [uncond, cond]로 한 번 만들고 콜백으로 바꿀 수 없음.
+    CFG 컷오프 이후 latent/prompt가 절반 배치로 줄었을 때 IP 어텐션 배치를 맞추기 위한 훅.
+    """
+    added_cond_kwargs = kwargs.get("added_cond_kwargs")
+    if not added_cond_kwargs or added_cond_kwargs.get("image_embeds") is None:
+        return None
+    sample = args[0] if args else kwargs["sample"]
+    batch = sample.shape[0]
+    image_embeds = [
+        embeds[-batch:] if embeds.shape[0] > batch else embeds
+        for embeds in added_cond_kwargs["image_embeds"]
+    ]
+    return args, dict(kwargs, added_cond_kwargs=dict(added_cond_kwargs, image_embeds=image_embeds))
+
 
 def get_device():
     """사용 가능한 최적의 디바이스 반환"""
@@ -257,7 +570,9 @@ class AutoIDPhotoCompositor:
     def __init__(self, detection_method='opencv', use_bisenet=True, use_faceid=False,
                  use_dual_adapter=False, use_clip_blend=False, use_faceid_plus=False,
                  use_pre_paste=False, use_face_swap=False, use_face_enhance=False,
-                 use_swap_refinement=False, no_ip_adapter=False, face_swap_model='insightface'):
+                 use_swap_refinement=False, no_ip_adapter=False, face_swap_model='insightface',
+                 turbo=None, turbo_lora=None, unet_cache_interval=0, profile=DEFAULT_PROFILE,
+                 compile_unet=False, cpu_threads=None, bisenet_backend=None):
         """
         파이프라인 초기화
 
@@ -273,14 +588,23 @@ class AutoIDPhotoCompositor:
             use_swap_refinement: Face Swap Refinement 모드 (Face Swap 후 경미한 인페인팅으로 블렌딩)
             no_ip_adapter: IP-Adapter 없이 순수 인페인팅만 수행 (Pre-paste와 함께 사용 권장)
             face_swap_model: Face Swap 모델 선택 ('insightface' 빠름, 'ghost' 고화질)
+            turbo: Few-step 프리셋 ('lcm', 'lightning', 'hyper', None이면 기본 50스텝)
+            turbo_lora: turbo LoRA 파일 경로 (None이면 TURBO_LORA_DIR의 프리셋 파일)
+            unet_cache_interval: UNet 특징 캐시 갱신 간격 (N 스텝마다 전체 UNet, 0/1이면 비활성)
+            profile: 메모리/속도 프로파일 (performance.PROFILES: default, throughput, low-memory, cpu)
+            compile_unet: UNet torch.compile (FX 그래프 캐시 재사용, 첫 생성은 컴파일 시간 포함)
+            cpu_threads: intra-op 스레드 수 (None이면 프로파일 설정, cpu 프로파일은 affinity CPU 수)
+            bisenet_backend: BiSeNet 추론 백엔드 ('eager', 'torchscript', 'onnx'; 우선순위: 인자 > BISENET_BACKEND 환경변수 > 프로파일)
         """
         print("=" * 70)
         print("Inpainting Pipeline v5")
         print("=" * 70)
 
-        # 디바이스 감지
-        self.device = get_device()
-        print(f"디바이스: {self.device}")
+        # 디바이스 감지 (프로파일이 디바이스를 고정할 수 있음, 예: cpu)
+        self.profile = resolve_profile(profile, get_device(), compile_unet=compile_unet, threads=cpu_threads)
+        self.device = self.profile["device"]
+        self.performance = None  # apply_profile 결과 (실제 활성화된 설정)
+        print(f"디바이스: {self.device} (프로파일: {self.profile['name']})")
 
         # 모드 설정
         self.no_ip_adapter = no_ip_adapter  # 순수 인페인팅 모드 (IP-Adapter 없음)
@@ -317,6 +641,11 @@ class AutoIDPhotoCompositor:
         self.use_pre_paste = use_pre_paste  # Pre-paste mode (소스 얼굴 미리 붙여넣기)
         self.use_face_swap = use_face_swap and HAS_FACESWAP  # Face Swap mode (생성 후 얼굴 교체)
         self.use_swap_refinement = use_swap_refinement  # Face Swap Refinement mode (Face Swap 후 경미한 인페인팅)
+        self.artifact_writer = AsyncArtifactWriter()  # 디버그/중간 이미지 비동기 저장
+        self.resolved_prompt = None  # 마지막 생성에 실제 사용된 프롬프트 (자동 프롬프트 join 결과)
+        self.last_run_steps = None  # 마지막 생성의 디노이징 스텝 {"used", "total", "early_stopped"}
+        self._face_box_cache = OrderedDict()  # 레퍼런스 배경별 얼굴 감지 결과 (Pre-paste용)
+        self._face_box_lock = threading.Lock()
         print(f"[DEBUG __init__] self.use_faceid_plus = {self.use_faceid_plus}")
         print(f"[DEBUG __init__] self.use_pre_paste = {self.use_pre_paste}")
         print(f"[DEBUG __init__] self.use_face_swap = {self.use_face_swap}")
@@ -330,7 +659,9 @@ class AutoIDPhotoCompositor:
         self.use_bisenet = use_bisenet and HAS_FACE_PARSER
         if self.use_bisenet:
             try:
-                self.face_parser = FaceParser(device=self.device)
+                self.face_parser = FaceParser(device=self.device, channels_last=self.profile["channels_last"],
+                                              backend=(bisenet_backend or os.environ.get("BISENET_BACKEND")
+                                                       or self.profile["bisenet_backend"]))
                 print("BiSeNet face parser 준비 완료")
             except Exception as e:
                 print(f"BiSeNet 초기화 실패: {e}")
@@ -395,8 +726,8 @@ class AutoIDPhotoCompositor:
                 print(f"FaceEnhancer 초기화 실패: {e}")
                 self.use_face_enhance = False
 
-        # dtype 설정 (CPU는 float32 사용)
-        self.dtype = torch.float32 if self.device == "cpu" else torch.float16
+        # dtype 설정 (프로파일 기본: CPU는 float32, GPU는 float16)
+        self.dtype = getattr(torch, self.profile["dtype"])
 
         # Inpainting 파이프라인
         print("\nRealVisXL V4.0 Inpainting 모델 로딩 중...")
@@ -406,6 +737,11 @@ class AutoIDPhotoCompositor:
             variant="fp16" if self.dtype == torch.float16 else None
         )
 
+        # Few-step LoRA 융합 (IP-Adapter 로드 전: UNet 가중치에 합쳐 두면 어댑터 프로세서와 독립)
+        self.turbo = None
+        if turbo:
+            self.turbo = self._load_turbo(turbo, turbo_lora)
+
         # IP-Adapter 로드 (모드에 따라 다른 어댑터)
         # no_ip_adapter 모드면 IP-Adapter 로딩 건너뛰기
         if self.no_ip_adapter:
@@ -416,15 +752,13 @@ class AutoIDPhotoCompositor:
             if not self.has_ip_adapter:
                 return
 
-        self.pipeline.to(self.device)
+        # 디바이스 배치 + 어텐션 백엔드 / VAE slicing·tiling / CPU offload (프로파일별)
+        self.performance = apply_profile(self.pipeline, self.profile, self.device)
+        print(f"성능 프로파일: {describe_profile(self.performance)}")
 
-        # xFormers는 CUDA에서만 사용
-        if self.device == "cuda":
-            try:
-                self.pipeline.enable_xformers_memory_efficient_attention()
-                print("xFormers 메모리 최적화 활성화")
-            except:
-                pass
+        # 스텝 간 UNet 특징 캐시 (IP-Adapter 로드 후: 프로세서는 건드리지 않고 블록 forward만 감쌈)
+        self.unet_cache = None
+        self.set_unet_cache(unet_cache_interval)
 
         # 얼굴 감지 초기화
         self.detection_method = detection_method
@@ -466,6 +800,13 @@ class AutoIDPhotoCompositor:
             print("  - 소스 얼굴을 배경에 미리 붙여넣기")
             print("  - Denoising strength 자동 조정 (~0.65)")
             print("  - 얼굴 위치/크기 더 정확하게 유지")
+        if self.unet_cache is not None:
+            print(f"\n♻️ UNet 특징 캐시 활성화 (갱신 간격: {self.unet_cache.interval} 스텝)")
+            print("  - 중간 스텝은 얕은 블록만 계산, 깊은 블록 출력 재사용")
+        if self.turbo is not None:
+            print(f"\n⚡ Turbo 모드 활성화 ({self.turbo['name']})")
+            print(f"  - 기본 {self.turbo['steps']} 스텝, guidance {self.turbo['guidance']}")
+            print(f"  - 스케줄러: {self.turbo['scheduler']}")
         if self.use_face_swap:
             print("\n🔄 Face Swap 모드 활성화")
             model_display = self.face_swap_model_name or self.face_swap_model
@@ -473,6 +814,101 @@ class AutoIDPhotoCompositor:
             print("  - 얼굴 유사도 향상")
         print("=" * 70)
 
+    def _load_turbo(self, name, lora_path=None):
+        """
+        Few-step LoRA를 UNet에 융합하고 전용 스케줄러로 교체
+
+        Args:
+            name: TURBO_PRESETS 키
+            lora_path: LoRA 파일 경로 (None이면 TURBO_LORA_DIR의 프리셋 파일)
+
+        Returns:
+            프리셋 dict (name 포함) 또는 None (실패: 파이프라인은 기본 50스텝 상태, CLI는 --turbo 요청 시 종료)
+        """
+        if name not in TURBO_PRESETS:
+            print(f"⚠️ 알 수 없는 turbo 프리셋: {name} (가능: {', '.join(TURBO_PRESETS)})")
+            return None
+        preset = dict(TURBO_PRESETS[name], name=name)
+        lora_path = lora_path or os.path.join(TURBO_LORA_DIR, preset["lora"])
+        if not os.path.exists(lora_path):
+            print(f"⚠️ Turbo LoRA 없음: {lora_path} -> 기본 모드로 진행")
+            return None
+
+        try:
+            print(f"Turbo LoRA 융합 중: {os.path.basename(lora_path)}")
+            self.pipeline.load_lora_weights(
+                os.path.dirname(lora_path),
+                weight_name=os.path.basename(lora_path),
+                adapter_name="turbo"
+            )
+            self.pipeline.fuse_lora(adapter_names=["turbo"])
+            # 융합된 가중치는 유지하고 LoRA 레이어만 제거 (추론 시 추가 연산 없음)
+            self.pipeline.unload_lora_weights()
+            self.pipeline.scheduler = self._make_turbo_scheduler(preset["scheduler"])
+            preset["lora"] = lora_path
+            print(f"Turbo LoRA 융합 완료 ({name}, 스케줄러: {preset['scheduler']})")
+            return preset
+        except Exception as e:
+            print(f"Turbo LoRA 융합 실패: {e} -> 기본 모드로 진행")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def set_unet_cache(self, interval):
+        """
+        UNet 특징 캐시 설정/변경 (런타임 전환 가능)
+
+        Args:
+            interval: 전체 UNet 계산 간격 (2 이상이면 사이 스텝은 캐시 재사용, 0/1이면 해제)
+        """
+        interval = int(interval or 0)
+        if interval > 1:
+            if not HAS_UNET_CACHE:
+                print("⚠️ unet_cache.py 없음 - UNet 특징 캐시 비활성")
+            elif self.unet_cache is None:
+                self.unet_cache = create_unet_cache(self.pipeline.unet, interval)
+            else:
+                self.unet_cache.interval = interval
+        elif self.unet_cache is not None:
+            self.unet_cache.disable()
+            self.unet_cache = None
+
+    @staticmethod
+    def _cfg_cutoff_report(cfg_cutoff, cfg_state, steps_used):
+        """
+        CFG 컷오프 실행 기록 (콜백 간격으로 잰 스텝당 시간, 첫 스텝은 워밍업이라 제외)
+
+        Returns:
+            {"cutoff", "cond_only_steps", "cfg_step_ms", "cond_step_ms"} (해당 구간이 없으면 ms는 None)
+        """
+        times = cfg_state["step_times"]
+        cond_from = cfg_state["cond_from"]
+        durations = [(index, (times[index] - times[index - 1]) * 1000) for index in range(1, len(times))]
+        cfg_ms = [ms for index, ms in durations if cond_from is None or index < cond_from]
+        cond_ms = [ms for index, ms in durations if cond_from is not None and index >= cond_from]
+
+        def mean_ms(values):
+            return round(sum(values) / len(values), 1) if values else None
+
+        return {
+            "cutoff": cfg_cutoff,
+            "cond_only_steps": steps_used - cond_from if cond_from is not None else 0,
+            "cfg_step_ms": mean_ms(cfg_ms),
+            "cond_step_ms": mean_ms(cond_ms),
+        }
+
+    def _make_turbo_scheduler(self, kind):
+        """few-step LoRA가 학습된 타임스텝 배치의 스케줄러 (기존 스케줄러 설정 기반)"""
+        from diffusers import DDIMScheduler, EulerDiscreteScheduler, LCMScheduler
+        config = self.pipeline.scheduler.config
+        if kind == "lcm":
+            return LCMScheduler.from_config(config)
+        if kind == "euler_trailing":
+            return EulerDiscreteScheduler.from_config(config, timestep_spacing="trailing")
+        if kind == "ddim_trailing":
+            return DDIMScheduler.from_config(config, timestep_spacing="trailing")
+        raise ValueError(f"unknown turbo scheduler: {kind}")
+
     def _load_ip_adapter(self) -> bool:
         """IP-Adapter 로드 (모드에 따라 Standard, FaceID, Dual, 또는 CLIP Blend)"""
         try:
@@ -648,7 +1084,10 @@ class AutoIDPhotoCompositor:
         source_face_img: Image.Image,
         target_bbox: tuple = None,
         blend_mode: str = "seamless",
-        run_folder: str = None
+        run_folder: str = None,
+        target_face_box: tuple = None,
+        source_face_box: tuple = None,
+        source_seg_map: np.ndarray = None
     ) -> Image.Image:
         """
         소스 얼굴을 배경 이미지에 미리 붙여넣기 (Pre-paste)
@@ -662,6 +1101,9 @@ class AutoIDPhotoCompositor:
             target_bbox: 타겟 얼굴 영역 (x1, y1, x2, y2), None이면 자동 감지
             blend_mode: 블렌딩 모드 ("seamless", "alpha", "direct")
             run_folder: 중간 결과 저장 폴더 (디버깅용)
+            target_face_box: 이미 감지된 배경 얼굴 (x, y, w, h), 주어지면 배경 감지 생략
+            source_face_box: 이미 감지된 소스 얼굴 (x1, y1, x2, y2, FaceArtifacts.bbox), 주어지면 소스 감지 생략
+            source_seg_map: 소스 얼굴 전체 BiSeNet 세그멘테이션, 주어지면 BiSeNet 추론 생략
 
         Returns:
             소스 얼굴이 붙여넣어진 이미지 (PIL Image)
@@ -671,28 +1113,26 @@ class AutoIDPhotoCompositor:
         # 디버깅: 소스 얼굴 저장
         if run_folder:
             src_path = os.path.join(run_folder, "2.1_prepaste_source_face.png")
-            source_face_img.save(src_path)
+            self._save_debug_image(source_face_img, src_path)
             print(f"   Pre-paste 소스 얼굴 저장: {os.path.basename(src_path)}")
 
         bg_array = np.array(background_img)
         src_array = np.array(source_face_img)
 
-        # 배경에서 타겟 얼굴 위치 감지
+        # 배경에서 타겟 얼굴 위치 감지 (감지 결과가 주어지면 재사용)
         if target_bbox is None:
-            bg_bgr = bg_array[:, :, ::-1]
-            if self.face_cascade is not None:
-                gray = cv2.cvtColor(bg_bgr, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-                if len(faces) > 0:
-                    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
-                    # 얼굴 영역 확장 (머리카락 포함)
-                    expand = 0.5
-                    x1 = max(0, int(x - w * expand))
-                    y1 = max(0, int(y - h * expand * 1.2))  # 위쪽 더 확장 (이마/머리)
-                    x2 = min(bg_array.shape[1], int(x + w + w * expand))
-                    y2 = min(bg_array.shape[0], int(y + h + h * expand * 0.5))
-                    target_bbox = (x1, y1, x2, y2)
-                    print(f"   타겟 얼굴 영역: {target_bbox}")
+            if target_face_box is None:
+                target_face_box = detect_face_box(getattr(self, "face_cascade", None), bg_array)
+            if target_face_box is not None:
+                x, y, w, h = target_face_box
+                # 얼굴 영역 확장 (머리카락 포함)
+                expand = 0.5
+                x1 = max(0, int(x - w * expand))
+                y1 = max(0, int(y - h * expand * 1.2))  # 위쪽 더 확장 (이마/머리)
+                x2 = min(bg_array.shape[1], int(x + w + w * expand))
+                y2 = min(bg_array.shape[0], int(y + h + h * expand * 0.5))
+                target_bbox = (x1, y1, x2, y2)
+                print(f"   타겟 얼굴 영역: {target_bbox}")
 
         if target_bbox is None:
             print("   ⚠️ 배경에서 얼굴을 찾지 못했습니다. Pre-paste 건너뜀.")
@@ -709,31 +1149,38 @@ class AutoIDPhotoCompositor:
             cv2.putText(target_vis, "Target Face Area", (x1, y1-10),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
             target_vis_path = os.path.join(run_folder, "2.2_prepaste_target_area.png")
-            Image.fromarray(target_vis).save(target_vis_path)
+            self._save_debug_image(target_vis, target_vis_path)
             print(f"   Pre-paste 타겟 영역 저장: {os.path.basename(target_vis_path)}")
 
-        # 소스 얼굴에서 얼굴 영역 감지
-        src_bgr = src_array[:, :, ::-1]
+        # 소스 얼굴에서 얼굴 영역 감지 (전처리 bbox가 있으면 재사용)
         src_bbox = None
-        if self.face_cascade is not None:
-            gray = cv2.cvtColor(src_bgr, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-            if len(faces) > 0:
-                sx, sy, sw, sh = max(faces, key=lambda f: f[2] * f[3])
-                # 얼굴 영역 확장
-                expand = 0.4
-                sx1 = max(0, int(sx - sw * expand))
-                sy1 = max(0, int(sy - sh * expand * 1.0))
-                sx2 = min(src_array.shape[1], int(sx + sw + sw * expand))
-                sy2 = min(src_array.shape[0], int(sy + sh + sh * expand * 0.3))
-                src_bbox = (sx1, sy1, sx2, sy2)
+        if source_face_box is not None:
+            bx1, by1, bx2, by2 = source_face_box
+            src_face = (bx1, by1, bx2 - bx1, by2 - by1)
+        else:
+            src_face = detect_face_box(getattr(self, "face_cascade", None), src_array)
+        if src_face is not None:
+            sx, sy, sw, sh = src_face
+            # 얼굴 영역 확장
+            expand = 0.4
+            sx1 = max(0, int(sx - sw * expand))
+            sy1 = max(0, int(sy - sh * expand * 1.0))
+            sx2 = min(src_array.shape[1], int(sx + sw + sw * expand))
+            sy2 = min(src_array.shape[0], int(sy + sh + sh * expand * 0.3))
+            src_bbox = (sx1, sy1, sx2, sy2)
+
+        # 전처리 세그멘테이션은 소스 이미지와 같은 크기일 때만 사용
+        if source_seg_map is not None and source_seg_map.shape[:2] != src_array.shape[:2]:
+            source_seg_map = None
 
         # 소스 얼굴 크롭 및 리사이즈
         if src_bbox:
             sx1, sy1, sx2, sy2 = src_bbox
             src_cropped = src_array[sy1:sy2, sx1:sx2]
+            src_seg_cropped = source_seg_map[sy1:sy2, sx1:sx2] if source_seg_map is not None else None
         else:
             src_cropped = src_array
+            src_seg_cropped = source_seg_map
 
         # 타겟 크기에 맞게 리사이즈
         src_resized = cv2.resize(src_cropped, (target_w, target_h), interpolation=cv2.INTER_LANCZOS4)
@@ -741,15 +1188,15 @@ class AutoIDPhotoCompositor:
         # 디버깅: 크롭/리사이즈된 소스 얼굴 저장
         if run_folder:
             cropped_path = os.path.join(run_folder, "2.3_prepaste_source_cropped.png")
-            Image.fromarray(src_cropped).save(cropped_path)
+            self._save_debug_image(src_cropped, cropped_path)
             print(f"   Pre-paste 크롭된 소스 저장: {os.path.basename(cropped_path)}")
 
             resized_path = os.path.join(run_folder, "2.4_prepaste_source_resized.png")
-            Image.fromarray(src_resized).save(resized_path)
+            self._save_debug_image(src_resized, resized_path)
             print(f"   Pre-paste 리사이즈된 소스 저장: {os.path.basename(resized_path)}")
 
-        # 블렌딩
-        result = bg_array.copy()
+        # 블렌딩 (bg_array는 PIL에서 새로 만든 배열 -> 복사 없이 제자리 합성)
+        result = bg_array
 
         if blend_mode == "seamless":
             # OpenCV seamlessClone 사용
@@ -766,7 +1213,8 @@ class AutoIDPhotoCompositor:
                             include_hair=True,
                             include_neck=False,
                             blur_radius=0,  # 블러 없이 (나중에 별도로 적용)
-                            expand_ratio=1.0  # 확장 없이 정확한 영역만
+                            expand_ratio=1.0,  # 확장 없이 정확한 영역만
+                            seg_map=src_seg_cropped  # 전처리 세그멘테이션 크롭 (None이면 추론)
                         )
                         if bisenet_mask is not None:
                             # 마스크를 numpy 배열로 변환
@@ -775,7 +1223,7 @@ class AutoIDPhotoCompositor:
                             # 디버깅: BiSeNet 원본 마스크 저장 (리사이즈 전)
                             if run_folder:
                                 raw_mask_path = os.path.join(run_folder, "2.5a_prepaste_bisenet_raw_mask.png")
-                                Image.fromarray(bisenet_mask_array).save(raw_mask_path)
+                                self._save_debug_image(bisenet_mask_array, raw_mask_path)
                                 print(f"   BiSeNet 원본 마스크 저장: {os.path.basename(raw_mask_path)}")
 
                             # 타겟 크기에 맞게 리사이즈
@@ -784,7 +1232,7 @@ class AutoIDPhotoCompositor:
                             # 디버깅: 리사이즈된 마스크 저장 (블러 전)
                             if run_folder:
                                 resized_mask_path = os.path.join(run_folder, "2.5b_prepaste_mask_resized.png")
-                                Image.fromarray(mask).save(resized_mask_path)
+                                self._save_debug_image(mask, resized_mask_path)
                                 print(f"   리사이즈 마스크 저장: {os.path.basename(resized_mask_path)}")
 
                             # seamlessClone을 위해 완전 이진 마스크로 변환
@@ -815,16 +1263,9 @@ class AutoIDPhotoCompositor:
                 # 디버깅: 블렌딩 마스크 저장
                 if run_folder:
                     mask_path = os.path.join(run_folder, "2.5_prepaste_blend_mask.png")
-                    Image.fromarray(mask).save(mask_path)
+                    self._save_debug_image(mask, mask_path)
                     print(f"   Pre-paste 블렌딩 마스크 저장: {os.path.basename(mask_path)}")
 
-                # seamlessClone center 계산
-                clone_center = (x1 + target_w // 2, y1 + target_h // 2)
-
-                # BGR 변환
-                result_bgr = result[:, :, ::-1].copy()
-                src_resized_bgr = src_resized[:, :, ::-1]
-
                 # seamlessClone용 완전 이진 마스크 확인 (이미 이진화됨)
                 binary_mask = mask.copy()
                 # 혹시 모르니 한번 더 이진화 보장
@@ -845,16 +1286,12 @@ class AutoIDPhotoCompositor:
                 # 디버깅: 최종 이진 마스크 저장
                 if run_folder:
                     binary_mask_path = os.path.join(run_folder, "2.5c_prepaste_binary_mask.png")
-                    Image.fromarray(binary_mask).save(binary_mask_path)
+                    self._save_debug_image(binary_mask, binary_mask_path)
                     print(f"   최종 이진 마스크 저장: {os.path.basename(binary_mask_path)}")
 
-                # Seamless clone
-                print(f"   seamlessClone 호출: src={src_resized_bgr.shape}, dst={result_bgr.shape}, mask={binary_mask.shape}, center={clone_center}")
-                result_bgr = cv2.seamlessClone(
-                    src_resized_bgr, result_bgr, binary_mask,
-                    clone_center, cv2.NORMAL_CLONE
-                )
-                result = result_bgr[:, :, ::-1]
+                # Seamless clone (패딩된 ROI 안에서만, RGB 그대로)
+                print(f"   seamlessClone 호출 (ROI): src={src_resized.shape}, mask={binary_mask.shape}, at=({x1}, {y1})")
+                seamless_clone_roi(result, src_resized, binary_mask, (x1, y1))
                 print("   ✅ Seamless clone 적용 완료 (불투명 합성)")
 
             except Exception as e:
@@ -897,6 +1334,30 @@ class AutoIDPhotoCompositor:
 
         return Image.fromarray(result)
 
+    def _background_face_box(self, background_path, background_img):
+        """
+        레퍼런스 배경 얼굴 감지 (경로/수정 시각/크기별 캐시 -> 배치 내 같은 레퍼런스는 한 번만 감지)
+
+        Returns:
+            (x, y, w, h) 또는 None
+        """
+        try:
+            key = (os.path.abspath(background_path), os.path.getmtime(background_path), background_img.size)
+        except OSError:
+            return detect_face_box(getattr(self, "face_cascade", None), np.asarray(background_img))
+
+        with self._face_box_lock:
+            if key in self._face_box_cache:
+                self._face_box_cache.move_to_end(key)
+                return self._face_box_cache[key]
+
+        box = detect_face_box(getattr(self, "face_cascade", None), np.asarray(background_img))
+        with self._face_box_lock:
+            self._face_box_cache[key] = box
+            while len(self._face_box_cache) > PRE_PASTE_BOX_CACHE_SIZE:
+                self._face_box_cache.popitem(last=False)
+        return box
+
     def _apply_face_swap(
         self,
         result_image: Image.Image,
@@ -912,11 +1373,11 @@ class AutoIDPhotoCompositor:
             run_folder: 중간 결과 저장 폴더 (디버깅용)
 
         Returns:
-            Face swap이 적용된 이미지 (PIL Image)
+            (Face swap이 적용된 이미지, 교체된 얼굴의 5점 랜드마크 또는 None)
         """
         if self.face_swapper is None:
             print("   ⚠️ FaceSwapper가 초기화되지 않았습니다.")
-            return result_image
+            return result_image, None
 
         # Use stored model name
         model_name = self.face_swap_model_name or self.face_swap_model
@@ -925,39 +1386,71 @@ class AutoIDPhotoCompositor:
         # 디버깅: 소스 얼굴 저장
         if run_folder:
             src_path = os.path.join(run_folder, "6.0_faceswap_source.png")
-            source_face_img.save(src_path)
+            self._save_debug_image(source_face_img, src_path)
             print(f"   Face Swap 소스 얼굴 저장: {os.path.basename(src_path)}")
 
         try:
-            swapped = self.face_swapper.swap_face(result_image, source_face_img)
+            face_kps = None
+            if isinstance(self.face_swapper, FaceSwapper):
+                # 타겟 얼굴 랜드마크 반환 (Face Enhance ROI 처리에 재사용)
+                swapped, target_face = self.face_swapper.swap_face(
+                    result_image, source_face_img, return_target_face=True)
+                if target_face is not None:
+                    face_kps = target_face.kps
+            else:
+                swapped = self.face_swapper.swap_face(result_image, source_face_img)
+            if hasattr(self.face_swapper, "fallback_stats"):
+                # Ghost: InsightFace 폴백 비율 (상주 폴백 스와퍼 재사용)
+                stats = self.face_swapper.fallback_stats()
+                print(f"   Ghost 통계: ghost={stats['ghost']}, 폴백={stats['fallback_total']} ({stats['fallback_rate']:.0%})")
             if swapped is not None:
                 print("   Face Swap 완료!")
                 # 디버깅: Face Swap 결과 저장
                 if run_folder:
                     swap_result_path = os.path.join(run_folder, "6.1_faceswap_result.png")
-                    swapped.save(swap_result_path)
+                    self._save_debug_image(swapped, swap_result_path)
                     print(f"   Face Swap 결과 저장: {os.path.basename(swap_result_path)}")
-                return swapped
+                return swapped, face_kps
             else:
                 print("   ⚠️ Face Swap 실패, 원본 결과 반환")
-                return result_image
+                return result_image, None
         except Exception as e:
             print(f"   ⚠️ Face Swap 오류: {e}")
-            return result_image
+            return result_image, None
+
+    def _detect_face_kps(self, image: Image.Image):
+        """이미 로드된 InsightFace로 얼굴 5점 랜드마크 검출 (없으면 None)"""
+        try:
+            analyzer = getattr(self.face_swapper, "face_analyzer", None)
+            if analyzer is not None:
+                faces = analyzer.get(np.array(image)[:, :, ::-1].copy())
+                if len(faces) == 0:
+                    return None
+                return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1])).kps
+            if self.face_id_extractor is not None:
+                face = self.face_id_extractor.detect_face(image)
+                return face.kps if face is not None else None
+        except Exception as e:
+            print(f"   랜드마크 검출 실패: {e}")
+        return None
 
     def _apply_face_enhance(
         self,
         result_image: Image.Image,
         strength: float = 0.8,
-        run_folder: str = None
+        run_folder: str = None,
+        face_kps=None
     ) -> Image.Image:
         """
         GFPGAN으로 얼굴 화질 개선
 
+        랜드마크가 있으면 얼굴 ROI만 정렬/복원 (GFPGAN 자체 RetinaFace 검출 생략)
+
         Args:
             result_image: 입력 이미지 (PIL Image)
             strength: 개선 강도 (0.0=원본, 1.0=완전 개선)
             run_folder: 중간 결과 저장 폴더 (디버깅용)
+            face_kps: 얼굴 5점 랜드마크 (None이면 로드된 InsightFace로 검출 시도)
 
         Returns:
             화질 개선된 이미지 (PIL Image)
@@ -969,7 +1462,14 @@ class AutoIDPhotoCompositor:
             return result_image
 
         try:
-            if strength >= 1.0:
+            if face_kps is None:
+                face_kps = self._detect_face_kps(result_image)
+
+            if face_kps is not None:
+                # ROI 개선 (정렬된 얼굴 크롭만 복원 후 ROI 내에서 블렌딩)
+                enhanced = self.face_enhancer.enhance_face_region(
+                    result_image, blend_ratio=min(strength, 1.0), kps=face_kps)
+            elif strength >= 1.0:
                 # 완전 개선
                 enhanced = self.face_enhancer.enhance(result_image, only_center_face=True, paste_back=True)
             else:
@@ -981,7 +1481,7 @@ class AutoIDPhotoCompositor:
                 # 디버깅: Face Enhance 결과 저장
                 if run_folder:
                     enhance_result_path = os.path.join(run_folder, "6.2_face_enhance_result.png")
-                    enhanced.save(enhance_result_path)
+                    self._save_debug_image(enhanced, enhance_result_path)
                     print(f"   Face Enhance 결과 저장: {os.path.basename(enhance_result_path)}")
                 return enhanced
             else:
@@ -1001,23 +1501,27 @@ class AutoIDPhotoCompositor:
         guidance_scale: float = 7.5,
         num_steps: int = 20,
         seed: int = None,
-        run_folder: str = None
+        run_folder: str = None,
+        prompt_kwargs: dict = None,
+        refine_size: int = SWAP_REFINE_SIZE
     ) -> Image.Image:
         """
         Face Swap 후 얼굴 영역에 경미한 인페인팅으로 자연스럽게 블렌딩
 
         Face Swap은 얼굴을 교체하지만 경계가 부자연스러울 수 있음.
-        이 메서드는 얼굴 영역에만 낮은 denoising으로 가볍게 인페인팅하여
-        자연스러운 블렌딩을 달성함.
+        이 메서드는 얼굴 마스크 주변 크롭만 축소 해상도로 가볍게 인페인팅한 뒤
+        페더링된 마스크로 원본에 합성하여 자연스러운 블렌딩을 달성함.
 
         Args:
             swapped_image: Face Swap이 적용된 이미지 (PIL Image)
-            prompt: 인페인팅 프롬프트
+            prompt: 인페인팅 프롬프트 (prompt_kwargs가 없을 때만 사용)
             denoising_strength: Denoising 강도 (0.1~0.5 권장, 낮을수록 원본 유지)
             guidance_scale: 가이던스 스케일
-            num_steps: 추론 스텝 수 (빠른 정제를 위해 적은 스텝 사용)
+            num_steps: 스케줄 스텝 수 (실제 디노이징은 num_steps * denoising_strength 스텝)
             seed: 랜덤 시드
             run_folder: 중간 결과 저장 폴더 (디버깅용)
+            prompt_kwargs: 메인 생성의 프롬프트 임베딩 (_encode_prompt 결과, 재인코딩 생략)
+            refine_size: 크롭 생성 해상도 (긴 변)
 
         Returns:
             정제된 이미지 (PIL Image)
@@ -1031,17 +1535,9 @@ class AutoIDPhotoCompositor:
 
         # BiSeNet으로 얼굴 마스크 생성
         if self.face_parser is None:
-            print("   ⚠️ BiSeNet이 없어 전체 이미지 리파인먼트를 수행합니다.")
+            print("   ⚠️ BiSeNet이 없어 중앙 영역 리파인먼트를 수행합니다.")
             # BiSeNet이 없으면 간단한 중앙 영역 마스크 사용
-            w, h = swapped_image.size
-            mask = Image.new("L", (w, h), 0)
-            # 중앙 60% 영역에 마스크
-            margin_x = int(w * 0.2)
-            margin_y = int(h * 0.15)
-            for y in range(margin_y, h - margin_y):
-                for x in range(margin_x, w - margin_x):
-                    mask.putpixel((x, y), 255)
-            mask = mask.filter(ImageFilter.GaussianBlur(radius=30))
+            mask = self._center_refinement_mask(swapped_image.size)
         else:
             try:
                 # BiSeNet으로 정확한 얼굴 마스크 생성 (얼굴만, 머리카락 제외)
@@ -1058,21 +1554,44 @@ class AutoIDPhotoCompositor:
                     raise ValueError("BiSeNet failed to generate mask")
             except Exception as e:
                 print(f"   ⚠️ 마스크 생성 실패: {e}, 중앙 영역 마스크 사용")
-                w, h = swapped_image.size
-                mask = Image.new("L", (w, h), 0)
-                margin_x = int(w * 0.2)
-                margin_y = int(h * 0.15)
-                for y in range(margin_y, h - margin_y):
-                    for x in range(margin_x, w - margin_x):
-                        mask.putpixel((x, y), 255)
-                mask = mask.filter(ImageFilter.GaussianBlur(radius=30))
+                mask = self._center_refinement_mask(swapped_image.size)
 
         # 마스크 저장 (디버깅용)
         if run_folder:
             refinement_mask_path = os.path.join(run_folder, "6.3_swap_refinement_mask.png")
-            mask.save(refinement_mask_path)
+            self._save_debug_image(mask, refinement_mask_path)
             print(f"   Refinement 마스크 저장: {os.path.basename(refinement_mask_path)}")
 
+        # 마스크 주변 크롭 영역 (블렌딩용 컨텍스트 25% 포함)
+        mask = mask.convert("L")
+        mask_np = np.array(mask)
+        ys, xs = np.nonzero(mask_np > 8)
+        if len(xs) == 0:
+            print("   ⚠️ 리파인먼트 마스크가 비어 있음, 원본 반환")
+            return swapped_image
+
+        img_w, img_h = swapped_image.size
+        pad = int(max(xs.max() - xs.min(), ys.max() - ys.min()) * 0.25)
+        box = (
+            max(int(xs.min()) - pad, 0),
+            max(int(ys.min()) - pad, 0),
+            min(int(xs.max()) + 1 + pad, img_w),
+            min(int(ys.max()) + 1 + pad, img_h),
+        )
+        crop_w, crop_h = box[2] - box[0], box[3] - box[1]
+
+        # 축소 생성 해상도 (긴 변 refine_size, 8의 배수)
+        scale = refine_size / max(crop_w, crop_h)
+        gen_w = max(8, int(round(crop_w * scale / 8)) * 8)
+        gen_h = max(8, int(round(crop_h * scale / 8)) * 8)
+        crop_image = swapped_image.crop(box)
+        crop_mask = mask.crop(box)
+
+        # 실제 디노이징 스텝 = int(num_steps * strength) (최소 1)
+        if int(num_steps * denoising_strength) < 1:
+            num_steps = int(np.ceil(1 / max(denoising_strength, 1e-3)))
+        print(f"   크롭 {crop_w}x{crop_h} -> {gen_w}x{gen_h}, 디노이징 {int(num_steps * denoising_strength)} 스텝")
+
         # Generator 설정
         if seed is not None:
             generator = torch.Generator(device=self.device).manual_seed(seed)
@@ -1080,46 +1599,46 @@ class AutoIDPhotoCompositor:
             generator = None
 
         try:
-            # IP-Adapter가 로드된 경우, 제로 임베딩 전달 (정제 시에는 IP-Adapter 영향 없이)
-            pipeline_kwargs = {
-                "prompt": prompt,
-                "image": swapped_image,
-                "mask_image": mask,
+            # 메인 생성의 프롬프트 임베딩 재사용 (없으면 프롬프트 인코딩)
+            pipeline_kwargs = dict(prompt_kwargs) if prompt_kwargs else {"prompt": prompt}
+            pipeline_kwargs.update({
+                "image": crop_image.resize((gen_w, gen_h), Image.Resampling.LANCZOS),
+                "mask_image": crop_mask.resize((gen_w, gen_h), Image.Resampling.BILINEAR),
+                "width": gen_w,
+                "height": gen_h,
                 "num_inference_steps": num_steps,
                 "guidance_scale": guidance_scale,
                 "strength": denoising_strength,
                 "generator": generator,
-            }
+            })
 
-            # IP-Adapter가 로드된 상태면 임베딩 필요
-            if self.has_ip_adapter:
-                # IP-Adapter scale을 0으로 설정하여 영향 제거
-                original_scale = self.pipeline.get_ip_adapter_scale() if hasattr(self.pipeline, 'get_ip_adapter_scale') else None
-                self.pipeline.set_ip_adapter_scale(0.0)
+            # IP-Adapter가 로드된 상태면 분리 (scale 0 + 제로 임베딩 대신 이미지 토큰 자체를 제거)
+            ip_bypass = bypass_ip_adapter(self.pipeline.unet) if self.has_ip_adapter else None
 
-                # 제로 임베딩 전달 (FaceID Plus v2: shape (2, 1, 512))
-                zero_embedding = torch.zeros(2, 1, 512, dtype=self.dtype, device=self.device)
-                pipeline_kwargs["ip_adapter_image_embeds"] = [zero_embedding]
-
-            # 인페인팅 수행 (낮은 denoising으로 가벼운 정제)
-            result = self.pipeline(**pipeline_kwargs)
-
-            # IP-Adapter scale 복원
-            if self.has_ip_adapter and original_scale is not None:
-                self.pipeline.set_ip_adapter_scale(original_scale)
+            # 인페인팅 수행 (낮은 denoising으로 가벼운 정제, 메인 생성의 캐시 특징은 버림)
+            if self.unet_cache is not None:
+                self.unet_cache.reset()
+            try:
+                with autocast_context(self.performance):
+                    result = self.pipeline(**pipeline_kwargs)
+            finally:
+                restore_ip_adapter(self.pipeline.unet, ip_bypass)
 
-            refined_image = result.images[0]
+            refined_crop = result.images[0].resize((crop_w, crop_h), Image.Resampling.LANCZOS)
 
-            # 크기가 다르면 복원
-            if refined_image.size != swapped_image.size:
-                refined_image = refined_image.resize(swapped_image.size, Image.Resampling.LANCZOS)
+            # 페더링된 마스크로 크롭 영역에만 합성 (마스크 밖은 원본 유지)
+            alpha = (np.array(crop_mask).astype(np.float32) / 255.0)[:, :, None]
+            blended = np.array(crop_image).astype(np.float32) * (1 - alpha) + \
+                np.array(refined_crop).astype(np.float32) * alpha
+            refined_image = swapped_image.copy()
+            refined_image.paste(Image.fromarray(np.clip(blended, 0, 255).astype(np.uint8)), box[:2])
 
             print(f"   Swap Refinement 완료!")
 
             # 결과 저장 (디버깅용)
             if run_folder:
                 refinement_result_path = os.path.join(run_folder, "6.4_swap_refinement_result.png")
-                refined_image.save(refinement_result_path)
+                self._save_debug_image(refined_image, refinement_result_path)
                 print(f"   Refinement 결과 저장: {os.path.basename(refinement_result_path)}")
 
             return refined_image
@@ -1130,6 +1649,45 @@ class AutoIDPhotoCompositor:
             traceback.print_exc()
             return swapped_image
 
+    @staticmethod
+    def _center_refinement_mask(size):
+        """중앙 영역 마스크 (가로 60%, 세로 70%, 블러 처리) - BiSeNet 없을 때 사용"""
+        w, h = size
+        mask_np = np.zeros((h, w), dtype=np.uint8)
+        margin_x = int(w * 0.2)
+        margin_y = int(h * 0.15)
+        mask_np[margin_y:h - margin_y, margin_x:w - margin_x] = 255
+        return Image.fromarray(mask_np).filter(ImageFilter.GaussianBlur(radius=30))
+
+    def _encode_prompt(self, prompt, negative_prompt, guidance_scale):
+        """
+        프롬프트 임베딩 사전 계산 (메인 생성과 Swap Refinement에서 공유)
+
+        Returns:
+            파이프라인 호출용 kwargs (prompt_embeds 등, 실패 시 원문 프롬프트)
+        """
+        try:
+            with torch.no_grad():
+                encoded = self.pipeline.encode_prompt(
+                    prompt=prompt,
+                    device=self.device,
+                    num_images_per_prompt=1,
+                    do_classifier_free_guidance=guidance_scale > 1.0,
+                    negative_prompt=negative_prompt
+                )
+            if len(encoded) == 4:
+                # SDXL: (prompt, negative, pooled, negative pooled)
+                return {
+                    "prompt_embeds": encoded[0],
+                    "negative_prompt_embeds": encoded[1],
+                    "pooled_prompt_embeds": encoded[2],
+                    "negative_pooled_prompt_embeds": encoded[3],
+                }
+            return {"prompt_embeds": encoded[0], "negative_prompt_embeds": encoded[1]}
+        except Exception as e:
+            print(f"   프롬프트 사전 인코딩 실패 ({e}) - 파이프라인 내부 인코딩 사용")
+            return {"prompt": prompt, "negative_prompt": negative_prompt}
+
     def _create_face_hair_composite(
         self,
         source_face: Image.Image,
@@ -1268,7 +1826,8 @@ class AutoIDPhotoCompositor:
             largest_face = max(faces, key=lambda f: f[2] * f[3])
             return tuple(largest_face)
 
-    def create_face_mask(self, image_path, expand_ratio=0.3, feather=15, include_hair=True, include_neck=False):
+    def create_face_mask(self, image_path, expand_ratio=0.3, feather=15, include_hair=True, include_neck=False,
+                         crop_aware=False):
         """
         이미지에서 얼굴 자동 감지 후 마스크 생성
 
@@ -1278,12 +1837,22 @@ class AutoIDPhotoCompositor:
             feather: 경계 블러
             include_hair: 머리카락 포함 여부 (BiSeNet 사용 시)
             include_neck: 목 포함 여부 (BiSeNet 사용 시)
+            crop_aware: 크롭 인식 파싱 (감지된 얼굴 주변 정사각형만 512로 파싱, 큰 레퍼런스의 작은 얼굴용)
 
         Returns:
             마스크 (PIL Image) 또는 None
         """
         print(f"얼굴 감지 중: {os.path.basename(image_path)}")
 
+        # 크롭 인식 파싱은 얼굴 감지를 먼저 수행 (타원 마스크 fallback에서 재사용)
+        face_bbox = None
+        detected = False
+        if crop_aware and self.use_bisenet and self.face_parser is not None:
+            face_bbox = self.detect_face(image_path)
+            detected = True
+            if face_bbox is None:
+                print("   크롭 인식 파싱: 얼굴 미검출, 전체 이미지 파싱")
+
         # BiSeNet으로 머리카락 포함 마스크 생성 시도
         if self.use_bisenet and self.face_parser is not None:
             try:
@@ -1294,7 +1863,8 @@ class AutoIDPhotoCompositor:
                     include_hair=include_hair,
                     include_neck=include_neck,
                     blur_radius=feather,
-                    expand_ratio=1.0 + expand_ratio  # 1.3 for 0.3 expand
+                    expand_ratio=1.0 + expand_ratio,  # 1.3 for 0.3 expand
+                    face_box=face_bbox  # None이면 전체 이미지를 512로 파싱
                 )
                 if bisenet_mask is not None:
                     parts = []
@@ -1311,7 +1881,8 @@ class AutoIDPhotoCompositor:
                 print(f"BiSeNet 오류: {e}, 타원 마스크로 전환")
 
         # Fallback: 타원형 마스크
-        face_bbox = self.detect_face(image_path)
+        if not detected:
+            face_bbox = self.detect_face(image_path)
 
         if face_bbox is None:
             print("얼굴을 찾을 수 없습니다!")
@@ -1355,121 +1926,118 @@ class AutoIDPhotoCompositor:
 
         return Image.fromarray(mask)
 
-    def composite_face_auto(
+    def _resolve_prompt(self, prompt, prompt_future=None, prompt_deadline=None):
+        """자동 프롬프트 Future 결과 대기 (마감 시각 초과/실패 시 prompt 그대로 사용)
+
+        확정된 프롬프트는 self.resolved_prompt에 기록됨
+        """
+        if prompt_future is not None:
+            timeout = None
+            if prompt_deadline is not None:
+                timeout = max(0.0, prompt_deadline - time.monotonic())
+
+            wait_start = time.monotonic()
+            try:
+                generated = prompt_future.result(timeout=timeout)
+            except FutureTimeoutError:
+                print(f"   자동 프롬프트 시간 초과 - 기본 프롬프트 사용")
+                generated = None
+            except Exception as e:
+                print(f"   자동 프롬프트 생성 실패: {e} - 기본 프롬프트 사용")
+                generated = None
+
+            waited = time.monotonic() - wait_start
+            if generated:
+                prompt = generated
+                print(f"   생성된 프롬프트: {prompt} (대기 {waited:.2f}s)")
+            print(f"GENERATED_PROMPT:{prompt}", flush=True)
+
+        self.resolved_prompt = prompt
+        return prompt
+
+    def _save_debug_image(self, image, path):
+        """디버그/중간 이미지 저장 (백그라운드 스레드, 빠른 PNG 압축)"""
+        self.artifact_writer.save(image, path)
+
+    def _get_face_embedding(self, source_face, face_artifacts=None):
+        """InsightFace 얼굴 임베딩 (1, 512)
+
+        업로드 시 전처리된 임베딩이 있으면 재사용 (검출 결과가 기록된 경우 재검출 안 함)
+        """
+        if face_artifacts is not None and face_artifacts.face_detected is not None:
+            if face_artifacts.embedding is None:
+                print("   전처리 아티팩트: 얼굴 미검출")
+                return None
+            print("   InsightFace 임베딩: 전처리 아티팩트 사용")
+            return torch.from_numpy(face_artifacts.embedding).unsqueeze(0).to(
+                dtype=self.dtype, device=self.device)
+
+        return self.face_id_extractor.get_embedding_for_ip_adapter(
+            source_face,
+            dtype=self.dtype,
+            device=self.device
+        )
+
+    def prepare_composite(
         self,
         background_path,
         source_face_path,
-        prompt="professional portrait, natural expression",
-        output_path="output.png",
-        face_strength=0.85,
-        denoising_strength=0.92,
-        num_inference_steps=50,
-        guidance_scale=7.5,
         mask_expand=0.3,
         mask_blur=15,
-        seed=None,
-        save_mask=False,
-        use_source_size=True,
         include_hair=True,
         include_neck=False,
         auto_detect_gender=True,
-        face_blend_weight=0.8,
-        hair_blend_weight=0.2,
         mask_padding=0,
-        run_folder=None,
-        stop_at=1.0,
-        shortcut_scale=1.0,
-        save_preview=False,
         use_pre_paste=None,
-        pre_paste_denoising=0.65,
-        use_face_swap=None,
-        use_face_enhance=None,
-        face_enhance_strength=0.8,
-        use_swap_refinement=None,
-        swap_refinement_strength=0.3
+        face_artifacts=None,
+        debug_folder=None,
+        crop_aware_parsing=False
     ):
         """
-        자동 얼굴 합성 (머리카락/목 포함)
+        합성 입력 준비 (CPU 단계: 디코딩, 얼굴 감지, BiSeNet, 머리카락 추출, Pre-paste, 얼굴 임베딩)
+
+        파이프라인 상태(IP-Adapter 스케일, projection layer)는 변경하지 않으므로
+        composite_batch에서 이전 작업의 디퓨전과 동시에 실행 가능
 
         Args:
             background_path: 레퍼런스 배경 (얼굴이 있는 증명사진)
             source_face_path: 합성할 얼굴 이미지
-            prompt: 프롬프트
-            output_path: 출력 경로
-            face_strength: 얼굴 반영 강도
-            denoising_strength: 생성 강도
-            num_inference_steps: 생성 스텝
-            guidance_scale: 가이던스
             mask_expand: 마스크 확장 비율
             mask_blur: 마스크 블러
-            seed: 랜덤 시드
-            save_mask: 마스크 저장 여부
-            use_source_size: 원본 얼굴 이미지 크기 사용 (True=원본 크기 유지)
-            include_hair: 머리카락 포함 마스킹 (BiSeNet 사용)
-            include_neck: 목 포함 마스킹 (BiSeNet 사용)
+            include_hair: 머리카락 포함 마스킹
+            include_neck: 목 포함 마스킹
             auto_detect_gender: 머리카락으로 성별 힌트 자동 감지
-            face_blend_weight: CLIP Blending 시 얼굴 가중치 (기본: 0.6)
-            hair_blend_weight: CLIP Blending 시 머리카락 가중치 (기본: 0.4)
             mask_padding: 마스크 패딩 픽셀 (양수=확장, 음수=축소)
-            stop_at: FaceID 적용 중단 시점 (0.0~1.0, 기본: 1.0=끝까지)
             use_pre_paste: Pre-paste 사용 여부 (None이면 클래스 설정 사용)
-            pre_paste_denoising: Pre-paste 시 denoising strength (기본: 0.65)
-            use_face_swap: Face Swap 사용 여부 (None이면 클래스 설정 사용)
-            use_face_enhance: Face Enhance 사용 여부 (None이면 클래스 설정 사용)
-            face_enhance_strength: Face Enhance 강도 (0.0~1.0, 기본: 0.8)
-            use_swap_refinement: Face Swap Refinement 사용 여부 (None이면 클래스 설정 사용)
-            swap_refinement_strength: Swap Refinement 강도 (0.1~0.5, 기본: 0.3)
+            face_artifacts: 업로드 시 전처리된 FaceArtifacts (None이면 직접 계산)
+            debug_folder: 중간 결과 저장 폴더 (None이면 저장 안 함)
+            crop_aware_parsing: 배경 마스크 BiSeNet을 얼굴 주변 크롭에서만 실행 (작은 얼굴의 마스크 해상도 향상)
 
         Returns:
-            합성된 이미지 (PIL Image)
+            준비된 입력 dict (composite_face_auto의 prepared 인자) 또는 None (배경 얼굴 미검출)
         """
-        if not self.has_ip_adapter:
-            print("IP-Adapter가 필요합니다!")
-            return None
-
-        # Pre-paste / Face Swap / Face Enhance / Swap Refinement 플래그 해결 (None이면 클래스 설정 사용)
         apply_pre_paste = use_pre_paste if use_pre_paste is not None else self.use_pre_paste
-        apply_face_swap = use_face_swap if use_face_swap is not None else self.use_face_swap
-        apply_face_enhance = use_face_enhance if use_face_enhance is not None else self.use_face_enhance
-        apply_swap_refinement = use_swap_refinement if use_swap_refinement is not None else self.use_swap_refinement
-
-        # Pre-paste 시 denoising strength 자동 조정
-        actual_denoising = denoising_strength
-        if apply_pre_paste:
-            actual_denoising = pre_paste_denoising
-            print(f"\n📋 Pre-paste 모드: denoising {denoising_strength} -> {actual_denoising}")
-
-        # Preview 설정
-        self.save_preview = save_preview
-        if save_preview:
-            # Preview 파일 경로 설정
-            base_path = output_path.replace('.png', '')
-            self.preview_path = f"{base_path}_preview.png"
-
-        print("=" * 70)
-        mode_str = "자동 얼굴 합성 (머리카락 포함)" if include_hair else "자동 얼굴 합성"
-        if apply_pre_paste:
-            mode_str += " + Pre-paste"
-        if apply_face_swap:
-            mode_str += " + Face Swap"
-        if apply_swap_refinement:
-            mode_str += " + Swap Refinement"
-        if apply_face_enhance:
-            mode_str += " + Face Enhance"
-        print(mode_str)
-        print("=" * 70)
 
         # 1. 원본 얼굴 이미지 로드 (크기 결정용)
         print("\n원본 얼굴 이미지 로딩...")
-        source_face = Image.open(source_face_path).convert("RGB")
-        src_w, src_h = source_face.size
+        if face_artifacts is not None:
+            # 업로드 시 전처리된 작업 해상도 사본 사용 (검출/임베딩/세그멘테이션 재사용)
+            source_face = face_artifacts.working_image
+            src_w, src_h = face_artifacts.source_size
+            print(f"   전처리 아티팩트 사용: {face_artifacts.key[:12]} (작업 크기: {source_face.size[0]}x{source_face.size[1]})")
+        else:
+            source_face = Image.open(source_face_path).convert("RGB")
+            src_w, src_h = source_face.size
         print(f"   원본 얼굴 크기: {src_w}x{src_h}")
 
+        # 전처리된 BiSeNet 세그멘테이션 (없으면 None -> 직접 추론)
+        source_seg_map = face_artifacts.segmentation if face_artifacts is not None else None
+
         # 1.5. 성별 힌트 자동 감지 (머리카락 기반)
         gender_hint = ""
         if auto_detect_gender and self.use_bisenet and self.face_parser is not None:
             try:
-                gender_hint = self.face_parser.detect_gender_from_hair(source_face)
+                gender_hint = self.face_parser.detect_gender_from_hair(source_face, seg_map=source_seg_map)
                 print(f"   머리카락 분석: {gender_hint}")
 
                 # 프롬프트에 성별 힌트 추가
@@ -1511,17 +2079,21 @@ class AutoIDPhotoCompositor:
 
         # 2.5. Pre-paste 적용 (소스 얼굴을 배경에 미리 붙여넣기)
         if apply_pre_paste:
+            # 얼굴 감지 재사용: 배경은 레퍼런스별 캐시, 소스는 전처리 bbox/세그멘테이션
             background_img = self._pre_paste_face(
                 background_img,
                 source_face,
                 target_bbox=None,
                 blend_mode="seamless",
-                run_folder=run_folder if save_mask else None
+                run_folder=debug_folder,
+                target_face_box=self._background_face_box(background_path, background_img),
+                source_face_box=face_artifacts.bbox if face_artifacts is not None else None,
+                source_seg_map=source_seg_map
             )
             # Pre-paste 최종 결과 저장 (디버깅용)
-            if save_mask and run_folder:
-                pre_paste_path = os.path.join(run_folder, "2.6_prepaste_final_result.png")
-                background_img.save(pre_paste_path)
+            if debug_folder:
+                pre_paste_path = os.path.join(debug_folder, "2.6_prepaste_final_result.png")
+                self._save_debug_image(background_img, pre_paste_path)
                 print(f"   Pre-paste 최종 결과 저장: {os.path.basename(pre_paste_path)}")
 
         # 3. 배경에서 얼굴 자동 감지 + 마스크 생성
@@ -1540,7 +2112,8 @@ class AutoIDPhotoCompositor:
             expand_ratio=mask_expand,
             feather=mask_blur,
             include_hair=include_hair,
-            include_neck=include_neck
+            include_neck=include_neck,
+            crop_aware=crop_aware_parsing
         )
 
         # 임시 파일 삭제
@@ -1568,13 +2141,9 @@ class AutoIDPhotoCompositor:
 
             face_mask = Image.fromarray(mask_array)
 
-        # 마스크 및 중간 결과 저장 (옵션)
-        if save_mask:
-            # run_folder가 있으면 해당 폴더에 저장, 없으면 기존 방식
-            if run_folder:
-                save_dir = run_folder
-            else:
-                save_dir = os.path.dirname(output_path) or '.'
+        # 마스크 및 중간 결과 저장 (debug 레벨 이상)
+        if debug_folder:
+            save_dir = debug_folder
 
             mask_array = np.array(face_mask.convert('L'))
             bg_array = np.array(background_img)
@@ -1586,19 +2155,24 @@ class AutoIDPhotoCompositor:
             overlay[mask_bool, 0] = np.clip(overlay[mask_bool, 0] * 0.5 + 127, 0, 255)  # Red
             overlay[mask_bool, 1] = (overlay[mask_bool, 1] * 0.5).astype(np.uint8)
             overlay[mask_bool, 2] = (overlay[mask_bool, 2] * 0.5).astype(np.uint8)
-            Image.fromarray(overlay).save(overlay_path)
+            self._save_debug_image(overlay, overlay_path)
             print(f"   마스크 오버레이 저장: {os.path.basename(overlay_path)}")
 
             # 4. Inpainting 입력 시각화 (마스크 영역 검정색으로 표시)
             inpaint_input_path = os.path.join(save_dir, "4_inpaint_input.png")
             inpaint_vis = bg_array.copy()
             inpaint_vis[mask_bool] = 0  # 마스크 영역 검정색
-            Image.fromarray(inpaint_vis).save(inpaint_input_path)
+            self._save_debug_image(inpaint_vis, inpaint_input_path)
             print(f"   Inpainting 입력 저장: {os.path.basename(inpaint_input_path)}")
 
         # 4. 머리카락 영역 추출 (IP-Adapter 입력용)
         hair_region = None
-        if include_hair and self.use_bisenet and self.face_parser is not None:
+        if include_hair and self.use_bisenet and source_seg_map is not None:
+            # 전처리 단계에서 이미 추출됨 (머리카락이 거의 없으면 None)
+            hair_region = face_artifacts.hair_region
+            if hair_region is not None:
+                print(f"   머리카락 영역: 전처리 아티팩트 사용 (IP-Adapter 입력용)")
+        elif include_hair and self.use_bisenet and self.face_parser is not None:
             try:
                 hair_region = self.face_parser.extract_hair_region(source_face)
                 if hair_region is not None:
@@ -1606,19 +2180,281 @@ class AutoIDPhotoCompositor:
             except Exception as e:
                 print(f"   머리카락 추출 실패: {e}")
 
-        # 5. 최종 크기 확인
-        print(f"\n최종 출력 크기: {target_size}")
-        # 6. 프롬프트 준비 (성별 힌트 포함)
-        full_prompt = (
-            f"professional ID photo, passport style photograph, "
-            f"{gender_hint}"
-            f"neutral background, studio lighting, front-facing portrait, "
-            f"sharp focus, high quality, even lighting, formal photograph, "
-            f"{prompt}"
+        # 생성 해상도: SDXL 최적 해상도로 스케일업 (최소 1024px, 비율 유지, 8의 배수)
+        orig_width, orig_height = background_img.size
+        min_size = 1024
+        scale = max(min_size / orig_width, min_size / orig_height, 1.0)
+        gen_width = (int(orig_width * scale) // 8) * 8
+        gen_height = (int(orig_height * scale) // 8) * 8
+
+        if scale > 1.0:
+            bg_for_gen = background_img.resize((gen_width, gen_height), Image.Resampling.LANCZOS)
+            mask_for_gen = face_mask.resize((gen_width, gen_height), Image.Resampling.LANCZOS)
+        else:
+            bg_for_gen = background_img
+            mask_for_gen = face_mask
+
+        # InsightFace 얼굴 임베딩 (FaceID 계열 모드에서만 사용)
+        face_embedding = None
+        uses_face_embedding = self.use_dual_adapter or self.use_faceid_plus or self.use_faceid
+        if (not self.no_ip_adapter and not self.use_clip_blend and uses_face_embedding
+                and self.face_id_extractor is not None):
+            face_embedding = self._get_face_embedding(source_face, face_artifacts)
+
+        return {
+            "source_face": source_face,
+            "gender_hint": gender_hint,
+            "background_img": background_img,
+            "face_mask": face_mask,
+            "hair_region": hair_region,
+            "target_size": target_size,
+            "bg_for_gen": bg_for_gen,
+            "mask_for_gen": mask_for_gen,
+            "gen_size": (gen_width, gen_height),
+            "face_embedding": face_embedding,
+        }
+
+    def _resolve_debug_folder(self, artifact_level, save_mask, run_folder, output_path):
+        """아티팩트 레벨 결정 및 디버그 저장 폴더 (debug/full 레벨에서만)"""
+        if artifact_level is None:
+            artifact_level = "debug" if save_mask else "result"
+        debug_folder = None
+        if artifact_level in ("debug", "full"):
+            debug_folder = run_folder or (os.path.dirname(output_path) or '.')
+        return artifact_level, debug_folder
+
+    def composite_batch(self, jobs, lookahead=1):
+        """
+        여러 합성 작업을 2단계 생산자/소비자 파이프라인으로 실행 (상주 워커용)
+
+        CPU 준비 단계(prepare_composite)는 백그라운드 스레드에서 최대 lookahead개 앞서 실행되고,
+        디퓨전 단계는 호출 스레드에서 순서대로 소비 -> 디퓨전 사이에 준비 대기 시간이 없음
+
+        Args:
+            jobs: composite_face_auto 키워드 인자 dict 리스트
+            lookahead: 미리 준비해 둘 최대 작업 수 (0이면 순차 실행)
+
+        Yields:
+            (작업 인덱스, 합성 이미지 또는 None)
+            작업에 postprocess_pool이 지정되면 합성 이미지 대신 후처리 Future
+        """
+        jobs = list(jobs)
+        lookahead = max(0, int(lookahead))
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="composite-prepare")
+        pending = {}
+
+        try:
+            for index, job in enumerate(jobs):
+                # 현재 작업 + lookahead개까지 준비 예약 (준비 스레드는 1개 -> 순서대로 처리)
+                for ahead in range(index, min(index + lookahead + 1, len(jobs))):
+                    if ahead not in pending:
+                        pending[ahead] = executor.submit(self._prepare_job, jobs[ahead])
+
+                try:
+                    prepared = pending.pop(index).result()
+                except Exception as e:
+                    print(f"   [Batch {index}] 입력 준비 실패: {e}")
+                    prepared = None
+
+                if prepared is None:
+                    yield index, None
+                    continue
+
+                yield index, self.composite_face_auto(**job, prepared=prepared)
+        finally:
+            for future in pending.values():
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _prepare_job(self, job):
+        """composite_batch 작업 dict -> prepare_composite 호출"""
+        _, debug_folder = self._resolve_debug_folder(
+            job.get("artifact_level"), job.get("save_mask", False),
+            job.get("run_folder"), job.get("output_path", "output.png")
+        )
+        return self.prepare_composite(
+            job["background_path"],
+            job["source_face_path"],
+            mask_expand=job.get("mask_expand", 0.3),
+            mask_blur=job.get("mask_blur", 15),
+            include_hair=job.get("include_hair", True),
+            include_neck=job.get("include_neck", False),
+            auto_detect_gender=job.get("auto_detect_gender", True),
+            mask_padding=job.get("mask_padding", 0),
+            use_pre_paste=job.get("use_pre_paste"),
+            face_artifacts=job.get("face_artifacts"),
+            debug_folder=debug_folder,
+            crop_aware_parsing=job.get("crop_aware_parsing", False)
         )
 
-        print(f"\n프롬프트: {gender_hint}{prompt}")
+    def composite_face_auto(
+        self,
+        background_path,
+        source_face_path,
+        prompt="professional portrait, natural expression",
+        output_path="output.png",
+        face_strength=0.85,
+        denoising_strength=0.92,
+        num_inference_steps=50,
+        guidance_scale=7.5,
+        mask_expand=0.3,
+        mask_blur=15,
+        seed=None,
+        save_mask=False,
+        use_source_size=True,
+        include_hair=True,
+        include_neck=False,
+        auto_detect_gender=True,
+        face_blend_weight=0.8,
+        hair_blend_weight=0.2,
+        mask_padding=0,
+        run_folder=None,
+        stop_at=1.0,
+        shortcut_scale=1.0,
+        save_preview=False,
+        use_pre_paste=None,
+        pre_paste_denoising=0.65,
+        use_face_swap=None,
+        use_face_enhance=None,
+        face_enhance_strength=0.8,
+        use_swap_refinement=None,
+        swap_refinement_strength=0.3,
+        face_artifacts=None,
+        artifact_level=None,
+        prompt_future=None,
+        prompt_deadline=None,
+        prepared=None,
+        postprocess_pool=None,
+        face_swap_model=None,
+        early_stop_threshold=0.0,
+        early_stop_patience=2,
+        unet_cache_interval=None,
+        cfg_cutoff=1.0,
+        crop_aware_parsing=False
+    ):
+        """
+        자동 얼굴 합성 (머리카락/목 포함)
+
+        Args:
+            background_path: 레퍼런스 배경 (얼굴이 있는 증명사진)
+            source_face_path: 합성할 얼굴 이미지
+            prompt: 프롬프트
+            output_path: 출력 경로
+            face_strength: 얼굴 반영 강도
+            denoising_strength: 생성 강도
+            num_inference_steps: 생성 스텝
+            guidance_scale: 가이던스
+            mask_expand: 마스크 확장 비율
+            mask_blur: 마스크 블러
+            seed: 랜덤 시드
+            save_mask: 마스크 저장 여부
+            use_source_size: 원본 얼굴 이미지 크기 사용 (True=원본 크기 유지)
+            include_hair: 머리카락 포함 마스킹 (BiSeNet 사용)
+            include_neck: 목 포함 마스킹 (BiSeNet 사용)
+            auto_detect_gender: 머리카락으로 성별 힌트 자동 감지
+            face_blend_weight: CLIP Blending 시 얼굴 가중치 (기본: 0.6)
+            hair_blend_weight: CLIP Blending 시 머리카락 가중치 (기본: 0.4)
+            mask_padding: 마스크 패딩 픽셀 (양수=확장, 음수=축소)
+            stop_at: FaceID 적용 중단 시점 (0.0~1.0, 기본: 1.0=끝까지)
+            use_pre_paste: Pre-paste 사용 여부 (None이면 클래스 설정 사용)
+            pre_paste_denoising: Pre-paste 시 denoising strength (기본: 0.65)
+            use_face_swap: Face Swap 사용 여부 (None이면 클래스 설정 사용)
+            use_face_enhance: Face Enhance 사용 여부 (None이면 클래스 설정 사용)
+            face_enhance_strength: Face Enhance 강도 (0.0~1.0, 기본: 0.8)
+            use_swap_refinement: Face Swap Refinement 사용 여부 (None이면 클래스 설정 사용)
+            swap_refinement_strength: Swap Refinement 강도 (0.1~0.5, 기본: 0.3)
+            face_artifacts: 업로드 시 전처리된 FaceArtifacts (face_artifacts.py, None이면 직접 계산)
+            artifact_level: 디버그 아티팩트 레벨 (none/result/debug/full, None이면 save_mask로 결정)
+            prompt_future: 자동 프롬프트 생성 Future (텍스트 인코딩 직전에 join, 실패/초과 시 prompt 사용)
+            prompt_deadline: prompt_future 대기 마감 시각 (time.monotonic 기준, None이면 무제한)
+            prepared: prepare_composite 결과 (None이면 여기서 준비)
+            postprocess_pool: postprocess.PostProcessPool (지정 시 Face Swap/Enhance를 워커 프로세스로 넘김)
+            face_swap_model: 후처리 풀에서 사용할 Face Swap 모델 (None이면 클래스 설정 사용)
+            early_stop_threshold: 조기 종료 임계값 (마스크 영역 latent 상대 변화량, 0이면 비활성)
+            early_stop_patience: 임계값 미만이 연속 몇 스텝이면 종료할지
+            unet_cache_interval: UNet 특징 캐시 갱신 간격 (None이면 현재 설정 유지, 0/1이면 해제)
+            cfg_cutoff: CFG 적용 구간 (0.0~1.0, 이후 스텝은 조건부만 절반 배치로 실행, 1.0=끝까지 CFG)
+            crop_aware_parsing: 배경 마스크 BiSeNet을 감지된 얼굴 주변 크롭에서만 실행
+
+        Returns:
+            합성된 이미지 (PIL Image)
+            postprocess_pool로 후처리를 넘긴 경우 Future (결과 상태 dict, output_path에 최종 이미지 저장)
+        """
+        if not self.has_ip_adapter:
+            print("IP-Adapter가 필요합니다!")
+            return None
+
+        # Pre-paste / Face Swap / Face Enhance / Swap Refinement 플래그 해결 (None이면 클래스 설정 사용)
+        apply_pre_paste = use_pre_paste if use_pre_paste is not None else self.use_pre_paste
+        apply_face_swap = use_face_swap if use_face_swap is not None else self.use_face_swap
+        apply_face_enhance = use_face_enhance if use_face_enhance is not None else self.use_face_enhance
+        apply_swap_refinement = use_swap_refinement if use_swap_refinement is not None else self.use_swap_refinement
+
+        # 디버그 아티팩트 저장 위치 (debug/full 레벨에서만, 저장은 백그라운드 스레드)
+        artifact_level, debug_folder = self._resolve_debug_folder(
+            artifact_level, save_mask, run_folder, output_path)
+
+        # Pre-paste 시 denoising strength 자동 조정
+        actual_denoising = denoising_strength
+        if apply_pre_paste:
+            actual_denoising = pre_paste_denoising
+            print(f"\n📋 Pre-paste 모드: denoising {denoising_strength} -> {actual_denoising}")
+
+        # Turbo: num_inference_steps = 실제 디노이징 스텝 (strength < 1이면 스케줄 스텝 확장)
+        denoise_steps = num_inference_steps
+        if self.turbo is not None and actual_denoising < 1.0:
+            num_inference_steps = int(np.ceil(denoise_steps / max(actual_denoising, 1e-3)))
+            print(f"\n⚡ Turbo: 디노이징 {denoise_steps} 스텝 (스케줄 {num_inference_steps} 스텝 x strength {actual_denoising})")
 
+        # Preview 설정
+        self.save_preview = save_preview
+        if save_preview:
+            # Preview 파일 경로 설정
+            base_path = output_path.replace('.png', '')
+            self.preview_path = f"{base_path}_preview.png"
+
+        print("=" * 70)
+        mode_str = "자동 얼굴 합성 (머리카락 포함)" if include_hair else "자동 얼굴 합성"
+        if apply_pre_paste:
+            mode_str += " + Pre-paste"
+        if apply_face_swap:
+            mode_str += " + Face Swap"
+        if apply_swap_refinement:
+            mode_str += " + Swap Refinement"
+        if apply_face_enhance:
+            mode_str += " + Face Enhance"
+        print(mode_str)
+        print("=" * 70)
+
+        # 1~4. 입력 준비 (composite_batch에서는 이전 작업 디퓨전 중에 미리 준비됨)
+        if prepared is None:
+            prepared = self.prepare_composite(
+                background_path,
+                source_face_path,
+                mask_expand=mask_expand,
+                mask_blur=mask_blur,
+                include_hair=include_hair,
+                include_neck=include_neck,
+                auto_detect_gender=auto_detect_gender,
+                mask_padding=mask_padding,
+                use_pre_paste=apply_pre_paste,
+                face_artifacts=face_artifacts,
+                debug_folder=debug_folder,
+                crop_aware_parsing=crop_aware_parsing
+            )
+        if prepared is None:
+            return None
+
+        source_face = prepared["source_face"]
+        gender_hint = prepared["gender_hint"]
+        background_img = prepared["background_img"]
+        face_mask = prepared["face_mask"]
+        hair_region = prepared["hair_region"]
+        target_size = prepared["target_size"]
+
+        # 5. 최종 크기 확인
+        print(f"\n최종 출력 크기: {target_size}")
+        # 6. 네거티브 프롬프트 (포지티브 프롬프트는 텍스트 인코딩 직전에 확정 - 자동 프롬프트 대기 최소화)
         negative_prompt = (
             "bad quality, blurry, distorted, deformed, ugly, bad anatomy, "
             "wrong face, disfigured, mutation, low resolution, pixelated, "
@@ -1641,6 +2477,8 @@ class AutoIDPhotoCompositor:
         print(f"   IP-Adapter 모드: {self.ip_adapter_mode.upper()}")
 
         ip_adapter_kwargs = {}
+        # guidance <= 1 (turbo)이면 파이프라인이 CFG를 끄므로 임베딩도 positive만 전달
+        use_cfg = guidance_scale > 1.0
 
         if self.no_ip_adapter:
             # Simple Inpainting 모드: IP-Adapter 없이 순수 인페인팅만
@@ -1676,11 +2514,7 @@ class AutoIDPhotoCompositor:
             print("   Dual IP-Adapter: 얼굴 + 머리카락 준비 중...")
 
             # 1. InsightFace 얼굴 임베딩 추출
-            face_embedding = self.face_id_extractor.get_embedding_for_ip_adapter(
-                source_face,
-                dtype=self.dtype,
-                device=self.device
-            )
+            face_embedding = prepared["face_embedding"]
 
             # 2. 머리카락 이미지 준비 (CLIP용)
             hair_image_for_clip = hair_region if hair_region is not None else source_face
@@ -1723,11 +2557,7 @@ class AutoIDPhotoCompositor:
             print("   FaceID Plus v2: 얼굴+머리스타일 임베딩 추출 중...")
 
             # 1. InsightFace 얼굴 임베딩 추출
-            face_embedding = self.face_id_extractor.get_embedding_for_ip_adapter(
-                source_face,
-                dtype=self.dtype,
-                device=self.device
-            )
+            face_embedding = prepared["face_embedding"]
 
             if face_embedding is not None:
                 # 2. CLIP 이미지 임베딩 추출 (머리스타일 포함)
@@ -1750,6 +2580,8 @@ class AutoIDPhotoCompositor:
 
                 face_embedding_cfg = torch.cat([neg_face, face_embedding], dim=0)  # (2, 1, 512)
                 clip_embeds_cfg = torch.cat([neg_clip, clip_embeds], dim=0)  # (2, 257, 1280)
+                if not use_cfg:
+                    face_embedding_cfg, clip_embeds_cfg = face_embedding_cfg[1:], clip_embeds_cfg[1:]
 
                 # Plus v2: CLIP 임베딩은 4D 필요: (batch, num_images, seq, hidden)
                 clip_embeds_cfg = clip_embeds_cfg.unsqueeze(1)  # (2, 1, 257, 1280)
@@ -1782,6 +2614,8 @@ class AutoIDPhotoCompositor:
 
                     face_embedding_cfg = torch.cat([neg_face, zero_face], dim=0)
                     clip_embeds_cfg = torch.cat([neg_clip, clip_embeds], dim=0)
+                    if not use_cfg:
+                        face_embedding_cfg, clip_embeds_cfg = face_embedding_cfg[1:], clip_embeds_cfg[1:]
                     clip_embeds_cfg = clip_embeds_cfg.unsqueeze(1)
 
                     self.pipeline.unet.encoder_hid_proj.image_projection_layers[0].clip_embeds = clip_embeds_cfg
@@ -1795,11 +2629,7 @@ class AutoIDPhotoCompositor:
             # FaceID (non-Plus): InsightFace 512-dim 임베딩 사용
             self.pipeline.set_ip_adapter_scale(face_strength)
             print("   FaceID: InsightFace 임베딩 추출 중...")
-            face_embedding = self.face_id_extractor.get_embedding_for_ip_adapter(
-                source_face,
-                dtype=self.dtype,
-                device=self.device
-            )
+            face_embedding = prepared["face_embedding"]
 
             if face_embedding is not None:
                 # Shape 변환: (1, 512) -> (1, 1, 512) for IP-Adapter
@@ -1810,6 +2640,8 @@ class AutoIDPhotoCompositor:
                 # Shape: (1, 1, 512) -> (2, 1, 512)
                 negative_embedding = torch.zeros_like(face_embedding)
                 face_embedding_cfg = torch.cat([negative_embedding, face_embedding], dim=0)
+                if not use_cfg:
+                    face_embedding_cfg = face_embedding_cfg[1:]
 
                 ip_adapter_kwargs["ip_adapter_image_embeds"] = [face_embedding_cfg]
                 print(f"   FaceID: InsightFace 임베딩 추출 완료 (shape: {face_embedding_cfg.shape})")
@@ -1844,6 +2676,7 @@ class AutoIDPhotoCompositor:
                 print("   Standard: 원본 얼굴 이미지 사용")
 
             if self.pipeline.image_encoder is not None:
+                self.pipeline.set_ip_adapter_scale(face_strength)
                 ip_adapter_kwargs["ip_adapter_image"] = ip_adapter_input
             else:
                 print("   [Warning] image_encoder 없음, IP-Adapter 없이 진행")
@@ -1851,32 +2684,65 @@ class AutoIDPhotoCompositor:
         print("\n합성 시작...")
         print("   배경 유지 + 새 얼굴 합성 중...")
 
-        # 9. Inpainting 수행 (고해상도 생성 후 원본 크기로 축소)
+        # 9. Inpainting 수행 (고해상도 생성 후 원본 크기로 축소, 리사이즈는 준비 단계에서 완료)
         orig_width, orig_height = background_img.size
-
-        # SDXL 최적 해상도로 스케일업 (최소 1024px, 비율 유지)
-        min_size = 1024
-        scale = max(min_size / orig_width, min_size / orig_height, 1.0)
-        gen_width = int(orig_width * scale)
-        gen_height = int(orig_height * scale)
-
-        # 8의 배수로 조정
-        gen_width = (gen_width // 8) * 8
-        gen_height = (gen_height // 8) * 8
-
-        # 생성용 이미지/마스크 리사이즈
-        if scale > 1.0:
-            bg_for_gen = background_img.resize((gen_width, gen_height), Image.Resampling.LANCZOS)
-            mask_for_gen = face_mask.resize((gen_width, gen_height), Image.Resampling.LANCZOS)
+        gen_width, gen_height = prepared["gen_size"]
+        bg_for_gen = prepared["bg_for_gen"]
+        mask_for_gen = prepared["mask_for_gen"]
+        if (gen_width, gen_height) != (orig_width, orig_height):
             print(f"   고해상도 생성: {orig_width}x{orig_height} -> {gen_width}x{gen_height}")
-        else:
-            bg_for_gen = background_img
-            mask_for_gen = face_mask
 
         print(f"🎨 생성 시작... (총 {num_inference_steps} 스텝, Stop-at: {stop_at*100:.0f}%)")
 
+        reset_peak_memory(self.device)
+
+        if unet_cache_interval is not None:
+            self.set_unet_cache(unet_cache_interval)
+        if self.unet_cache is not None:
+            self.unet_cache.reset()
+            print(f"   UNet 특징 캐시: {self.unet_cache.interval} 스텝마다 전체 계산")
+
+        # 수렴 기반 조기 종료: 마스크 영역만 latent 해상도로 축소해서 스텝 간 변화량 추적
+        run_steps = {"used": 0, "total": None, "early_stopped": False}
+        early_stop = {"prev": None, "calm": 0}
+        latent_mask = None
+        if early_stop_threshold and early_stop_threshold > 0:
+            vae_scale = getattr(self.pipeline, "vae_scale_factor", 8)
+            mask_small = mask_for_gen.convert("L").resize(
+                (gen_width // vae_scale, gen_height // vae_scale), Image.Resampling.BILINEAR)
+            latent_mask = torch.from_numpy(np.array(mask_small) > 127).to(self.device)
+            if not latent_mask.any():
+                latent_mask = torch.ones_like(latent_mask)
+            print(f"   조기 종료: 임계값 {early_stop_threshold}, {early_stop_patience} 스텝 연속 시 종료")
+
+        # Stop-at: 임계 시점에 IP-Adapter를 한 번만 분리 (scale은 위에서 설정한 값 유지, 매 스텝 재설정 안 함)
+        ip_state = {"active": True, "bypass": None}
+
+        # CFG 컷오프: 후반 스텝은 uncond 분기 없이 조건부만 (UNet 배치 절반)
+        cfg_state = {"active": use_cfg and cfg_cutoff < 1.0, "cond_from": None, "hook": None,
+                     "clip_embeds": None, "step_times": []}
+        callback_tensor_inputs = ["latents"]
+        if cfg_state["active"]:
+            callback_tensor_inputs = ["latents", "prompt_embeds", "add_text_embeds", "add_time_ids",
+                                      "mask", "masked_image_latents"]
+            print(f"   CFG 컷오프: {cfg_cutoff*100:.0f}% 이후 조건부만 실행")
+
+        # Preview 저장 완료 통지: PREVIEW: 라인은 생성 스레드에서만 출력 (스텝 로그와 섞이지 않도록)
+        preview_pending = []  # [(저장 Future, 경로)] 예약 순서
+
+        def flush_previews(wait=False):
+            while preview_pending and (wait or preview_pending[0][0].done()):
+                future, path = preview_pending.pop(0)
+                try:
+                    future.result()
+                    print(f"PREVIEW:{path}", flush=True)
+                except Exception as e:
+                    print(f"   Preview 저장 실패: {e}")
+
         # 타이밍 제어용 콜백 함수 정의
         def step_callback(pipe, step_index, _timestep, callback_kwargs):
+            flush_previews()
+
             # 1. 현재 스텝 수 계산 (호환성 처리)
             try:
                 cur_step = step_index.item() if hasattr(step_index, "item") else step_index
@@ -1885,22 +2751,40 @@ class AutoIDPhotoCompositor:
 
             # 2. 진행률 계산
             progress = cur_step / num_inference_steps
+            cfg_state["step_times"].append(time.perf_counter())
 
             # 3. Stop-At 로직 적용 & 로그 출력 (no_ip_adapter 모드면 건너뛰기)
             if self.no_ip_adapter:
                 status_msg = "Simple Inpainting (IP-Adapter 없음)"
             elif progress > stop_at:
-                # 지정된 구간을 넘었을 때 -> 얼굴 반영 끄기
-                pipe.set_ip_adapter_scale(0.0)
-                status_msg = f"🛑 OFF (Scale: 0.0)"
+                # 지정된 구간을 넘었을 때 -> IP-Adapter 분리 (전환 시 1회, 이후 스텝은 일반 SDXL)
+                if ip_state["active"]:
+                    ip_state["bypass"] = bypass_ip_adapter(pipe.unet)
+                    ip_state["active"] = False
+                status_msg = "🛑 OFF (IP-Adapter 분리)"
             else:
-                # 구간 안일 때 -> 얼굴 반영 켜기
-                pipe.set_ip_adapter_scale(face_strength)
                 status_msg = f"✅ ON  (Scale: {face_strength})"
 
             # 매 스텝마다 로그 출력
             print(f"   [Step {cur_step:02d}/{num_inference_steps}] 진행률 {progress*100:.0f}% -> {status_msg}", flush=True)
 
+            # 3.5. CFG 컷오프: 다음 스텝부터 조건부 절반만 남김 ([uncond, cond] 순서)
+            total = getattr(pipe, "_num_timesteps", None) or num_inference_steps
+            if cfg_state["active"] and cfg_state["cond_from"] is None and (cur_step + 1) / total >= cfg_cutoff \
+                    and cur_step + 1 < total:
+                for key in callback_tensor_inputs[1:]:
+                    tensor = callback_kwargs.get(key)
+                    if tensor is not None:
+                        callback_kwargs[key] = tensor.chunk(2)[1]
+                projection = getattr(pipe.unet.encoder_hid_proj, "image_projection_layers", [None])[0]
+                if getattr(projection, "clip_embeds", None) is not None:
+                    cfg_state["clip_embeds"] = (projection, projection.clip_embeds)
+                    projection.clip_embeds = projection.clip_embeds.chunk(2)[1]
+                cfg_state["hook"] = pipe.unet.register_forward_pre_hook(drop_uncond_image_embeds, with_kwargs=True)
+                pipe._guidance_scale = 0.0  # do_classifier_free_guidance -> False
+                cfg_state["cond_from"] = cur_step + 1
+                print(f"   ✂️ CFG 종료: {cur_step + 1}/{total} 스텝부터 조건부만 실행", flush=True)
+
             # 4. Preview 이미지 생성 (5 스텝마다)
             if hasattr(self, 'save_preview') and self.save_preview and cur_step > 0 and cur_step % 5 == 0:
                 try:
@@ -1917,12 +2801,9 @@ class AutoIDPhotoCompositor:
                         image_np = (image_np * 255).round().astype("uint8")
                         preview_img = Image.fromarray(image_np)
 
-                        # Preview 저장
+                        # Preview 저장 (백그라운드) - 완료되면 다음 스텝/생성 종료 시 stdout에 경로 출력 (백엔드가 파싱함)
                         preview_path = self.preview_path.replace('.png', f'_step{cur_step:03d}.png')
-                        preview_img.save(preview_path)
-
-                        # stdout에 preview 경로 출력 (백엔드가 파싱함)
-                        print(f"PREVIEW:{preview_path}", flush=True)
+                        preview_pending.append((self.artifact_writer.save(preview_img, preview_path), preview_path))
 
                         # 중간 텐서 정리 (메모리 누적 방지)
                         del latents_scaled, image_tensor
@@ -1930,23 +2811,90 @@ class AutoIDPhotoCompositor:
                 except Exception as e:
                     print(f"   Preview 생성 실패 (Step {cur_step}): {e}")
 
+            # 5. 수렴 기반 조기 종료 (마스크 영역 latent 변화량이 patience 스텝 연속 임계값 미만)
+            run_steps["used"] = cur_step + 1
+            run_steps["total"] = getattr(pipe, "_num_timesteps", None)
+            latents = callback_kwargs.get("latents")
+            if latent_mask is not None and latents is not None:
+                prev = early_stop["prev"]
+                if prev is not None:
+                    delta = ((latents - prev)[..., latent_mask].abs().mean()
+                             / (prev[..., latent_mask].abs().mean() + 1e-6)).item()
+                    if delta < early_stop_threshold and progress >= EARLY_STOP_MIN_PROGRESS:
+                        early_stop["calm"] += 1
+                    else:
+                        early_stop["calm"] = 0
+
+                    remaining = run_steps["total"] is not None and cur_step + 1 < run_steps["total"]
+                    if early_stop["calm"] >= early_stop_patience and remaining:
+                        final_latents = estimate_final_latents(pipe.scheduler, prev, latents, _timestep)
+                        if final_latents is not None:
+                            # 최종 스텝으로 점프 후 남은 스텝 건너뛰고 디코딩
+                            callback_kwargs["latents"] = final_latents
+                            pipe._interrupt = True
+                            run_steps["early_stopped"] = True
+                            print(f"   ⏹ 조기 종료: {cur_step + 1}/{run_steps['total']} 스텝 (변화량 {delta:.4f})", flush=True)
+                early_stop["prev"] = latents.detach().clone()
+
             return callback_kwargs
 
-        result = self.pipeline(
-            prompt=full_prompt,
-            negative_prompt=negative_prompt,
-            image=bg_for_gen,
-            mask_image=mask_for_gen,
-            width=gen_width,
-            height=gen_height,
-            num_inference_steps=num_inference_steps,
-            guidance_scale=guidance_scale,
-            strength=actual_denoising,
-            generator=generator,
-            callback_on_step_end=step_callback,
-            **ip_adapter_kwargs  # ip_adapter_image 또는 ip_adapter_image_embeds
+        # 자동 프롬프트 join (전처리/컨디셔닝 준비와 병렬로 생성됨)
+        prompt = self._resolve_prompt(prompt, prompt_future, prompt_deadline)
+
+        # 프롬프트 준비 (성별 힌트 포함)
+        full_prompt = (
+            f"professional ID photo, passport style photograph, "
+            f"{gender_hint}"
+            f"neutral background, studio lighting, front-facing portrait, "
+            f"sharp focus, high quality, even lighting, formal photograph, "
+            f"{prompt}"
         )
 
+        print(f"\n프롬프트: {gender_hint}{prompt}")
+
+        # 텍스트 인코딩 1회 (Swap Refinement에서 재사용)
+        prompt_kwargs = self._encode_prompt(full_prompt, negative_prompt, guidance_scale)
+
+        try:
+            with autocast_context(self.performance):
+                result = self.pipeline(
+                    **prompt_kwargs,
+                    image=bg_for_gen,
+                    mask_image=mask_for_gen,
+                    width=gen_width,
+                    height=gen_height,
+                    num_inference_steps=num_inference_steps,
+                    guidance_scale=guidance_scale,
+                    strength=actual_denoising,
+                    generator=generator,
+                    callback_on_step_end=step_callback,
+                    callback_on_step_end_tensor_inputs=callback_tensor_inputs,
+                    **ip_adapter_kwargs  # ip_adapter_image 또는 ip_adapter_image_embeds
+                )
+        finally:
+            flush_previews(wait=True)  # 마지막 preview 경로 출력
+            # 다음 생성을 위해 IP-Adapter 재연결, CFG 컷오프 훅/CLIP 임베딩 원복
+            restore_ip_adapter(self.pipeline.unet, ip_state["bypass"])
+            if cfg_state["hook"] is not None:
+                cfg_state["hook"].remove()
+            if cfg_state["clip_embeds"] is not None:
+                projection, clip_embeds = cfg_state["clip_embeds"]
+                projection.clip_embeds = clip_embeds
+        run_steps["profile"] = describe_profile(self.performance)
+        run_steps["peak_memory_mb"] = peak_memory_mb(self.device)
+        if run_steps["peak_memory_mb"] is not None:
+            print(f"   피크 메모리: {run_steps['peak_memory_mb']:.0f} MB ({self.performance['profile']})")
+        if use_cfg:
+            run_steps["cfg_cutoff"] = self._cfg_cutoff_report(cfg_cutoff, cfg_state, run_steps["used"])
+            report = run_steps["cfg_cutoff"]
+            if report["cond_only_steps"]:
+                print(f"   CFG 컷오프: 조건부만 {report['cond_only_steps']}/{run_steps['used']} 스텝, "
+                      f"스텝당 {report['cfg_step_ms']}ms -> {report['cond_step_ms']}ms")
+        if self.unet_cache is not None:
+            run_steps["unet_cache"] = dict(self.unet_cache.stats, interval=self.unet_cache.interval)
+            print(f"   UNet 특징 캐시: 전체 {self.unet_cache.stats['full']}회 / 재사용 {self.unet_cache.stats['cached']}회")
+        self.last_run_steps = run_steps
+
         output_image = result.images[0]
 
         # 원본 크기와 다르면 복원
@@ -1954,22 +2902,49 @@ class AutoIDPhotoCompositor:
             output_image = output_image.resize((orig_width, orig_height), Image.Resampling.LANCZOS)
             print(f"   출력 크기 복원: {gen_width}x{gen_height} -> {orig_width}x{orig_height}")
 
+        # 10~10.5. 후처리 워커 풀로 넘김 (Swap Refinement는 디퓨전이 필요하므로 인라인 처리)
+        defer_postprocess = (
+            postprocess_pool is not None
+            and (apply_face_swap or apply_face_enhance)
+            and not (apply_face_swap and apply_swap_refinement)
+        )
+        if defer_postprocess:
+            if debug_folder:
+                self._save_debug_image(output_image, os.path.join(debug_folder, "5.5_result_before_swap.png"))
+                if apply_face_swap:
+                    self._save_debug_image(source_face, os.path.join(debug_folder, "6.0_faceswap_source.png"))
+
+            future = postprocess_pool.submit(
+                output_image,
+                source_face,
+                output_path,
+                face_swap_model=(face_swap_model or self.face_swap_model) if apply_face_swap else None,
+                face_enhance_strength=face_enhance_strength if apply_face_enhance else None,
+                debug_folder=debug_folder
+            )
+            print(f"\n📤 후처리 워커로 전달 (Face Swap: {apply_face_swap}, Face Enhance: {apply_face_enhance})")
+            print("=" * 70)
+
+            cleanup_gpu_memory()
+            return future
+
         # 10. Face Swap 적용 (선택적)
+        face_kps = None  # 교체된 얼굴 랜드마크 (Face Enhance에서 재사용)
         if apply_face_swap:
             # Face Swap 전 결과 저장 (디버깅용) - swap 전에 저장!
-            if save_mask and run_folder:
-                pre_swap_path = os.path.join(run_folder, "5.5_result_before_swap.png")
-                output_image.save(pre_swap_path)
+            if debug_folder:
+                pre_swap_path = os.path.join(debug_folder, "5.5_result_before_swap.png")
+                self._save_debug_image(output_image, pre_swap_path)
                 print(f"   Face Swap 전 결과 저장: {os.path.basename(pre_swap_path)}")
 
-            output_image = self._apply_face_swap(output_image, source_face, run_folder if save_mask else None)
+            output_image, face_kps = self._apply_face_swap(output_image, source_face, debug_folder)
 
             # 10.2. Face Swap Refinement 적용 (선택적)
             if apply_swap_refinement:
                 # Swap Refinement 전 저장 (디버깅용)
-                if save_mask and run_folder:
-                    pre_refine_path = os.path.join(run_folder, "5.6_result_before_refinement.png")
-                    output_image.save(pre_refine_path)
+                if debug_folder:
+                    pre_refine_path = os.path.join(debug_folder, "5.6_result_before_refinement.png")
+                    self._save_debug_image(output_image, pre_refine_path)
                     print(f"   Swap Refinement 전 결과 저장: {os.path.basename(pre_refine_path)}")
 
                 output_image = self._apply_swap_refinement(
@@ -1977,23 +2952,27 @@ class AutoIDPhotoCompositor:
                     prompt=prompt,
                     denoising_strength=swap_refinement_strength,
                     guidance_scale=guidance_scale,
-                    num_steps=max(15, num_inference_steps // 3),  # 메인 스텝의 1/3 정도 사용
+                    # 메인 스텝의 1/3 정도 사용 (turbo는 디노이징 스텝 수 유지)
+                    num_steps=(int(np.ceil(denoise_steps / swap_refinement_strength)) if self.turbo is not None
+                               else max(15, num_inference_steps // 3)),
                     seed=seed,
-                    run_folder=run_folder if save_mask else None
+                    run_folder=debug_folder,
+                    prompt_kwargs=prompt_kwargs
                 )
 
         # 10.5. Face Enhance 적용 (선택적 - GFPGAN)
         if apply_face_enhance:
             # Face Enhance 전 결과 저장 (디버깅용)
-            if save_mask and run_folder:
-                pre_enhance_path = os.path.join(run_folder, "5.7_result_before_enhance.png")
-                output_image.save(pre_enhance_path)
+            if debug_folder:
+                pre_enhance_path = os.path.join(debug_folder, "5.7_result_before_enhance.png")
+                self._save_debug_image(output_image, pre_enhance_path)
                 print(f"   Face Enhance 전 결과 저장: {os.path.basename(pre_enhance_path)}")
 
             output_image = self._apply_face_enhance(
                 output_image,
                 strength=face_enhance_strength,
-                run_folder=run_folder if save_mask else None
+                run_folder=debug_folder,
+                face_kps=face_kps
             )
 
         # 11. 저장
@@ -2101,16 +3080,39 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
                        help='프롬프트')
     parser.add_argument('--auto-prompt', action='store_true',
                        help='Gemini Vision으로 프롬프트 자동 생성 (GEMINI_API_KEY 필요)')
+    parser.add_argument('--prompt-timeout', type=float, default=30.0,
+                       help='자동 프롬프트 대기 마감 (실행 시작 기준 초, 초과 시 기본 프롬프트 사용, 기본: 30)')
     parser.add_argument('--output', '-o', default='output.png',
                        help='출력 파일')
     parser.add_argument('--face-strength', type=float, default=0.85,
                        help='얼굴 반영 강도 (기본: 0.85)')
-    parser.add_argument('--denoising', type=float, default=0.92,
-                       help='생성 강도 (기본: 0.92)')
-    parser.add_argument('--steps', type=int, default=50,
-                       help='생성 스텝 (기본: 50)')
-    parser.add_argument('--guidance', type=float, default=7.5,
-                       help='가이던스 (기본: 7.5)')
+    parser.add_argument('--denoising', type=float, default=None,
+                       help='생성 강도 (기본: 0.92, --turbo 시 프리셋 값)')
+    parser.add_argument('--steps', type=int, default=None,
+                       help='생성 스텝 (기본: 50, --turbo 시 프리셋 값 = 실제 디노이징 스텝)')
+    parser.add_argument('--guidance', type=float, default=None,
+                       help='가이던스 (기본: 7.5, --turbo 시 프리셋 값)')
+    parser.add_argument('--turbo', choices=list(TURBO_PRESETS), default=None,
+                       help='Few-step 생성: LoRA 융합 + 전용 스케줄러 (lcm 6스텝, lightning/hyper 4스텝)')
+    parser.add_argument('--turbo-lora', type=str, default=None,
+                       help='Turbo LoRA 파일 경로 (기본: models/turbo/의 프리셋 파일)')
+    parser.add_argument('--early-stop-threshold', type=float, default=0.0,
+                       help='수렴 기반 조기 종료 임계값: 마스크 영역 latent 스텝 간 상대 변화량 (기본: 0=비활성, 예: 0.02)')
+    parser.add_argument('--early-stop-patience', type=int, default=2,
+                       help='임계값 미만이 연속 몇 스텝이면 종료할지 (기본: 2)')
+    parser.add_argument('--profile', choices=list(PROFILES), default=DEFAULT_PROFILE,
+                       help='메모리/속도 프로파일: default(xFormers), throughput(SDPA+GPU 상주), '
+                            'low-memory(VAE tiling+CPU offload), cpu(bf16 autocast+channels_last) (기본: default)')
+    parser.add_argument('--compile-unet', action='store_true',
+                       help='UNet torch.compile (컴파일 캐시: models/torch_compile, 첫 생성이 느림)')
+    parser.add_argument('--cpu-threads', type=int, default=None,
+                       help='CPU intra-op 스레드 수 (기본: 프로파일 설정, cpu 프로파일은 사용 가능한 CPU 수)')
+    parser.add_argument('--bisenet-backend', choices=['eager', 'torchscript', 'onnx'], default=None,
+                       help='BiSeNet 추론 백엔드: 내보낸 그래프는 79999_iter.pth 옆에 캐시 (기본: 프로파일 설정, cpu 프로파일은 torchscript)')
+    parser.add_argument('--cfg-cutoff', type=float, default=1.0,
+                       help='CFG 적용 구간: 이 비율 이후 스텝은 uncond 분기 없이 조건부만 실행 (기본: 1.0=끝까지, 예: 0.8)')
+    parser.add_argument('--unet-cache-interval', type=int, default=0,
+                       help='UNet 특징 캐시: N 스텝마다 전체 UNet 계산, 사이 스텝은 깊은 블록 재사용 (기본: 0=비활성, 예: 3)')
     parser.add_argument('--mask-expand', type=float, default=0.3,
                        help='마스크 확장 비율 (기본: 0.3)')
     parser.add_argument('--mask-blur', type=int, default=15,
@@ -2131,6 +3133,8 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
                        help='목 포함 마스킹 (레퍼런스 목이 이상할 때 사용)')
     parser.add_argument('--no-bisenet', action='store_true',
                        help='BiSeNet 비활성화 (타원 마스크만 사용)')
+    parser.add_argument('--crop-aware-parsing', action='store_true',
+                       help='크롭 인식 파싱: 배경 얼굴 주변 정사각형만 512로 BiSeNet 파싱 후 전체 맵에 기록 (큰 레퍼런스의 작은 얼굴)')
     parser.add_argument('--no-gender-detect', action='store_true',
                        help='성별 자동 감지 비활성화')
     parser.add_argument('--no-ip-adapter', action='store_true',
@@ -2170,6 +3174,10 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
                        help='Face Swap Refinement: Face Swap 후 얼굴 영역 경미한 인페인팅으로 자연스럽게 블렌딩')
     parser.add_argument('--swap-refinement-strength', type=float, default=0.3,
                        help='Swap Refinement 강도 (0.1~0.5, 기본: 0.3, 낮을수록 원본 유지)')
+    parser.add_argument('--artifact-level', choices=list(ARTIFACT_LEVELS), default='full',
+                       help='저장할 아티팩트: none (결과만), result (+params.txt), debug (+중간 결과), full (+입력 복사본, 기본값)')
+    parser.add_argument('--face-artifacts-dir', type=str, default=None,
+                       help='업로드 시 전처리된 얼굴 아티팩트 저장소 경로 (있으면 검출/임베딩/파싱 재사용)')
     parser.add_argument('--show', action='store_true',
                        help='결과 표시')
 
@@ -2186,6 +3194,16 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
             print(f"   (inputs/ 폴더도 확인했습니다)")
             return
 
+    # 자동 프롬프트는 모델 로딩/전처리와 병렬로 생성 (텍스트 인코딩 직전에 join)
+    prompt_future = None
+    prompt_deadline = None
+    prompt_executor = None
+    if args.auto_prompt and HAS_PROMPT_GENERATOR:
+        print("\n🤖 Gemini Vision으로 프롬프트 생성 시작 (백그라운드)...")
+        prompt_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auto-prompt")
+        prompt_future = prompt_executor.submit(generate_prompt_from_face_image, face_path)
+        prompt_deadline = time.monotonic() + args.prompt_timeout
+
     # 합성 수행
     compositor = AutoIDPhotoCompositor(
         detection_method=args.detection,
@@ -2199,9 +3217,33 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
         use_face_enhance=args.use_face_enhance,
         use_swap_refinement=args.use_swap_refinement,
         no_ip_adapter=args.no_ip_adapter,
-        face_swap_model=args.face_swap_model
+        face_swap_model=args.face_swap_model,
+        turbo=args.turbo,
+        turbo_lora=args.turbo_lora,
+        unet_cache_interval=args.unet_cache_interval,
+        profile=args.profile,
+        compile_unet=args.compile_unet,
+        cpu_threads=args.cpu_threads,
+        bisenet_backend=args.bisenet_backend
     )
 
+    # --turbo 요청인데 LoRA 로드 실패: 호출자(웹 백엔드)가 넘긴 turbo 스텝/가이던스로
+    # 기본 모델을 돌리면 품질이 망가진 결과가 성공으로 기록되므로 실패로 종료
+    if args.turbo and compositor.turbo is None:
+        print(f"\n❌ Turbo 프리셋 '{args.turbo}' 로드 실패 (LoRA: {args.turbo_lora or TURBO_LORA_DIR})")
+        if prompt_executor is not None:
+            prompt_executor.shutdown(wait=False, cancel_futures=True)
+        sys.exit(1)
+
+    # 생성 기본값: turbo 프리셋이 로드됐으면 프리셋 값 (명시한 값은 그대로 사용)
+    defaults = compositor.turbo or BASELINE_DEFAULTS
+    if args.steps is None:
+        args.steps = defaults["steps"]
+    if args.guidance is None:
+        args.guidance = defaults["guidance"]
+    if args.denoising is None:
+        args.denoising = defaults["denoising"]
+
     # no_ip_adapter 모드가 아닐 때만 IP-Adapter 체크
     if not args.no_ip_adapter and not compositor.has_ip_adapter:
         print("\nIP-Adapter 로딩 실패")
@@ -2212,29 +3254,38 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
     run_folder = setup_run_folder(args.output)
     print(f"\n실행 폴더: {run_folder}")
 
-    # 입력 이미지 복사
-    bg_copy_path = os.path.join(run_folder, "1_reference.png")
-    face_copy_path = os.path.join(run_folder, "2_face.png")
-    shutil.copy2(background_path, bg_copy_path)
-    shutil.copy2(face_path, face_copy_path)
-    print(f"   입력 이미지 복사 완료")
+    # 아티팩트 레벨 (--save-mask는 최소 debug)
+    artifact_level = args.artifact_level
+    if args.save_mask and artifact_level in ("none", "result"):
+        artifact_level = "debug"
+    print(f"   아티팩트 레벨: {artifact_level}")
+
+    # 입력 이미지 복사 (full 레벨만, 백그라운드)
+    if artifact_level == "full":
+        compositor.artifact_writer.copy(background_path, os.path.join(run_folder, "1_reference.png"))
+        compositor.artifact_writer.copy(face_path, os.path.join(run_folder, "2_face.png"))
 
     # 시드 처리 (미지정시 랜덤 생성)
     actual_seed = args.seed if args.seed is not None else random.randint(0, 2**32 - 1)
 
-    # 프롬프트 처리 (auto-prompt 또는 수동)
-    if args.auto_prompt and HAS_PROMPT_GENERATOR:
-        print("\n🤖 Gemini Vision으로 프롬프트 생성 중...")
-        generated_prompt = generate_prompt_from_face_image(face_path)
-        final_prompt = generated_prompt
-        print(f"   생성된 프롬프트: {final_prompt}")
-        print(f"GENERATED_PROMPT:{final_prompt}", flush=True)
+    # 프롬프트 처리 (auto-prompt는 실패/시간 초과 시 기본 프롬프트로 대체)
+    if prompt_future is not None:
+        final_prompt = DEFAULT_PROMPT
     elif args.auto_prompt and not HAS_PROMPT_GENERATOR:
         print("\n   prompt_generator.py를 찾을 수 없습니다. 기본 프롬프트를 사용합니다.")
         final_prompt = args.prompt
     else:
         final_prompt = args.prompt
 
+    # 전처리된 얼굴 아티팩트 (업로드 시 백엔드에서 계산됨)
+    face_artifacts = None
+    if args.face_artifacts_dir and HAS_FACE_ARTIFACTS:
+        face_artifacts = FaceArtifactStore(args.face_artifacts_dir).load_for_image(face_path)
+        if face_artifacts is not None:
+            print(f"\n📦 전처리된 얼굴 아티팩트 사용: {face_artifacts.key[:12]}")
+        else:
+            print("\n   전처리된 얼굴 아티팩트 없음 - 직접 계산합니다")
+
     # 실행 명령어 기록
     command = ' '.join(sys.argv)
 
@@ -2253,7 +3304,7 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
         mask_expand=args.mask_expand,
         mask_blur=args.mask_blur,
         seed=actual_seed,
-        save_mask=True,  # 항상 마스크 저장
+        artifact_level=artifact_level,
         use_source_size=not args.use_background_size,
         include_hair=not args.no_hair,
         include_neck=args.include_neck,
@@ -2271,11 +3322,38 @@ python id_photo_face_composite_auto.py background.jpg face.jpg \\
         use_face_enhance=args.use_face_enhance,
         face_enhance_strength=args.face_enhance_strength,
         use_swap_refinement=args.use_swap_refinement,
-        swap_refinement_strength=args.swap_refinement_strength
+        swap_refinement_strength=args.swap_refinement_strength,
+        face_artifacts=face_artifacts,
+        prompt_future=prompt_future,
+        prompt_deadline=prompt_deadline,
+        early_stop_threshold=args.early_stop_threshold,
+        early_stop_patience=args.early_stop_patience,
+        cfg_cutoff=args.cfg_cutoff,
+        crop_aware_parsing=args.crop_aware_parsing
     )
 
+    if compositor.resolved_prompt is not None:
+        final_prompt = compositor.resolved_prompt
+    if prompt_executor is not None:
+        # 시간 초과된 요청은 기다리지 않음 (Gemini 클라이언트 자체 타임아웃으로 종료)
+        prompt_executor.shutdown(wait=False)
+
+    # 결과 경로 출력 (백엔드가 출력 폴더를 스캔하지 않고 바로 찾도록)
+    # 디버그 이미지 저장 완료를 기다리기 전에 먼저 출력
+    if result is not None and os.path.exists(internal_output_path):
+        print(f"RESULT:{internal_output_path}", flush=True)
+
     # 파라미터 저장
-    save_run_params(run_folder, args, command, actual_seed, background_path, face_path, final_prompt)
+    if artifact_level != "none":
+        save_run_params(run_folder, args, command, actual_seed, background_path, face_path, final_prompt,
+                        steps_used=compositor.last_run_steps)
+
+    # ONNX Runtime 세션별 추론 지연 (InsightFace 감지/임베딩, inswapper)
+    if ort_sessions.session_stats():
+        print(ort_sessions.format_session_stats())
+
+    # 백그라운드 저장 작업 완료 대기
+    compositor.artifact_writer.drain()
 
     if result and args.show:
         result.show()
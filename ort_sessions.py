@@ -0,0 +1,234 @@
+"""
+Shared ONNX Runtime Sessions for InsightFace Models
+One tuned, reusable InferenceSession per (model file, providers, options)
+
+InsightFace builds a fresh InferenceSession per model with default
+SessionOptions, so every session spins up one intra-op thread per core. With
+several post-process / preprocessing workers on one host they oversubscribe
+each other, and buffalo_l is loaded separately by every FaceAnalysis.
+
+This module builds all InsightFace and inswapper sessions with one
+configurable SessionOptions, caches them per process (FaceAnalysis instances
+share detector/recognizer sessions) and times every run() call.
+
+Options (environment, or configure() before the first session):
+    ORT_INTRA_OP_THREADS   intra-op threads per session (0 = ORT default: all cores)
+    ORT_INTER_OP_THREADS   inter-op threads (0 = ORT default; used in parallel mode)
+    ORT_GRAPH_OPTIMIZATION disable / basic / extended / all (default: all)
+    ORT_MEM_ARENA          1 / 0, CPU memory arena (default: 1)
+    ORT_EXECUTION_MODE     sequential / parallel (default: sequential)
+
+Usage:
+    from ort_sessions import configure, face_analysis, get_model, format_session_stats
+    configure(intra_op_threads=2)                       # e.g. in a worker initializer
+    app = face_analysis("buffalo_l", providers=["CPUExecutionProvider"])
+    swapper = get_model("inswapper_128.onnx", download=True, providers=["CPUExecutionProvider"])
+    print(format_session_stats())
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+
+DEFAULT_OPTIONS = {
+    "intra_op_threads": 0,
+    "inter_op_threads": 0,
+    "graph_optimization": "all",
+    "mem_arena": True,
+    "execution_mode": "sequential",
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def _options_from_env() -> dict:
+    options = dict(DEFAULT_OPTIONS)
+    env = os.environ
+    if env.get("ORT_INTRA_OP_THREADS"):
+        options["intra_op_threads"] = int(env["ORT_INTRA_OP_THREADS"])
+    if env.get("ORT_INTER_OP_THREADS"):
+        options["inter_op_threads"] = int(env["ORT_INTER_OP_THREADS"])
+    if env.get("ORT_GRAPH_OPTIMIZATION"):
+        options["graph_optimization"] = env["ORT_GRAPH_OPTIMIZATION"].lower()
+    if env.get("ORT_MEM_ARENA"):
+        options["mem_arena"] = env["ORT_MEM_ARENA"].lower() not in ("0", "false", "no")
+    if env.get("ORT_EXECUTION_MODE"):
+        options["execution_mode"] = env["ORT_EXECUTION_MODE"].lower()
+    return options
+
+
+_options = _options_from_env()
+_sessions = {}  # (model path, providers, provider options, options) -> TimedSession
+_lock = threading.RLock()
+
+
+def configure(**options):
+    """
+    Override session options for this process (sessions created earlier keep theirs).
+
+    Args:
+        **options: Any DEFAULT_OPTIONS key
+    """
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown ORT session options: {', '.join(sorted(unknown))}")
+    if options.get("graph_optimization", "all") not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"graph_optimization must be one of {', '.join(GRAPH_OPTIMIZATION_LEVELS)}")
+    with _lock:
+        _options.update(options)
+
+
+def configure_worker(threads: int):
+    """Pool initializer: cap intra-op threads per worker process (an explicit ORT_INTRA_OP_THREADS wins)."""
+    if not int(os.environ.get("ORT_INTRA_OP_THREADS") or 0):
+        configure(intra_op_threads=max(1, threads))
+
+
+def current_options() -> dict:
+    with _lock:
+        return dict(_options)
+
+
+def session_options(options: Optional[dict] = None):
+    """onnxruntime.SessionOptions for the given (or current) options."""
+    import onnxruntime as ort
+
+    options = options or current_options()
+    sess_options = ort.SessionOptions()
+    if options["intra_op_threads"]:
+        sess_options.intra_op_num_threads = options["intra_op_threads"]
+    if options["inter_op_threads"]:
+        sess_options.inter_op_num_threads = options["inter_op_threads"]
+    sess_options.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[options["graph_optimization"]])
+    sess_options.enable_cpu_mem_arena = options["mem_arena"]
+    sess_options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if options["execution_mode"] == "parallel"
+                                   else ort.ExecutionMode.ORT_SEQUENTIAL)
+    return sess_options
+
+
+class TimedSession:
+    """InferenceSession proxy that records run() latency (run() is thread-safe in ORT)."""
+
+    def __init__(self, session, model_path: str):
+        self._session = session
+        self.model_path = model_path
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._stats_lock = threading.Lock()
+
+    def run(self, output_names, input_feed, run_options=None):
+        start = time.perf_counter()
+        try:
+            return self._session.run(output_names, input_feed, run_options)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self.calls += 1
+                self.total_ms += elapsed
+                self.max_ms = max(self.max_ms, elapsed)
+
+    def __getattr__(self, name):
+        # get_inputs / get_outputs / set_providers / get_providers ...
+        return getattr(self._session, name)
+
+
+def get_session(model_path: str, providers=None, provider_options=None, **_ignored) -> TimedSession:
+    """
+    Cached session for model_path with the current options.
+
+    Signature matches InsightFace's PickableInferenceSession(model_path, **kwargs)
+    so it can stand in for it while InsightFace routes the model.
+    """
+    import onnxruntime as ort
+
+    providers = list(providers or ["CPUExecutionProvider"])
+    options = current_options()
+    key = (os.path.abspath(model_path), tuple(providers), repr(provider_options), tuple(sorted(options.items())))
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            inner = ort.InferenceSession(model_path, sess_options=session_options(options),
+                                         providers=providers, provider_options=provider_options)
+            session = TimedSession(inner, model_path)
+            _sessions[key] = session
+        return session
+
+
+class _RoutedSessions:
+    """Route InsightFace model construction through get_session for the duration of a load."""
+
+    def __enter__(self):
+        from insightface.model_zoo import model_zoo
+
+        _lock.acquire()
+        self._module = model_zoo
+        self._original = model_zoo.PickableInferenceSession
+        model_zoo.PickableInferenceSession = get_session
+        return self
+
+    def __exit__(self, *exc):
+        self._module.PickableInferenceSession = self._original
+        _lock.release()
+        return False
+
+
+def get_model(name: str, **kwargs):
+    """insightface.model_zoo.get_model with shared, tuned sessions."""
+    import insightface
+
+    with _RoutedSessions():
+        return insightface.model_zoo.get_model(name, **kwargs)
+
+
+def face_analysis(name: str = "buffalo_l", **kwargs):
+    """insightface FaceAnalysis with shared, tuned sessions (call .prepare() as usual)."""
+    from insightface.app import FaceAnalysis
+
+    with _RoutedSessions():
+        return FaceAnalysis(name=name, **kwargs)
+
+
+def session_stats() -> list:
+    """Per-session latency: [{"model", "providers", "calls", "mean_ms", "max_ms"}]."""
+    with _lock:
+        sessions = list(_sessions.values())
+    stats = []
+    for session in sessions:
+        with session._stats_lock:
+            calls, total_ms, max_ms = session.calls, session.total_ms, session.max_ms
+        stats.append({
+            "model": os.path.basename(session.model_path),
+            "providers": session.get_providers(),
+            "calls": calls,
+            "mean_ms": round(total_ms / calls, 2) if calls else None,
+            "max_ms": round(max_ms, 2) if calls else None,
+        })
+    return stats
+
+
+def format_session_stats() -> str:
+    """Table of session_stats() for logs."""
+    lines = [f"ORT sessions ({describe_options()}):"]
+    for entry in session_stats():
+        if entry["calls"]:
+            lines.append(f"  {entry['model']:<28} {entry['calls']:>5} calls  "
+                         f"mean {entry['mean_ms']:>8.2f} ms  max {entry['max_ms']:>8.2f} ms")
+        else:
+            lines.append(f"  {entry['model']:<28}     0 calls")
+    return "\n".join(lines)
+
+
+def describe_options(options: Optional[dict] = None) -> str:
+    options = options or current_options()
+    threads = f"intra={options['intra_op_threads'] or 'auto'}, inter={options['inter_op_threads'] or 'auto'}"
+    arena = "arena" if options["mem_arena"] else "no-arena"
+    return f"{threads}, opt={options['graph_optimization']}, {arena}, {options['execution_mode']}"
@@ -0,0 +1,313 @@
+"""
+Memory/Speed Profiles for the SDXL Inpainting Pipeline
+Named presets for attention backend, VAE slicing/tiling and model placement
+
+Each deployment picks one profile instead of the pipeline hard-coding
+"xFormers on CUDA, defaults elsewhere":
+
+  default:     previous behaviour - xFormers on CUDA when installed, otherwise PyTorch SDPA
+  throughput:  PyTorch SDPA, whole pipeline resident on the GPU, cuDNN autotune + TF32 matmuls
+  low-memory:  SDPA, VAE slicing + tiling, model CPU offload (only the active model on the GPU)
+  cpu:         force CPU, float32 weights with bfloat16 autocast (when the CPU has
+               native bf16), channels_last UNet/VAE/BiSeNet, explicit intra-op
+               threads, oneDNN enabled, VAE tiling, frozen TorchScript BiSeNet
+
+torch.compile of the UNet is opt-in for any profile (compile_unet=True). The
+inductor FX graph cache is kept in COMPILE_CACHE_DIR so later processes reuse
+the compiled kernels; on CPU weights are frozen so oneDNN can prepack them and
+fuse conv/linear with their pointwise epilogues.
+
+Attention slicing replaces every attention processor, which would drop the
+IP-Adapter processors, so "sliced" is only applied to a UNet without them and
+otherwise falls back to SDPA (already memory-efficient on PyTorch 2).
+
+Usage:
+    profile = resolve_profile("low-memory", device="cuda")
+    active = apply_profile(pipeline, profile, device="cuda")   # instead of pipeline.to(device)
+    print(describe_profile(active))
+
+    with autocast_context(active):
+        pipeline(...)
+
+    reset_peak_memory("cuda"); pipeline(...)
+    print(peak_memory_mb("cuda"))
+"""
+
+import contextlib
+import os
+import sys
+from typing import Optional
+
+import torch
+
+
+# Inductor FX graph cache for torch.compile (reused across processes)
+COMPILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "torch_compile")
+
+
+PROFILES = {
+    "default": {
+        "attention": "xformers",   # xformers / sdpa / sliced
+        "vae_slicing": False,
+        "vae_tiling": False,
+        "offload": None,           # None / "model"
+        "device": None,            # None = auto-detected device
+        "dtype": None,             # None = float16 on GPU, float32 on CPU
+        "tune": False,             # cudnn.benchmark + TF32 matmuls
+        "autocast": None,          # None / "bfloat16" (CPU only)
+        "channels_last": False,    # UNet / VAE / BiSeNet memory format
+        "threads": None,           # None = torch default, "auto" = CPUs in this process's affinity mask
+        "compile": False,          # torch.compile the UNet
+        "bisenet_backend": None,   # None = eager, "torchscript", "onnx" (BISENET_BACKEND env overrides)
+    },
+    "throughput": {
+        "attention": "sdpa",
+        "vae_slicing": False,
+        "vae_tiling": False,
+        "offload": None,
+        "device": None,
+        "dtype": None,
+        "tune": True,
+        "autocast": None,
+        "channels_last": False,
+        "threads": None,
+        "compile": False,
+        "bisenet_backend": None,
+    },
+    "low-memory": {
+        "attention": "sliced",
+        "vae_slicing": True,
+        "vae_tiling": True,
+        "offload": "model",
+        "device": None,
+        "dtype": None,
+        "tune": False,
+        "autocast": None,
+        "channels_last": False,
+        "threads": None,
+        "compile": False,
+        "bisenet_backend": None,
+    },
+    "cpu": {
+        "attention": "sdpa",
+        "vae_slicing": False,
+        "vae_tiling": True,
+        "offload": None,
+        "device": "cpu",
+        "dtype": "float32",
+        "tune": False,
+        "autocast": "bfloat16",
+        "channels_last": True,
+        "threads": "auto",
+        "compile": False,
+        "bisenet_backend": "torchscript",
+    },
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def cpu_supports_bf16() -> bool:
+    """True if oneDNN has native bfloat16 kernels on this CPU (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def cpu_threads() -> int:
+    """CPUs this process may run on (respects taskset/cgroup affinity, unlike os.cpu_count())."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_profile(name: Optional[str], device: str, compile_unet: bool = False,
+                    threads: Optional[int] = None) -> dict:
+    """
+    Profile settings for this device (GPU-only options dropped elsewhere).
+
+    Args:
+        name: Profile name from PROFILES (None = DEFAULT_PROFILE)
+        device: Auto-detected device ("cuda" / "mps" / "cpu")
+        compile_unet: torch.compile the UNet regardless of the profile
+        threads: Intra-op thread count override (None = profile setting)
+
+    Returns:
+        Copy of the profile with "name", a concrete "device" and "dtype"
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}' (available: {', '.join(PROFILES)})")
+    profile = dict(PROFILES[name], name=name)
+    profile["device"] = profile["device"] or device
+    if profile["dtype"] is None:
+        profile["dtype"] = "float32" if profile["device"] == "cpu" else "float16"
+    if profile["device"] != "cuda":
+        profile["offload"] = None
+        profile["tune"] = False
+        if profile["attention"] == "xformers":
+            profile["attention"] = "sdpa"
+    if profile["autocast"] and (profile["device"] != "cpu" or not cpu_supports_bf16()):
+        profile["autocast"] = None  # emulated bf16 is slower than float32
+    if threads:
+        profile["threads"] = threads
+    elif profile["threads"] == "auto":
+        profile["threads"] = cpu_threads()
+    profile["compile"] = profile["compile"] or compile_unet
+    return profile
+
+
+def _has_ip_adapter(unet) -> bool:
+    return any(hasattr(p, "to_k_ip") for p in unet.attn_processors.values())
+
+
+def apply_profile(pipeline, profile: dict, device: str) -> dict:
+    """
+    Place the pipeline and enable the profile's diffusers optimizations.
+
+    Call once after LoRA/IP-Adapter loading (attention backends must see the
+    final processors). Replaces pipeline.to(device).
+
+    Returns:
+        Active configuration: what was actually enabled (fallbacks applied)
+    """
+    active = {
+        "profile": profile["name"],
+        "device": device,
+        "dtype": profile["dtype"],
+        "attention": "sdpa",
+        "vae_slicing": False,
+        "vae_tiling": False,
+        "offload": None,
+        "autocast": profile["autocast"],
+        "channels_last": False,
+        "threads": None,
+        "compile": False,
+    }
+
+    if profile["threads"]:
+        torch.set_num_threads(profile["threads"])
+        active["threads"] = profile["threads"]
+    if device == "cpu":
+        torch.backends.mkldnn.enabled = True
+        torch.jit.enable_onednn_fusion(True)  # TorchScript graphs fuse conv/linear + pointwise through oneDNN
+
+    if profile["offload"] == "model":
+        try:
+            pipeline.enable_model_cpu_offload(device=device)
+            active["offload"] = "model"
+        except Exception as e:
+            print(f"Model CPU offload failed ({e}), keeping the pipeline on {device}")
+    if active["offload"] is None:
+        pipeline.to(device)
+
+    if profile["attention"] == "xformers":
+        try:
+            pipeline.enable_xformers_memory_efficient_attention()
+            active["attention"] = "xformers"
+        except Exception:
+            pass  # xformers not installed: stay on SDPA
+    elif profile["attention"] == "sliced":
+        if _has_ip_adapter(pipeline.unet):
+            active["attention"] = "sdpa (slicing skipped: IP-Adapter)"
+        else:
+            pipeline.enable_attention_slicing()
+            active["attention"] = "sliced"
+
+    if profile["vae_slicing"]:
+        pipeline.vae.enable_slicing()
+        active["vae_slicing"] = True
+    if profile["vae_tiling"]:
+        pipeline.vae.enable_tiling()
+        active["vae_tiling"] = True
+
+    if profile["channels_last"]:
+        pipeline.unet.to(memory_format=torch.channels_last)
+        pipeline.vae.to(memory_format=torch.channels_last)
+        active["channels_last"] = True
+
+    if profile["tune"]:
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+
+    if profile["compile"]:
+        try:
+            compile_unet(pipeline.unet, device)
+            active["compile"] = True
+        except Exception as e:
+            print(f"torch.compile unavailable ({e}), running the UNet eagerly")
+
+    return active
+
+
+def compile_unet(unet, device: str, cache_dir: str = COMPILE_CACHE_DIR):
+    """
+    Compile the UNet in place (module identity kept, so processor swaps and
+    forward hooks still work; they trigger a guarded recompile instead).
+
+    The first generation pays the compile time; the FX graph cache in
+    cache_dir makes later processes start from the cached kernels.
+    """
+    import torch._inductor.config as inductor_config
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+    inductor_config.fx_graph_cache = True
+    if device == "cpu":
+        # Treat weights as constants: oneDNN weight prepacking + conv/linear epilogue fusion
+        inductor_config.freezing = True
+    unet.compile()
+
+
+def autocast_context(active: Optional[dict]):
+    """bfloat16 CPU autocast for the profile's pipeline calls (no-op otherwise)."""
+    if active and active.get("autocast") == "bfloat16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def describe_profile(active: dict) -> str:
+    """One-line summary of an apply_profile() result."""
+    parts = [f"attention={active['attention']}", f"dtype={active['dtype']}"]
+    if active["autocast"]:
+        parts.append(f"autocast={active['autocast']}")
+    if active["channels_last"]:
+        parts.append("channels_last")
+    if active["threads"]:
+        parts.append(f"threads={active['threads']}")
+    if active["compile"]:
+        parts.append("compiled")
+    if active["vae_slicing"] or active["vae_tiling"]:
+        vae = [kind for kind in ("slicing", "tiling") if active[f"vae_{kind}"]]
+        parts.append(f"vae={'+'.join(vae)}")
+    if active["offload"]:
+        parts.append(f"offload={active['offload']}")
+    return f"{active['profile']} on {active['device']} ({', '.join(parts)})"
+
+
+def reset_peak_memory(device: str):
+    """Start a new peak-memory window (CUDA only; CPU reports the process peak)."""
+    if device == "cuda" and torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+
+def peak_memory_mb(device: str) -> Optional[float]:
+    """
+    Peak memory since reset_peak_memory().
+
+    CUDA: max allocated by the torch allocator. CPU/MPS: process max RSS
+    (monotonic over the process lifetime, so it only grows across runs);
+    None where the resource module is unavailable (Windows).
+    """
+    if device == "cuda" and torch.cuda.is_available():
+        return round(torch.cuda.max_memory_allocated() / 2 ** 20, 1)
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return round(max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 1024, 1)
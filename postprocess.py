@@ -0,0 +1,389 @@
+"""
+Post-processing Worker Pool for Inpainting Pipeline
+Face swap and GFPGAN enhancement as a separate CPU stage
+
+Both models are pinned to CPU, so running them inline after diffusion leaves
+the diffusion engine idle. PostProcessPool runs them in worker processes
+(models loaded once per worker) and hands back a Future per image, so the
+N results of a batch are post-processed in parallel while the engine moves
+on to the next job.
+
+Swap refinement is a diffusion pass and stays inline in the compositor.
+
+PostProcessBatch wraps the pool for a whole batch: the face swaps of all N
+results run as one swap_many call (source analyzed once; Ghost stacks the
+aligned faces into batched AEI-Net forwards), then enhancement and saving fan
+out per image across the pool again.
+
+Usage:
+    pool = PostProcessPool()
+    future = pool.submit(raw_image, source_face, "result.png",
+                         face_swap_model="insightface", face_enhance_strength=0.8)
+    status = future.result()   # {"status", "output_path", "elapsed", ...}
+
+    batch = PostProcessBatch(pool, size=4)   # same submit() signature
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+
+from PIL import Image
+
+import ort_sessions
+
+
+# Default pool size cap (a generation batch has at most 8 images)
+MAX_DEFAULT_WORKERS = 8
+
+
+def default_workers() -> int:
+    """One worker per CPU core, capped at MAX_DEFAULT_WORKERS."""
+    return max(1, min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS))
+
+
+# Per-process model cache (each worker loads swapper / enhancer once)
+_MODELS = {}
+
+
+def _init_worker(num_threads: int):
+    """Split CPU threads between workers so they don't oversubscribe cores."""
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+    try:
+        import cv2
+        cv2.setNumThreads(num_threads)
+    except ImportError:
+        pass
+    ort_sessions.configure_worker(num_threads)
+
+
+def _get_swapper(model: str):
+    key = ("swap", model)
+    if key not in _MODELS:
+        from face_id import get_face_swapper
+        swapper = get_face_swapper(model=model, device="cpu")
+        _MODELS[key] = swapper if swapper.load() else None
+    return _MODELS[key]
+
+
+def _get_enhancer():
+    key = ("enhance",)
+    if key not in _MODELS:
+        from face_id import FaceEnhancer, HAS_GFPGAN
+        enhancer = None
+        if HAS_GFPGAN:
+            # upscale=1: keep the original size
+            enhancer = FaceEnhancer(device="cpu", upscale=1)
+            if not enhancer.load():
+                enhancer = None
+        _MODELS[key] = enhancer
+    return _MODELS[key]
+
+
+def _get_detector():
+    """InsightFace detector for landmarks when no swap ran first (None if unavailable)."""
+    key = ("detect",)
+    if key not in _MODELS:
+        from face_id import FaceIDExtractor, HAS_INSIGHTFACE
+        extractor = FaceIDExtractor(device="cpu") if HAS_INSIGHTFACE else None
+        _MODELS[key] = extractor if extractor is not None and extractor.load() else None
+    return _MODELS[key]
+
+
+def _detect_face_kps(image: Image.Image):
+    detector = _get_detector()
+    if detector is None:
+        return None
+    face = detector.detect_face(image)
+    return face.kps if face is not None else None
+
+
+def postprocess_image(
+    image: Image.Image,
+    source_face: Image.Image,
+    output_path: str,
+    face_swap_model: Optional[str] = None,
+    face_enhance_strength: Optional[float] = None,
+    debug_folder: Optional[str] = None,
+) -> dict:
+    """
+    Executor entry point: face swap and/or enhance one diffusion result and save it.
+
+    A stage that fails or is unavailable passes its input through unchanged,
+    matching the inline compositor behaviour.
+
+    Args:
+        image: Raw diffusion output
+        source_face: Source face image (swap source)
+        output_path: Where the final image is written
+        face_swap_model: "insightface" / "ghost", or None to skip face swap
+        face_enhance_strength: GFPGAN blend (0.0~1.0), or None to skip enhancement
+        debug_folder: If set, intermediate results are written here
+
+    Returns:
+        Picklable status dict: {"status", "output_path", "face_swap", "face_enhance", "elapsed",
+        "ort_sessions"[, "error"]} (ort_sessions: this worker's cumulative per-session latency)
+    """
+    start = time.time()
+    swapped = enhanced = False
+
+    try:
+        face_kps = None  # landmarks of the swapped face, reused by ROI enhancement
+        if face_swap_model is not None:
+            from face_id import FaceSwapper
+            swapper = _get_swapper(face_swap_model)
+            result = None
+            if isinstance(swapper, FaceSwapper):
+                result, target_face = swapper.swap_face(image, source_face, return_target_face=True)
+                if target_face is not None:
+                    face_kps = target_face.kps
+            elif swapper is not None:
+                result = swapper.swap_face(image, source_face)
+            if result is not None:
+                image = result
+                swapped = True
+                if debug_folder:
+                    image.save(os.path.join(debug_folder, "6.1_faceswap_result.png"), compress_level=1)
+            else:
+                print(f"Face swap unavailable or failed ({face_swap_model}), keeping diffusion output")
+
+        if face_enhance_strength is not None:
+            enhancer = _get_enhancer()
+            result = None
+            if enhancer is not None and face_kps is None:
+                face_kps = _detect_face_kps(image)
+            if enhancer is not None and face_kps is not None:
+                # Restore only the aligned face ROI (GFPGAN's own detector is skipped)
+                result = enhancer.enhance_face_region(
+                    image, blend_ratio=min(face_enhance_strength, 1.0), kps=face_kps)
+            elif enhancer is not None:
+                if face_enhance_strength >= 1.0:
+                    result = enhancer.enhance(image, only_center_face=True, paste_back=True)
+                else:
+                    result = enhancer.enhance_face_region(image, blend_ratio=face_enhance_strength)
+            if result is not None:
+                image = result
+                enhanced = True
+                if debug_folder:
+                    image.save(os.path.join(debug_folder, "6.2_face_enhance_result.png"), compress_level=1)
+            else:
+                print("Face enhance unavailable or failed, keeping previous output")
+
+        # Write next to the target and rename, so readers never see a partial file
+        root, ext = os.path.splitext(output_path)
+        tmp_path = f"{root}.tmp{os.getpid()}{ext}"
+        image.save(tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "output_path": output_path, "face_swap": swapped,
+                "face_enhance": enhanced, "elapsed": round(time.time() - start, 3),
+                "ort_sessions": ort_sessions.session_stats(), "error": str(e)}
+
+    return {"status": "ready", "output_path": output_path, "face_swap": swapped,
+            "face_enhance": enhanced, "elapsed": round(time.time() - start, 3),
+            "ort_sessions": ort_sessions.session_stats()}
+
+
+def swap_batch(
+    images: List[Image.Image],
+    source_face: Image.Image,
+    face_swap_model: str,
+    debug_folders: List[Optional[str]],
+) -> List[Optional[Image.Image]]:
+    """
+    Executor entry point: swap one source face into all results of a batch with a single swap_many call.
+
+    Returns:
+        One swapped image per input (None where the swap failed or is unavailable)
+    """
+    swapper = _get_swapper(face_swap_model)
+    if swapper is None:
+        return [None] * len(images)
+    try:
+        results = swapper.swap_many(images, source_face)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        return [None] * len(images)
+
+    for result, debug_folder in zip(results, debug_folders):
+        if result is not None and debug_folder:
+            result.save(os.path.join(debug_folder, "6.1_faceswap_result.png"), compress_level=1)
+    return results
+
+
+class PostProcessPool:
+    """Process pool running postprocess_image off the diffusion thread."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: Worker processes (None = default_workers())
+        """
+        self.max_workers = max_workers or default_workers()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Lazily start the pool (workers load their models on first use)."""
+        if self._executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.max_workers)
+            # spawn: workers must not inherit CUDA state of the diffusion process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return self._executor
+
+    def submit(
+        self,
+        image: Image.Image,
+        source_face: Image.Image,
+        output_path: str,
+        face_swap_model: Optional[str] = None,
+        face_enhance_strength: Optional[float] = None,
+        debug_folder: Optional[str] = None,
+    ) -> Future:
+        """Queue one result; the Future resolves to postprocess_image's status dict."""
+        return self._get_executor().submit(
+            postprocess_image,
+            image,
+            source_face,
+            output_path,
+            face_swap_model,
+            face_enhance_strength,
+            debug_folder,
+        )
+
+    def submit_swap_batch(
+        self,
+        images: List[Image.Image],
+        source_face: Image.Image,
+        face_swap_model: str,
+        debug_folders: List[Optional[str]],
+    ) -> Future:
+        """Queue one swap_many call for a batch; the Future resolves to swap_batch's image list."""
+        return self._get_executor().submit(swap_batch, images, source_face, face_swap_model, debug_folders)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+class PostProcessBatch:
+    """
+    Batch-level front end of PostProcessPool (same submit() signature).
+
+    Face swap jobs are held until `size` of them have arrived (or flush() is
+    called), then swapped with one swap_many call; each swapped image is
+    enhanced and saved as its own pool job. submit() returns a Future per
+    image right away that resolves to postprocess_image's status dict.
+    Enhance-only jobs go straight to the pool.
+    """
+
+    def __init__(self, pool: PostProcessPool, size: int):
+        """
+        Args:
+            pool: Pool running the swap and the per-image jobs
+            size: Swap jobs expected in this batch (flush happens when reached)
+        """
+        self.pool = pool
+        self.size = max(1, size)
+        self._pending = []  # (future, image, source_face, output_path, model, enhance_strength, debug_folder)
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        image: Image.Image,
+        source_face: Image.Image,
+        output_path: str,
+        face_swap_model: Optional[str] = None,
+        face_enhance_strength: Optional[float] = None,
+        debug_folder: Optional[str] = None,
+    ) -> Future:
+        if face_swap_model is None:
+            return self.pool.submit(image, source_face, output_path,
+                                    face_enhance_strength=face_enhance_strength, debug_folder=debug_folder)
+
+        future = Future()
+        with self._lock:
+            self._pending.append((future, image, source_face, output_path,
+                                  face_swap_model, face_enhance_strength, debug_folder))
+            full = len(self._pending) >= self.size
+        if full:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Swap everything collected so far (call once the batch ends early, e.g. failures or cancel)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            # Waits on the pool off the caller's thread; the per-image Futures resolve as jobs finish
+            threading.Thread(target=self._run, args=(pending,), daemon=True).start()
+
+    def _run(self, pending):
+        start = time.time()
+        _, _, source_face, _, model, _, _ = pending[0]
+        try:
+            swapped = self.pool.submit_swap_batch(
+                [job[1] for job in pending], source_face, model, [job[6] for job in pending]).result()
+        except Exception as e:
+            print(f"Batched face swap failed ({model}): {e}")
+            swapped = [None] * len(pending)
+        swap_elapsed = time.time() - start
+        print(f"Batched face swap ({model}): {sum(r is not None for r in swapped)}/{len(pending)} "
+              f"in {swap_elapsed:.2f}s")
+
+        for (future, image, source_face, output_path, model, enhance, debug_folder), result in zip(pending, swapped):
+            if result is None:
+                print(f"Face swap unavailable or failed ({model}), keeping diffusion output")
+            try:
+                inner = self.pool.submit(result if result is not None else image, source_face, output_path,
+                                         face_enhance_strength=enhance, debug_folder=debug_folder)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(
+                lambda f, outer=future, ok=result is not None: self._resolve(f, outer, ok, swap_elapsed))
+
+    @staticmethod
+    def _resolve(inner: Future, outer: Future, swapped: bool, swap_elapsed: float):
+        if inner.exception() is not None:
+            outer.set_exception(inner.exception())
+            return
+        status = dict(inner.result())
+        status["face_swap"] = swapped
+        status["elapsed"] = round(status.get("elapsed", 0) + swap_elapsed, 3)
+        outer.set_result(status)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4:
+        print("Usage: python postprocess.py <result_image> <source_face> <output> [insightface|ghost]")
+        sys.exit(1)
+
+    model = sys.argv[4] if len(sys.argv) > 4 else "insightface"
+    pool = PostProcessPool(max_workers=1)
+    future = pool.submit(
+        Image.open(sys.argv[1]).convert("RGB"),
+        Image.open(sys.argv[2]).convert("RGB"),
+        sys.argv[3],
+        face_swap_model=model,
+        face_enhance_strength=0.8,
+    )
+    print(future.result())
+    pool.shutdown()
@@ -1,63 +1,32 @@
 """
 Gemini Vision 기반 프롬프트 생성기
 얼굴 이미지를 분석하여 SDXL 인페인팅에 적합한 프롬프트 자동 생성
+
+백엔드 (환경변수 PROMPT_BACKEND):
+    gemini: Gemini Vision API (기본값)
+    stub:   로컬 고정 프롬프트 (오프라인 테스트용, API 호출 없음)
+
+캐시:
+    얼굴 이미지 내용 해시 기준 메모리 + 디스크 캐시 (PROMPT_CACHE_DIR, 기본: .cache/prompts)
+    같은 얼굴로 배치 생성 시 API 호출은 한 번만 발생
 """
 
+import hashlib
+import json
 import os
+import threading
+import time
+from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Optional
 
 
-def load_api_key():
-    """
-    .env 파일에서 GEMINI_API_KEY 로드
-
-    Returns:
-        API 키 (str) 또는 None
-    """
-    # 현재 파일 기준 .env 경로
-    env_path = Path(__file__).parent / ".env"
-
-    if not env_path.exists():
-        return None
-
-    with open(env_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('GEMINI_API_KEY='):
-                return line.split('=', 1)[1].strip().strip('"').strip("'")
-
-    return None
-
-
-def generate_prompt_from_face_image(face_image_path: str) -> str:
-    """
-    Gemini Vision으로 얼굴 이미지를 분석해서 맞춤형 프롬프트 생성
-
-    Args:
-        face_image_path: 분석할 얼굴 이미지 경로
-
-    Returns:
-        생성된 프롬프트 (str)
-    """
-    DEFAULT_PROMPT = "young adult, neutral skin tone, natural features, soft facial structure"
-
-    try:
-        from google import genai
-        from PIL import Image
-    except ImportError as e:
-        print(f"   google-genai 패키지가 없습니다. 기본 프롬프트를 사용합니다. (Error: {e})")
-        return DEFAULT_PROMPT
-
-    # API 키 로드
-    api_key = load_api_key()
-    if not api_key:
-        print("   GEMINI_API_KEY가 설정되지 않았습니다. 기본 프롬프트를 사용합니다.")
-        print("   (.env 파일에 GEMINI_API_KEY=your_key 형식으로 설정하세요)")
-        return DEFAULT_PROMPT
+DEFAULT_PROMPT = "young adult, neutral skin tone, natural features, soft facial structure"
 
-    client = genai.Client(api_key=api_key)
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TIMEOUT = 20.0  # 초
 
-    system_prompt = """
+SYSTEM_PROMPT = """
 You are an expert prompt engineer for Stable Diffusion SDXL image generation with InstantID ControlNet.
 
 **CONTEXT**: This prompt will be used with InstantID face preservation technology. The face itself is already preserved at 99% accuracy, so DO NOT describe facial features like eye shape, nose shape, or mouth details.
@@ -100,31 +69,297 @@ teenage girl, light skin, round face, youthful features, gentle expression, fres
 Now analyze the image and generate the prompt:
 """
 
-    try:
-        # 이미지 로드
-        image = Image.open(face_image_path)
 
-        # Gemini Vision으로 이미지 분석
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[system_prompt, image]
-        )
+_API_KEY_UNSET = object()
+_api_key_cache = _API_KEY_UNSET
 
-        prompt = response.text.strip()
 
-        # 정제 과정
-        prompt = prompt.replace('```', '').replace('"', '').replace("'", '').strip()
+def load_api_key():
+    """
+    GEMINI_API_KEY 로드 (환경변수 우선, 없으면 .env 파일) - 프로세스당 한 번만 읽음
+
+    Returns:
+        API 키 (str) 또는 None
+    """
+    global _api_key_cache
+    if _api_key_cache is not _API_KEY_UNSET:
+        return _api_key_cache
+
+    api_key = os.environ.get("GEMINI_API_KEY") or None
+
+    # 현재 파일 기준 .env 경로
+    env_path = Path(__file__).parent / ".env"
 
-        # 유효성 검사
-        if not prompt or len(prompt) < 15:
-            print("   Gemini 분석 결과가 너무 짧습니다. 기본 프롬프트 사용.")
-            return DEFAULT_PROMPT
+    if api_key is None and env_path.exists():
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('GEMINI_API_KEY='):
+                    api_key = line.split('=', 1)[1].strip().strip('"').strip("'") or None
+                    break
 
+    _api_key_cache = api_key
+    return api_key
+
+
+def _clean_prompt(text: str) -> Optional[str]:
+    """모델 출력 정제 + 유효성 검사 (너무 짧으면 None)"""
+    prompt = text.replace('```', '').replace('"', '').replace("'", '').strip()
+    if not prompt or len(prompt) < 15:
+        return None
+    return prompt
+
+
+class PromptBackend(ABC):
+    """프롬프트 생성 백엔드 인터페이스 (generate 미구현 백엔드는 인스턴스화 시 실패)"""
+
+    name = "base"
+
+    @property
+    def cache_tag(self) -> str:
+        """캐시 키 구분용 (백엔드/모델/시스템 프롬프트가 바뀌면 캐시 무효화)"""
+        return self.name
+
+    @abstractmethod
+    def generate(self, face_image_path: str) -> Optional[str]:
+        """
+        Args:
+            face_image_path: 분석할 얼굴 이미지 경로
+
+        Returns:
+            생성된 프롬프트, 실패 시 None
+        """
+
+
+class GeminiPromptBackend(PromptBackend):
+    """Gemini Vision 백엔드 (클라이언트 재사용 + 요청 타임아웃)"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, model: str = GEMINI_MODEL, timeout: float = GEMINI_TIMEOUT):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_tag(self) -> str:
+        prompt_hash = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:8]
+        return f"{self.name}:{self.model}:{prompt_hash}"
+
+    def _get_client(self):
+        """genai.Client 생성 (최초 1회)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+
+                    api_key = self.api_key or load_api_key()
+                    if not api_key:
+                        return None
+                    self._client = genai.Client(
+                        api_key=api_key,
+                        http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+                    )
+        return self._client
+
+    def generate(self, face_image_path: str) -> Optional[str]:
+        try:
+            from PIL import Image
+            client = self._get_client()
+        except ImportError as e:
+            print(f"   google-genai 패키지가 없습니다. (Error: {e})")
+            return None
+
+        if client is None:
+            print("   GEMINI_API_KEY가 설정되지 않았습니다.")
+            print("   (.env 파일에 GEMINI_API_KEY=your_key 형식으로 설정하세요)")
+            return None
+
+        try:
+            # 이미지 로드
+            image = Image.open(face_image_path)
+
+            # Gemini Vision으로 이미지 분석
+            response = client.models.generate_content(
+                model=self.model,
+                contents=[SYSTEM_PROMPT, image]
+            )
+
+            prompt = _clean_prompt(response.text or "")
+            if prompt is None:
+                print("   Gemini 분석 결과가 너무 짧습니다.")
+            return prompt
+
+        except Exception as e:
+            print(f"   Gemini API 오류: {e}")
+            return None
+
+
+class StubPromptBackend(PromptBackend):
+    """로컬 고정 프롬프트 백엔드 (네트워크 없이 auto-prompt 경로 테스트용)
+
+    PROMPT_STUB_TEXT 환경변수로 반환값 지정 가능
+    """
+
+    name = "stub"
+
+    def __init__(self, prompt: str = None, latency: float = 0.0):
+        self.prompt = prompt or os.environ.get("PROMPT_STUB_TEXT") or (
+            "adult person, medium skin tone, natural facial features, "
+            "neutral expression, well-groomed appearance, professional look"
+        )
+        self.latency = latency
+
+    @property
+    def cache_tag(self) -> str:
+        return f"{self.name}:{hashlib.sha256(self.prompt.encode('utf-8')).hexdigest()[:8]}"
+
+    def generate(self, face_image_path: str) -> Optional[str]:
+        if not os.path.exists(face_image_path):
+            return None
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self.prompt
+
+
+class PromptCache:
+    """얼굴 이미지 내용 해시 -> 프롬프트 (메모리 + 디스크 JSON)"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(face_image_path: str, tag: str) -> str:
+        h = hashlib.sha256(tag.encode("utf-8"))
+        with open(face_image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+        path = self._disk_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                prompt = json.load(f).get("prompt")
+        except (OSError, ValueError):
+            return None
+
+        if prompt:
+            with self._lock:
+                self._memory[key] = prompt
         return prompt
 
-    except Exception as e:
-        print(f"   Gemini API 오류: {e}. 기본 프롬프트를 사용합니다.")
+    def put(self, key: str, prompt: str, tag: str = ""):
+        with self._lock:
+            self._memory[key] = prompt
+
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"prompt": prompt, "backend": tag, "created_at": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"   프롬프트 캐시 저장 실패: {e}")
+
+
+_backend = None
+_cache = None
+
+
+def get_prompt_backend() -> PromptBackend:
+    """PROMPT_BACKEND 환경변수에 따른 백엔드 (프로세스당 1개)"""
+    global _backend
+    if _backend is None:
+        backend_name = os.environ.get("PROMPT_BACKEND", "gemini").lower()
+        if backend_name == "stub":
+            _backend = StubPromptBackend()
+        else:
+            _backend = GeminiPromptBackend(timeout=float(os.environ.get("PROMPT_TIMEOUT", GEMINI_TIMEOUT)))
+    return _backend
+
+
+def set_prompt_backend(backend: Optional[PromptBackend]):
+    """백엔드 교체 (테스트/벤치마크용, None이면 환경변수 기준으로 재생성)"""
+    global _backend
+    _backend = backend
+
+
+def get_prompt_cache() -> PromptCache:
+    global _cache
+    if _cache is None:
+        cache_dir = os.environ.get("PROMPT_CACHE_DIR") or str(Path(__file__).parent / ".cache" / "prompts")
+        _cache = PromptCache(cache_dir)
+    return _cache
+
+
+def generate_prompt(face_image_path: str, use_cache: bool = True) -> Optional[str]:
+    """
+    얼굴 이미지로 프롬프트 생성 (캐시 우선)
+
+    Args:
+        face_image_path: 분석할 얼굴 이미지 경로
+        use_cache: 내용 해시 캐시 사용 여부
+
+    Returns:
+        생성된 프롬프트, 실패 시 None (실패 결과는 캐시하지 않음)
+    """
+    backend = get_prompt_backend()
+    cache = get_prompt_cache() if use_cache else None
+
+    key = None
+    if cache is not None:
+        try:
+            key = cache.make_key(face_image_path, backend.cache_tag)
+        except OSError as e:
+            print(f"   얼굴 이미지를 읽을 수 없습니다: {e}")
+            return None
+        cached = cache.get(key)
+        if cached:
+            print("   프롬프트 캐시 사용")
+            return cached
+
+    prompt = backend.generate(face_image_path)
+
+    if prompt and cache is not None:
+        cache.put(key, prompt, tag=backend.cache_tag)
+    return prompt
+
+
+def generate_prompt_from_face_image(face_image_path: str) -> str:
+    """
+    Gemini Vision으로 얼굴 이미지를 분석해서 맞춤형 프롬프트 생성
+
+    Args:
+        face_image_path: 분석할 얼굴 이미지 경로
+
+    Returns:
+        생성된 프롬프트 (str), 실패 시 DEFAULT_PROMPT
+    """
+    prompt = generate_prompt(face_image_path)
+    if prompt is None:
+        print("   기본 프롬프트를 사용합니다.")
         return DEFAULT_PROMPT
+    return prompt
 
 
 # 모듈 테스트용
@@ -136,5 +371,6 @@ if __name__ == "__main__":
         sys.exit(1)
 
     image_path = sys.argv[1]
+    start = time.time()
     prompt = generate_prompt_from_face_image(image_path)
-    print(f"\n생성된 프롬프트:\n{prompt}")
+    print(f"\n생성된 프롬프트 ({time.time() - start:.2f}s):\n{prompt}")
@@ -0,0 +1,132 @@
+"""
+Benchmark: BiSeNet face parsing, eager vs exported backends per batch size
+
+Builds one FaceParser per backend on CPU and parses the same batch of images
+(input files cycled to fill the batch) at each batch size:
+
+  eager:        PyTorch BiSeNet, argmax in PyTorch
+  torchscript:  traced + frozen graph (79999_iter.torchscript.pt, exported on first use)
+  onnx:         ONNX Runtime session (79999_iter.onnx, exported on first use)
+
+Reports best-of-N milliseconds per batch and per image (preprocessing and
+OpenCV label resizing included), the speedup over eager at the same batch
+size, and label agreement with eager (fraction of identical pixels).
+
+--crop-aware adds a per-image comparison of whole-frame parsing against
+crop-aware parsing (Haar face box, padded square crop at 512): latency and
+the face width the network actually sees at its 512 input.
+
+Usage:
+    python scripts/benchmark_bisenet.py <face> [<face> ...] [--batch-sizes 1,4,8]
+        [--backends eager,torchscript,onnx] [--repeats 5] [--threads 8] [--channels-last] [--crop-aware]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+import ort_sessions
+from face_parsing import BISENET_BACKENDS, BISENET_INPUT_SIZE, FaceParser, face_crop_box
+
+
+def time_call(fn, repeats: int) -> float:
+    """Best wall time over repeats (seconds)"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BiSeNet eager vs TorchScript vs ONNX Runtime on CPU")
+    parser.add_argument("images", nargs="+", help="Face images (cycled to fill each batch)")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="Comma-separated batch sizes (default: 1,4,8)")
+    parser.add_argument("--backends", default=",".join(BISENET_BACKENDS),
+                        help="Comma-separated backends (default: eager,torchscript,onnx)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per cell, best is reported (default: 5)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads for torch and ONNX Runtime (default: library defaults)")
+    parser.add_argument("--channels-last", action="store_true", help="NHWC inputs/weights for the torch backends")
+    parser.add_argument("--crop-aware", action="store_true", help="Also compare whole-frame vs crop-aware parsing per image")
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if args.threads:
+        torch.set_num_threads(args.threads)
+        ort_sessions.configure(intra_op_threads=args.threads)
+
+    sources = [Image.open(path).convert("RGB") for path in args.images]
+    batches = {n: [sources[i % len(sources)] for i in range(n)] for n in batch_sizes}
+
+    results = {}  # (backend, batch size) -> (seconds, label maps)
+    for backend in backends:
+        face_parser = FaceParser(device="cpu", channels_last=args.channels_last,
+                                 backend=backend, max_batch=max(batch_sizes))
+        if not face_parser.load():
+            print("BiSeNet weights unavailable")
+            sys.exit(1)
+        if face_parser.engine.backend != backend:
+            print(f"{backend}: unavailable, skipped")
+            continue
+        for n, images in batches.items():
+            face_parser.get_segmentations(images)  # warm-up (graph optimization / allocator)
+            seconds = time_call(lambda: face_parser.get_segmentations(images), args.repeats)
+            results[(backend, n)] = (seconds, face_parser.get_segmentations(images))
+
+    print("=" * 72)
+    print(f"BiSeNet on CPU, {torch.get_num_threads()} torch threads, best of {args.repeats}")
+    print(f"{'backend':>12} {'batch':>6} {'ms/batch':>10} {'ms/image':>10} {'speedup':>8} {'agree':>8}")
+    for (backend, n), (seconds, labels) in results.items():
+        eager = results.get(("eager", n))
+        speedup = f"{eager[0] / seconds:.2f}x" if eager else "-"
+        agree = "-"
+        if eager:
+            agree = f"{np.mean([np.mean(a == b) for a, b in zip(labels, eager[1])]) * 100:.2f}%"
+        print(f"{backend:>12} {n:>6} {seconds * 1000:>10.1f} {seconds * 1000 / n:>10.1f} {speedup:>8} {agree:>8}")
+    print("=" * 72)
+
+    if args.crop_aware:
+        compare_crop_aware(args, sources)
+
+
+def compare_crop_aware(args, sources):
+    """Whole-frame vs crop-aware parsing per image (first requested backend)."""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    face_parser = FaceParser(device="cpu", channels_last=args.channels_last, backend=args.backends.split(",")[0].strip())
+    face_parser.load()
+
+    print(f"Crop-aware parsing ({face_parser.engine.backend}), best of {args.repeats}")
+    print(f"{'image':>24} {'size':>11} {'full ms':>8} {'crop ms':>8} {'face px full':>13} {'face px crop':>13}")
+    for path, image in zip(args.images, sources):
+        faces = cascade.detectMultiScale(cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY), 1.1, 5)
+        if len(faces) == 0:
+            print(f"{os.path.basename(path):>24} no face detected")
+            continue
+        box = tuple(int(v) for v in max(faces, key=lambda f: f[2] * f[3]))
+        x1, y1, x2, y2 = face_crop_box(box, image.size)
+        full_ms = time_call(lambda: face_parser.get_segmentation(image), args.repeats) * 1000
+        crop_ms = time_call(lambda: face_parser.get_segmentation(image, face_box=box), args.repeats) * 1000
+        # Face width in network input pixels (512 input spans the image vs the crop)
+        full_px = box[2] * BISENET_INPUT_SIZE / image.width
+        crop_px = box[2] * BISENET_INPUT_SIZE / (x2 - x1)
+        size = f"{image.width}x{image.height}"
+        print(f"{os.path.basename(path)[-24:]:>24} {size:>11} {full_ms:>8.1f} {crop_ms:>8.1f} "
+              f"{full_px:>13.0f} {crop_px:>13.0f}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: guidance truncation (CFG cutoff) vs CFG on every step
+
+Loads one compositor and generates the same background/face/seeds with CFG
+throughout (cutoff 1.0) and at each requested cutoff. Reports per-cutoff
+latency, the per-step UNet time with and without the unconditional branch
+(from the compositor's run report), and quality:
+
+  identity: InsightFace cosine similarity between the source face and the result
+  psnr:     truncated result vs the full-CFG result for the same seed
+
+Results are written to --output-dir as cutoff<C>_seed<S>.png for visual review.
+
+Usage:
+    python scripts/benchmark_cfg_cutoff.py <background> <face> [--cutoffs 0.9,0.8,0.6] [--seeds 0,1,2]
+        [--adapter faceid_plus] [--steps 50] [--output-dir outputs/benchmark_cfg_cutoff]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from PIL import Image
+
+from benchmark_generation import identity_similarity, load_pipeline_module, psnr
+from face_id import FaceIDExtractor, HAS_INSIGHTFACE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CFG cutoff: latency and quality per cutoff")
+    parser.add_argument("background", help="Reference background image")
+    parser.add_argument("face", help="Source face image")
+    parser.add_argument("--cutoffs", default="0.9,0.8,0.6", help="Comma-separated CFG cutoffs (default: 0.9,0.8,0.6)")
+    parser.add_argument("--adapter", choices=["faceid_plus", "faceid", "none"], default="faceid_plus",
+                        help="IP-Adapter mode (default: faceid_plus)")
+    parser.add_argument("--seeds", default="0,1,2", help="Comma-separated seeds (default: 0,1,2)")
+    parser.add_argument("--steps", type=int, default=50, help="Inference steps (default: 50)")
+    parser.add_argument("--guidance", type=float, default=7.5, help="Guidance scale (default: 7.5)")
+    parser.add_argument("--prompt", default="professional portrait, natural expression")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warm-up generations (default: 1)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT_DIR, "outputs", "benchmark_cfg_cutoff"))
+    args = parser.parse_args()
+
+    cutoffs = [1.0] + [float(v) for v in args.cutoffs.split(",") if v.strip() and float(v) < 1.0]
+    seeds = [int(s) for s in args.seeds.split(",") if s.strip()]
+    os.makedirs(args.output_dir, exist_ok=True)
+    module = load_pipeline_module()
+
+    adapter_flags = {
+        "faceid_plus": {"use_faceid_plus": True},
+        "faceid": {"use_faceid": True},
+        "none": {"no_ip_adapter": True},
+    }[args.adapter]
+    compositor = module.AutoIDPhotoCompositor(detection_method="opencv", use_bisenet=True, **adapter_flags)
+
+    common = dict(
+        background_path=args.background,
+        source_face_path=args.face,
+        prompt=args.prompt,
+        num_inference_steps=args.steps,
+        guidance_scale=args.guidance,
+        denoising_strength=module.BASELINE_DEFAULTS["denoising"],
+        artifact_level="none",
+    )
+
+    for _ in range(args.warmup):
+        compositor.composite_face_auto(output_path=os.path.join(args.output_dir, "warmup.png"),
+                                       seed=seeds[0], **common)
+
+    results = {}  # cutoff -> [(seed, seconds, path, report)]
+    for cutoff in cutoffs:
+        rows = []
+        for seed in seeds:
+            output_path = os.path.join(args.output_dir, f"cutoff{cutoff}_seed{seed}.png")
+            start = time.perf_counter()
+            image = compositor.composite_face_auto(output_path=output_path, seed=seed, cfg_cutoff=cutoff, **common)
+            elapsed = time.perf_counter() - start
+            if image is None:
+                print(f"cutoff {cutoff}: generation failed for seed {seed}")
+                sys.exit(1)
+            report = (compositor.last_run_steps or {}).get("cfg_cutoff")
+            rows.append((seed, elapsed, output_path, report))
+        results[cutoff] = rows
+
+    del compositor
+    module.cleanup_gpu_memory()
+
+    extractor, source_embedding = None, None
+    if HAS_INSIGHTFACE:
+        extractor = FaceIDExtractor(device="cpu")
+        source = extractor.detect_face(Image.open(args.face).convert("RGB"))
+        source_embedding = source.normed_embedding if source is not None else None
+
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+    baseline = results[1.0]
+    base_latency = mean(r[1] for r in baseline)
+    print("=" * 80)
+    print(f"CFG cutoff, {args.steps} steps, guidance {args.guidance}, seeds {seeds}")
+    print(f"{'cutoff':>7} {'latency s':>10} {'speedup':>8} {'cond steps':>10} "
+          f"{'cfg ms':>7} {'cond ms':>8} {'id':>7} {'psnr':>7}")
+    for cutoff, rows in results.items():
+        latency = mean(r[1] for r in rows)
+        identity = mean(identity_similarity(extractor, source_embedding, r[2]) for r in rows)
+        quality = None if cutoff == 1.0 else mean(psnr(b[2], r[2]) for b, r in zip(baseline, rows))
+        reports = [r[3] for r in rows if r[3]]
+        cond_steps = reports[0]["cond_only_steps"] if reports else 0
+        cfg_ms = mean(r["cfg_step_ms"] for r in reports)
+        cond_ms = mean(r["cond_step_ms"] for r in reports)
+        print(f"{cutoff:>7.2f} {latency:>10.2f} {base_latency / latency:>7.2f}x {cond_steps:>10} "
+              f"{fmt(cfg_ms, '.1f'):>7} {fmt(cond_ms, '.1f'):>8} {fmt(identity, '.3f'):>7} {fmt(quality, '.1f'):>7}")
+    print(f"images: {args.output_dir}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
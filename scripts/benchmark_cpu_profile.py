@@ -0,0 +1,126 @@
+"""
+Benchmark: CPU profile, seconds per denoising step at common resolutions
+
+Loads the inpainting pipeline once on CPU (no IP-Adapter, no face inputs
+needed) and times a grey canvas with an elliptical mask through each variant:
+
+  fp32:          float32, contiguous tensors (the old CPU fallback)
+  bf16:          + bfloat16 autocast (skipped when the CPU has no native bf16)
+  bf16+nhwc:     + channels_last UNet/VAE (the "cpu" profile)
+  compiled:      + torch.compile of the UNet (--compile; first call compiles, not timed)
+
+Seconds per step are measured between step callbacks (the first step and the
+VAE decode are excluded). Runs on a plain Linux box with no accelerator.
+
+Usage:
+    python scripts/benchmark_cpu_profile.py [--resolutions 512x512,768x768,1024x1024]
+        [--steps 4] [--threads 8] [--compile]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import torch
+from PIL import Image, ImageDraw
+
+from benchmark_generation import load_pipeline_module
+from performance import autocast_context, compile_unet, cpu_supports_bf16
+
+
+def make_inputs(width, height):
+    image = Image.new("RGB", (width, height), (128, 128, 128))
+    mask = Image.new("L", (width, height), 0)
+    ImageDraw.Draw(mask).ellipse((width // 4, height // 6, width * 3 // 4, height * 2 // 3), fill=255)
+    return image, mask
+
+
+def seconds_per_step(pipeline, active, width, height, steps, guidance):
+    """Mean wall time between step callbacks (first step excluded)"""
+    image, mask = make_inputs(width, height)
+    stamps = []
+
+    def on_step(_pipe, _index, _timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    with torch.inference_mode(), autocast_context(active):
+        pipeline(prompt="professional portrait photo", image=image, mask_image=mask,
+                 width=width, height=height, num_inference_steps=steps, strength=1.0,
+                 guidance_scale=guidance, generator=torch.Generator("cpu").manual_seed(0),
+                 callback_on_step_end=on_step)
+    intervals = [b - a for a, b in zip(stamps, stamps[1:])]
+    return sum(intervals) / len(intervals) if intervals else None
+
+
+def set_channels_last(pipeline, enabled):
+    memory_format = torch.channels_last if enabled else torch.contiguous_format
+    pipeline.unet.to(memory_format=memory_format)
+    pipeline.vae.to(memory_format=memory_format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU profile: seconds per step per resolution")
+    parser.add_argument("--resolutions", default="512x512,768x768,1024x1024",
+                        help="Comma-separated WxH (default: 512x512,768x768,1024x1024)")
+    parser.add_argument("--steps", type=int, default=4, help="Steps per run, >= 2 (default: 4)")
+    parser.add_argument("--guidance", type=float, default=7.5, help="Guidance scale, > 1 doubles the batch (default: 7.5)")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: CPUs in affinity mask)")
+    parser.add_argument("--compile", action="store_true", help="Also time a torch.compile'd UNet")
+    args = parser.parse_args()
+
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions.split(",") if r.strip()]
+    module = load_pipeline_module()
+    compositor = module.AutoIDPhotoCompositor(
+        detection_method="opencv", use_bisenet=False, no_ip_adapter=True,
+        profile="cpu", cpu_threads=args.threads)
+    pipeline = compositor.pipeline
+    active = compositor.performance
+
+    variants = [("fp32", dict(active, autocast=None), False)]
+    if cpu_supports_bf16():
+        variants += [("bf16", dict(active, autocast="bfloat16"), False),
+                     ("bf16+nhwc", dict(active, autocast="bfloat16"), True)]
+    else:
+        print("CPU has no native bfloat16: bf16 variants skipped")
+        variants += [("fp32+nhwc", dict(active, autocast=None), True)]
+
+    results = {}  # (variant, resolution) -> seconds/step
+    for name, variant_active, channels_last in variants:
+        set_channels_last(pipeline, channels_last)
+        for width, height in resolutions:
+            results[(name, (width, height))] = seconds_per_step(
+                pipeline, variant_active, width, height, args.steps, args.guidance)
+
+    if args.compile:
+        name, variant_active, channels_last = variants[-1]
+        set_channels_last(pipeline, channels_last)
+        compile_unet(pipeline.unet, "cpu")
+        variants.append(("compiled", variant_active, channels_last))
+        for width, height in resolutions:
+            seconds_per_step(pipeline, variant_active, width, height, 2, args.guidance)  # compile warm-up
+            results[("compiled", (width, height))] = seconds_per_step(
+                pipeline, variant_active, width, height, args.steps, args.guidance)
+
+    baseline = variants[0][0]
+    print("=" * 72)
+    print(f"CPU profile, {torch.get_num_threads()} threads, {args.steps} steps, guidance {args.guidance}")
+    header = f"{'variant':>12}" + "".join(f"{f'{w}x{h}':>18}" for w, h in resolutions)
+    print(header)
+    for name, _, _ in variants:
+        row = f"{name:>12}"
+        for resolution in resolutions:
+            seconds = results[(name, resolution)]
+            speedup = results[(baseline, resolution)] / seconds
+            row += f"{f'{seconds:.2f}s ({speedup:.2f}x)':>18}"
+        print(row)
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: few-step turbo generation vs the 50-step baseline
+
+Runs the same background/face/seeds through a baseline compositor and a
+turbo compositor (LoRA fused at load), one after the other so only one SDXL
+pipeline is resident at a time, and reports per-image latency and quality:
+
+  identity: InsightFace cosine similarity between the source face and the result
+  psnr:     turbo result vs the baseline result for the same seed (divergence, not quality)
+
+Results are written to --output-dir as <mode>_seed<N>.png for visual review.
+
+Usage:
+    python scripts/benchmark_generation.py <background> <face> --turbo lightning [--seeds 0,1,2]
+        [--adapter faceid_plus] [--baseline-steps 50] [--output-dir outputs/benchmark_generation]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+from PIL import Image
+
+from face_id import FaceIDExtractor, HAS_INSIGHTFACE
+
+
+def load_pipeline_module():
+    spec = importlib.util.spec_from_file_location(
+        "inpainting_pipeline", os.path.join(ROOT_DIR, "inpainting-pipeline.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def identity_similarity(extractor, source_embedding, image_path):
+    """Cosine similarity of normed InsightFace embeddings (None if no face)"""
+    if extractor is None or source_embedding is None:
+        return None
+    face = extractor.detect_face(Image.open(image_path).convert("RGB"))
+    if face is None:
+        return None
+    return float(np.dot(source_embedding, face.normed_embedding))
+
+
+def psnr(path_a, path_b):
+    a = np.asarray(Image.open(path_a).convert("RGB"), dtype=np.float64)
+    b = np.asarray(Image.open(path_b).convert("RGB"), dtype=np.float64)
+    if a.shape != b.shape:
+        return None
+    mse = np.mean((a - b) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def run_mode(module, args, mode, seeds):
+    """Load one compositor, generate every seed, return [(seed, seconds, path)]"""
+    adapter_flags = {
+        "faceid_plus": {"use_faceid_plus": True},
+        "faceid": {"use_faceid": True},
+        "none": {"no_ip_adapter": True},
+    }[args.adapter]
+    turbo = args.turbo if mode == "turbo" else None
+
+    compositor = module.AutoIDPhotoCompositor(
+        detection_method="opencv", use_bisenet=True, turbo=turbo, turbo_lora=args.turbo_lora, **adapter_flags)
+    if mode == "turbo" and compositor.turbo is None:
+        print("Turbo preset could not be loaded (see log above)")
+        sys.exit(1)
+
+    defaults = compositor.turbo or dict(module.BASELINE_DEFAULTS, steps=args.baseline_steps)
+    common = dict(
+        background_path=args.background,
+        source_face_path=args.face,
+        prompt=args.prompt,
+        num_inference_steps=defaults["steps"],
+        guidance_scale=defaults["guidance"],
+        denoising_strength=defaults["denoising"],
+        artifact_level="none",
+    )
+
+    results = []
+    for i in range(-args.warmup, len(seeds)):
+        seed = seeds[max(i, 0)]
+        output_path = os.path.join(args.output_dir, f"{mode}_seed{seed}.png")
+        start = time.perf_counter()
+        image = compositor.composite_face_auto(output_path=output_path, seed=seed, **common)
+        elapsed = time.perf_counter() - start
+        if image is None:
+            print(f"{mode}: generation failed for seed {seed}")
+            sys.exit(1)
+        if i >= 0:
+            results.append((seed, elapsed, output_path))
+
+    del compositor
+    module.cleanup_gpu_memory()
+    return results, defaults
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turbo vs 50-step baseline: latency and quality")
+    parser.add_argument("background", help="Reference background image")
+    parser.add_argument("face", help="Source face image")
+    parser.add_argument("--turbo", required=True, help="Turbo preset (lcm / lightning / hyper)")
+    parser.add_argument("--turbo-lora", default=None, help="LoRA file (default: models/turbo/<preset file>)")
+    parser.add_argument("--adapter", choices=["faceid_plus", "faceid", "none"], default="faceid_plus",
+                        help="IP-Adapter mode for both runs (default: faceid_plus)")
+    parser.add_argument("--seeds", default="0,1,2", help="Comma-separated seeds (default: 0,1,2)")
+    parser.add_argument("--baseline-steps", type=int, default=50, help="Baseline steps (default: 50)")
+    parser.add_argument("--prompt", default="professional portrait, natural expression")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warm-up generations per mode (default: 1)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT_DIR, "outputs", "benchmark_generation"))
+    args = parser.parse_args()
+
+    seeds = [int(s) for s in args.seeds.split(",") if s.strip()]
+    os.makedirs(args.output_dir, exist_ok=True)
+    module = load_pipeline_module()
+
+    baseline, baseline_cfg = run_mode(module, args, "baseline", seeds)
+    turbo, turbo_cfg = run_mode(module, args, "turbo", seeds)
+
+    extractor, source_embedding = None, None
+    if HAS_INSIGHTFACE:
+        extractor = FaceIDExtractor(device="cpu")
+        source = extractor.detect_face(Image.open(args.face).convert("RGB"))
+        source_embedding = source.normed_embedding if source is not None else None
+
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    print("=" * 72)
+    print(f"baseline: {baseline_cfg['steps']} steps, guidance {baseline_cfg['guidance']}")
+    print(f"turbo:    {args.turbo}, {turbo_cfg['steps']} steps, guidance {turbo_cfg['guidance']}")
+    print(f"{'seed':>6} {'base s':>8} {'turbo s':>8} {'speedup':>8} {'base id':>8} {'turbo id':>9} {'psnr':>7}")
+    for (seed, base_s, base_path), (_, turbo_s, turbo_path) in zip(baseline, turbo):
+        print(f"{seed:>6} {base_s:>8.2f} {turbo_s:>8.2f} {base_s / turbo_s:>7.2f}x "
+              f"{fmt(identity_similarity(extractor, source_embedding, base_path), '.3f'):>8} "
+              f"{fmt(identity_similarity(extractor, source_embedding, turbo_path), '.3f'):>9} "
+              f"{fmt(psnr(base_path, turbo_path), '.1f'):>7}")
+    base_mean = sum(r[1] for r in baseline) / len(baseline)
+    turbo_mean = sum(r[1] for r in turbo) / len(turbo)
+    print(f"mean latency: baseline {base_mean:.2f}s, turbo {turbo_mean:.2f}s ({base_mean / turbo_mean:.2f}x)")
+    print(f"images: {args.output_dir}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: Ghost face swap, per-image swap_face vs batched swap_many
+
+Usage:
+    python scripts/benchmark_ghost_batch.py <target> <source> [--count 4] [--device cpu] [--repeats 3]
+
+<target> may be a single image (replicated --count times) or a directory of
+images (the first --count are used).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from PIL import Image
+
+from face_id import GhostFaceSwapper, HAS_GHOST
+
+
+def load_targets(path: str, count: int) -> list:
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith((".png", ".jpg", ".jpeg", ".webp")))
+        images = [Image.open(os.path.join(path, n)).convert("RGB") for n in names[:count]]
+    else:
+        images = [Image.open(path).convert("RGB")] * count
+    if len(images) < count:
+        print(f"Only {len(images)} target images found")
+    return images
+
+
+def time_call(fn, repeats: int) -> float:
+    """Best wall time over repeats (seconds)"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ghost per-image vs batched swap benchmark")
+    parser.add_argument("target", help="Target image or directory of targets")
+    parser.add_argument("source", help="Source face image")
+    parser.add_argument("--count", type=int, default=4, help="Targets per batch (default: 4)")
+    parser.add_argument("--device", default="cpu", help="cpu / cuda (default: cpu)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repeats, best is reported (default: 3)")
+    args = parser.parse_args()
+
+    if not HAS_GHOST:
+        print("Ghost not available. Run: bash scripts/setup_ghost.sh")
+        sys.exit(1)
+
+    swapper = GhostFaceSwapper(device=args.device)
+    if not swapper.load():
+        sys.exit(1)
+
+    targets = load_targets(args.target, args.count)
+    source = Image.open(args.source).convert("RGB")
+
+    # Warm-up (model init, allocator, fallback swapper if it is needed)
+    swapper.swap_face(targets[0], source)
+
+    per_image = time_call(lambda: [swapper.swap_face(t, source) for t in targets], args.repeats)
+    batched = time_call(lambda: swapper.swap_many(targets, source), args.repeats)
+
+    n = len(targets)
+    print("=" * 60)
+    print(f"Ghost swap on {args.device}, {n} targets (best of {args.repeats})")
+    print(f"  per-image swap_face: {per_image:.3f}s ({per_image / n * 1000:.0f} ms/image)")
+    print(f"  batched swap_many:   {batched:.3f}s ({batched / n * 1000:.0f} ms/image)")
+    print(f"  speedup:             {per_image / batched:.2f}x")
+    print(f"  swap stats:          {swapper.fallback_stats()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
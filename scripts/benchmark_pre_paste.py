@@ -0,0 +1,176 @@
+"""
+Benchmark: pre-paste, legacy full-frame path vs ROI fast path
+
+Times the detection + blending work of AutoIDPhotoCompositor._pre_paste_face
+on a background resized to 1024x1536 (the pipeline's portrait working size):
+
+  legacy: full-resolution Haar on background and source, full-frame copies,
+          RGB->BGR round trip and cv2.seamlessClone against the whole frame
+  fast:   detection at PRE_PASTE_DETECT_SIDE (background cached per reference),
+          seamless_clone_roi inside a padded ROI, no BGR conversion
+
+The BiSeNet mask is replaced by the pipeline's ellipse fallback so the numbers
+isolate the OpenCV work. Only cv2/numpy run here; the pipeline module is loaded
+for its helpers (no models are loaded).
+
+Usage:
+    python scripts/benchmark_pre_paste.py <background> <source> [--size 1024x1536] [--repeats 5]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def load_pipeline_module():
+    spec = importlib.util.spec_from_file_location(
+        "inpainting_pipeline", os.path.join(ROOT_DIR, "inpainting-pipeline.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def expand_target(box, shape):
+    x, y, w, h = box
+    x1 = max(0, int(x - w * 0.5))
+    y1 = max(0, int(y - h * 0.5 * 1.2))
+    x2 = min(shape[1], int(x + w + w * 0.5))
+    y2 = min(shape[0], int(y + h + h * 0.5 * 0.5))
+    return x1, y1, x2, y2
+
+
+def expand_source(box, shape):
+    x, y, w, h = box
+    x1 = max(0, int(x - w * 0.4))
+    y1 = max(0, int(y - h * 0.4))
+    x2 = min(shape[1], int(x + w + w * 0.4))
+    y2 = min(shape[0], int(y + h + h * 0.4 * 0.3))
+    return x1, y1, x2, y2
+
+
+def ellipse_mask(w, h):
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.ellipse(mask, (w // 2, h // 2), (int(w * 0.45), int(h * 0.48)), 0, 0, 360, 255, -1)
+    return mask
+
+
+def legacy_pre_paste(cascade, background_img, source_img):
+    """Pre-paste as it ran before the fast path (detection + blending only)"""
+    bg_array = np.array(background_img)
+    src_array = np.array(source_img)
+
+    gray = cv2.cvtColor(bg_array[:, :, ::-1], cv2.COLOR_BGR2GRAY)
+    faces = cascade.detectMultiScale(gray, 1.1, 4)
+    if len(faces) == 0:
+        return None
+    x1, y1, x2, y2 = expand_target(max(faces, key=lambda f: f[2] * f[3]), bg_array.shape)
+
+    gray = cv2.cvtColor(src_array[:, :, ::-1], cv2.COLOR_BGR2GRAY)
+    faces = cascade.detectMultiScale(gray, 1.1, 4)
+    if len(faces) > 0:
+        sx1, sy1, sx2, sy2 = expand_source(max(faces, key=lambda f: f[2] * f[3]), src_array.shape)
+        src_array = src_array[sy1:sy2, sx1:sx2]
+
+    target_w, target_h = x2 - x1, y2 - y1
+    src_resized = cv2.resize(src_array, (target_w, target_h), interpolation=cv2.INTER_LANCZOS4)
+    mask = ellipse_mask(target_w, target_h)
+
+    result = bg_array.copy()
+    result_bgr = result[:, :, ::-1].copy()
+    result_bgr = cv2.seamlessClone(src_resized[:, :, ::-1], result_bgr, mask,
+                                   (x1 + target_w // 2, y1 + target_h // 2), cv2.NORMAL_CLONE)
+    return Image.fromarray(result_bgr[:, :, ::-1])
+
+
+def fast_pre_paste(module, cascade, background_img, source_img, target_face_box=None):
+    """Fast path: reused/downscaled detection and ROI-limited clone"""
+    bg_array = np.array(background_img)
+    src_array = np.array(source_img)
+
+    if target_face_box is None:
+        target_face_box = module.detect_face_box(cascade, bg_array)
+    if target_face_box is None:
+        return None
+    x1, y1, x2, y2 = expand_target(target_face_box, bg_array.shape)
+
+    src_face = module.detect_face_box(cascade, src_array)
+    if src_face is not None:
+        sx1, sy1, sx2, sy2 = expand_source(src_face, src_array.shape)
+        src_array = src_array[sy1:sy2, sx1:sx2]
+
+    target_w, target_h = x2 - x1, y2 - y1
+    src_resized = cv2.resize(src_array, (target_w, target_h), interpolation=cv2.INTER_LANCZOS4)
+    mask = ellipse_mask(target_w, target_h)
+
+    module.seamless_clone_roi(bg_array, src_resized, mask, (x1, y1))
+    return Image.fromarray(bg_array)
+
+
+def time_call(fn, repeats: int) -> float:
+    """Best wall time over repeats (seconds)"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-paste legacy vs ROI fast path benchmark")
+    parser.add_argument("background", help="Reference background image (with a face)")
+    parser.add_argument("source", help="Source face image")
+    parser.add_argument("--size", default="1024x1536", help="Background size WxH (default: 1024x1536)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repeats, best is reported (default: 5)")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    module = load_pipeline_module()
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+    background = Image.open(args.background).convert("RGB").resize((width, height), Image.LANCZOS)
+    source = Image.open(args.source).convert("RGB")
+
+    legacy_out = legacy_pre_paste(cascade, background, source)
+    if legacy_out is None:
+        print("No face detected in the background at full resolution")
+        sys.exit(1)
+    cached_box = module.detect_face_box(cascade, np.array(background))
+    if cached_box is None:
+        print(f"No face detected in the background at {module.PRE_PASTE_DETECT_SIDE}px")
+        sys.exit(1)
+
+    legacy = time_call(lambda: legacy_pre_paste(cascade, background, source), args.repeats)
+    fast = time_call(lambda: fast_pre_paste(module, cascade, background, source), args.repeats)
+    cached = time_call(lambda: fast_pre_paste(module, cascade, background, source, cached_box), args.repeats)
+
+    # Same clone at the same placement should match the full-frame result
+    x1, y1, x2, y2 = expand_target(cached_box, (height, width))
+    patch = cv2.resize(np.array(source), (x2 - x1, y2 - y1), interpolation=cv2.INTER_LANCZOS4)
+    mask = ellipse_mask(x2 - x1, y2 - y1)
+    full = cv2.seamlessClone(patch, np.array(background), mask,
+                             (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2), cv2.NORMAL_CLONE)
+    roi = module.seamless_clone_roi(np.array(background), patch, mask, (x1, y1))
+    max_diff = int(np.abs(full.astype(np.int16) - roi.astype(np.int16)).max())
+
+    print("=" * 60)
+    print(f"Pre-paste at {width}x{height} (best of {args.repeats})")
+    print(f"  legacy full-frame:          {legacy * 1000:.1f} ms")
+    print(f"  fast (detect + ROI clone):  {fast * 1000:.1f} ms  ({legacy / fast:.2f}x)")
+    print(f"  fast (cached background):   {cached * 1000:.1f} ms  ({legacy / cached:.2f}x)")
+    print(f"  ROI vs full-frame clone max pixel diff: {max_diff}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
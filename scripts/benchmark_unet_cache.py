@@ -0,0 +1,126 @@
+"""
+Benchmark: cross-step UNet feature cache at several refresh intervals
+
+Loads one compositor and generates the same background/face/seeds with the
+UNet cache off (interval 0) and at each requested interval, switching the
+cache at runtime. Reports per-interval latency and quality:
+
+  identity: InsightFace cosine similarity between the source face and the result
+  psnr:     cached result vs the uncached result for the same seed
+
+Results are written to --output-dir as interval<N>_seed<S>.png for visual review.
+
+Usage:
+    python scripts/benchmark_unet_cache.py <background> <face> [--intervals 2,3,4] [--seeds 0,1,2]
+        [--adapter faceid_plus] [--steps 50] [--output-dir outputs/benchmark_unet_cache]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from PIL import Image
+
+from benchmark_generation import identity_similarity, load_pipeline_module, psnr
+from face_id import FaceIDExtractor, HAS_INSIGHTFACE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UNet feature cache: latency and quality per interval")
+    parser.add_argument("background", help="Reference background image")
+    parser.add_argument("face", help="Source face image")
+    parser.add_argument("--intervals", default="2,3,4", help="Comma-separated cache intervals (default: 2,3,4)")
+    parser.add_argument("--adapter", choices=["faceid_plus", "faceid", "none"], default="faceid_plus",
+                        help="IP-Adapter mode (default: faceid_plus)")
+    parser.add_argument("--seeds", default="0,1,2", help="Comma-separated seeds (default: 0,1,2)")
+    parser.add_argument("--steps", type=int, default=50, help="Inference steps (default: 50)")
+    parser.add_argument("--prompt", default="professional portrait, natural expression")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warm-up generations (default: 1)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT_DIR, "outputs", "benchmark_unet_cache"))
+    args = parser.parse_args()
+
+    intervals = [0] + [int(v) for v in args.intervals.split(",") if v.strip() and int(v) > 1]
+    seeds = [int(s) for s in args.seeds.split(",") if s.strip()]
+    os.makedirs(args.output_dir, exist_ok=True)
+    module = load_pipeline_module()
+
+    adapter_flags = {
+        "faceid_plus": {"use_faceid_plus": True},
+        "faceid": {"use_faceid": True},
+        "none": {"no_ip_adapter": True},
+    }[args.adapter]
+    compositor = module.AutoIDPhotoCompositor(detection_method="opencv", use_bisenet=True, **adapter_flags)
+    if not module.HAS_UNET_CACHE:
+        print("unet_cache.py could not be imported")
+        sys.exit(1)
+
+    common = dict(
+        background_path=args.background,
+        source_face_path=args.face,
+        prompt=args.prompt,
+        num_inference_steps=args.steps,
+        guidance_scale=module.BASELINE_DEFAULTS["guidance"],
+        denoising_strength=module.BASELINE_DEFAULTS["denoising"],
+        artifact_level="none",
+    )
+
+    for _ in range(args.warmup):
+        compositor.composite_face_auto(output_path=os.path.join(args.output_dir, "warmup.png"),
+                                       seed=seeds[0], unet_cache_interval=0, **common)
+
+    results = {}  # interval -> [(seed, seconds, path, stats)]
+    for interval in intervals:
+        rows = []
+        for seed in seeds:
+            output_path = os.path.join(args.output_dir, f"interval{interval}_seed{seed}.png")
+            start = time.perf_counter()
+            image = compositor.composite_face_auto(
+                output_path=output_path, seed=seed, unet_cache_interval=interval, **common)
+            elapsed = time.perf_counter() - start
+            if image is None:
+                print(f"interval {interval}: generation failed for seed {seed}")
+                sys.exit(1)
+            stats = (compositor.last_run_steps or {}).get("unet_cache")
+            rows.append((seed, elapsed, output_path, stats))
+        results[interval] = rows
+
+    del compositor
+    module.cleanup_gpu_memory()
+
+    extractor, source_embedding = None, None
+    if HAS_INSIGHTFACE:
+        extractor = FaceIDExtractor(device="cpu")
+        source = extractor.detect_face(Image.open(args.face).convert("RGB"))
+        source_embedding = source.normed_embedding if source is not None else None
+
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+    baseline = results[0]
+    base_latency = mean(r[1] for r in baseline)
+    print("=" * 72)
+    print(f"UNet feature cache, {args.steps} steps, seeds {seeds}")
+    print(f"{'interval':>8} {'latency s':>10} {'speedup':>8} {'unet full/cached':>17} {'id':>7} {'psnr':>7}")
+    for interval, rows in results.items():
+        latency = mean(r[1] for r in rows)
+        identity = mean(identity_similarity(extractor, source_embedding, r[2]) for r in rows)
+        quality = None if interval == 0 else mean(psnr(b[2], r[2]) for b, r in zip(baseline, rows))
+        stats = rows[0][3]
+        calls = f"{stats['full']}/{stats['cached']}" if stats else "-"
+        print(f"{interval:>8} {latency:>10.2f} {base_latency / latency:>7.2f}x {calls:>17} "
+              f"{fmt(identity, '.3f'):>7} {fmt(quality, '.1f'):>7}")
+    print(f"images: {args.output_dir}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
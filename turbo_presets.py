@@ -0,0 +1,41 @@
+"""
+Few-Step (Turbo) Generation Presets
+Single source for the pipeline's turbo LoRA/scheduler presets and the web API defaults
+
+Each preset names a local LoRA (under models/turbo/), its scheduler, and the
+default steps / guidance / strength. steps is the number of actual denoising
+steps (the pipeline stretches the schedule when strength < 1); guidance 1.0
+means no CFG (one UNet batch).
+
+Usage:
+    from turbo_presets import TURBO_PRESETS, TurboPreset, request_defaults
+    preset = TURBO_PRESETS["lightning"]
+    request_defaults("lcm")   # {"steps": 6, "guidance_scale": 1.0, "denoise_strength": 0.92}
+"""
+
+from typing import Literal, get_args
+
+
+TURBO_PRESETS = {
+    "lcm": {"lora": "lcm-lora-sdxl.safetensors", "scheduler": "lcm",
+            "steps": 6, "guidance": 1.0, "denoising": 0.92},
+    "lightning": {"lora": "sdxl_lightning_4step_lora.safetensors", "scheduler": "euler_trailing",
+                  "steps": 4, "guidance": 1.0, "denoising": 1.0},
+    "hyper": {"lora": "Hyper-SDXL-4steps-lora.safetensors", "scheduler": "ddim_trailing",
+              "steps": 4, "guidance": 1.0, "denoising": 1.0},
+}
+
+# Preset names as a type (API validation); must list exactly the TURBO_PRESETS keys
+TurboPreset = Literal["lcm", "lightning", "hyper"]
+if set(get_args(TurboPreset)) != set(TURBO_PRESETS):
+    raise RuntimeError("TurboPreset is out of sync with TURBO_PRESETS")
+
+
+def request_defaults(name: str) -> dict:
+    """Preset defaults keyed by the web API's GenerationParams field names."""
+    preset = TURBO_PRESETS[name]
+    return {
+        "steps": preset["steps"],
+        "guidance_scale": preset["guidance"],
+        "denoise_strength": preset["denoising"],
+    }
@@ -0,0 +1,160 @@
+"""
+Cross-step UNet Feature Cache for Inpainting Pipeline
+DeepCache-style reuse of deep UNet features between adjacent denoising steps
+
+High-level UNet features change little from one step to the next. Every
+`interval` UNet calls a full forward runs and the output of the deepest
+skipped up block (plus the skipped down blocks' outputs) is cached. The calls
+in between run only the shallow branch - conv_in, down_blocks[:depth],
+up_blocks[-depth:], conv_out - and feed the cached deep feature into it.
+
+For the SDXL UNet with depth=1 the shallow branch is DownBlock2D + UpBlock2D,
+which contain no attention at all, so the IP-Adapter attention processors are
+untouched: they run on full steps and are simply not reached on cached ones.
+
+The cache is keyed by the batch size of the UNet input; a change (e.g. CFG
+switched off mid-run) forces a full step. Call reset() before every pipeline
+call so features never leak between generations.
+
+Usage:
+    cache = UNetFeatureCache(pipeline.unet, interval=3)
+    cache.enable()
+    cache.reset(); pipeline(...)
+    print(cache.stats)      # {"full": 17, "cached": 33}
+    cache.disable()
+"""
+
+from typing import Optional
+
+
+# Shallow branch depth (down/up blocks kept live on cached steps)
+DEFAULT_DEPTH = 1
+
+
+class UNetFeatureCache:
+    """Patches a diffusers UNet2DConditionModel to skip its deep blocks between refreshes."""
+
+    def __init__(self, unet, interval: int = 3, depth: int = DEFAULT_DEPTH):
+        """
+        Args:
+            unet: diffusers UNet2DConditionModel (patched in place while enabled)
+            interval: Full forward every `interval` UNet calls (1 = no caching)
+            depth: Number of outermost down/up blocks that always run
+        """
+        num_blocks = len(unet.down_blocks)
+        if not 1 <= depth < num_blocks or len(unet.up_blocks) != num_blocks:
+            raise ValueError(f"depth must be in [1, {num_blocks - 1}] for this UNet")
+        self.unet = unet
+        self.interval = max(1, int(interval))
+        self.depth = depth
+        self.stats = {"full": 0, "cached": 0}
+
+        self._originals = {}
+        self._pre_hook = None
+        self._calls = 0
+        self._cached_step = False
+        self._batch = None
+        self._down_outputs = {}
+        self._up_output = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._pre_hook is not None
+
+    def reset(self):
+        """Drop cached features and counters (call before each pipeline run)."""
+        self._calls = 0
+        self._cached_step = False
+        self._batch = None
+        self._down_outputs = {}
+        self._up_output = None
+        self.stats = {"full": 0, "cached": 0}
+
+    def enable(self):
+        if self.enabled:
+            return
+        unet = self.unet
+        skipped_down = range(self.depth, len(unet.down_blocks))
+        boundary = len(unet.up_blocks) - self.depth - 1  # deepest-skipped up block whose output feeds the shallow branch
+
+        for index in skipped_down:
+            self._patch(unet.down_blocks[index], self._wrap_down(index, unet.down_blocks[index].forward))
+        if unet.mid_block is not None:
+            self._patch(unet.mid_block, self._wrap_skip(unet.mid_block.forward))
+        for index in range(boundary):
+            self._patch(unet.up_blocks[index], self._wrap_skip(unet.up_blocks[index].forward))
+        self._patch(unet.up_blocks[boundary], self._wrap_boundary(unet.up_blocks[boundary].forward))
+
+        self._pre_hook = unet.register_forward_pre_hook(self._before_forward, with_kwargs=True)
+        self.reset()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for module, forward in self._originals.values():
+            module.forward = forward
+        self._originals = {}
+        self._pre_hook.remove()
+        self._pre_hook = None
+        self.reset()
+
+    # ----- patching -----
+
+    def _patch(self, module, forward):
+        self._originals[id(module)] = (module, module.forward)
+        module.forward = forward
+
+    def _before_forward(self, _module, args, kwargs):
+        """Decide per UNet call whether the deep blocks run."""
+        sample = args[0] if args else kwargs.get("sample")
+        batch = sample.shape[0] if sample is not None else None
+        refresh = (
+            self._up_output is None
+            or batch != self._batch
+            or self._calls % self.interval == 0
+        )
+        self._cached_step = not refresh
+        self._batch = batch
+        self._calls += 1
+        self.stats["cached" if self._cached_step else "full"] += 1
+        return None
+
+    @staticmethod
+    def _hidden_states(args, kwargs):
+        return kwargs["hidden_states"] if "hidden_states" in kwargs else args[0]
+
+    def _wrap_down(self, index, original):
+        def forward(*args, **kwargs):
+            if self._cached_step:
+                # (hidden_states, res_samples) from the last full step; res samples only
+                # reach the skipped up blocks but keep the UNet's bookkeeping/shapes intact
+                return self._down_outputs[index]
+            output = original(*args, **kwargs)
+            self._down_outputs[index] = output
+            return output
+        return forward
+
+    def _wrap_skip(self, original):
+        def forward(*args, **kwargs):
+            if self._cached_step:
+                return self._hidden_states(args, kwargs)
+            return original(*args, **kwargs)
+        return forward
+
+    def _wrap_boundary(self, original):
+        def forward(*args, **kwargs):
+            if self._cached_step:
+                return self._up_output
+            output = original(*args, **kwargs)
+            self._up_output = output
+            return output
+        return forward
+
+
+def create_unet_cache(unet, interval: int, depth: int = DEFAULT_DEPTH) -> Optional[UNetFeatureCache]:
+    """Enabled cache for interval > 1, otherwise None (caching off)."""
+    if not interval or interval <= 1:
+        return None
+    cache = UNetFeatureCache(unet, interval=interval, depth=depth)
+    cache.enable()
+    return cache
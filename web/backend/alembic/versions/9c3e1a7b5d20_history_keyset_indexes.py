@@ -0,0 +1,43 @@
+"""history_keyset_indexes
+
+Revision ID: 9c3e1a7b5d20
+Revises: 4d89c2540180
+Create Date: 2026-10-19 10:12:08.441905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e1a7b5d20'
+down_revision: Union[str, Sequence[str], None] = '4d89c2540180'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    op.create_index(
+        'ix_history_user_id_created_at_id',
+        'history',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+    )
+    # Favorites-only listing (small partial index)
+    op.create_index(
+        'ix_history_user_favorites',
+        'history',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('is_favorite IS TRUE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_history_user_favorites', table_name='history')
+    op.drop_index('ix_history_user_id_created_at_id', table_name='history')
@@ -3,7 +3,15 @@ Core module
 """
 from core.config import settings
 from core.database import Base, get_db, init_db, close_db
-from core.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from core.security import (
+    verify_password,
+    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+    decode_access_token,
+)
+from core.file_index import FileIndex, file_index, shard_dir
 
 __all__ = [
     "settings",
@@ -13,6 +21,11 @@ __all__ = [
     "close_db",
     "verify_password",
     "get_password_hash",
+    "verify_password_async",
+    "get_password_hash_async",
     "create_access_token",
     "decode_access_token",
+    "FileIndex",
+    "file_index",
+    "shard_dir",
 ]
@@ -19,11 +19,28 @@ class Settings(BaseSettings):
     # Celery (parallel processing)
     USE_CELERY: bool = False
 
+    # Resident pipeline (preloaded compositor, next job's CPU preprocessing overlaps current diffusion)
+    USE_RESIDENT_PIPELINE: bool = False
+    PIPELINE_LOOKAHEAD: int = 1  # Jobs prepared ahead of the one being denoised
+    POSTPROCESS_WORKERS: int = 0  # Face swap / GFPGAN processes (0 = one per CPU core, max 8)
+    PIPELINE_TURBO: str = ""  # Few-step preset fused into the resident compositor (lcm / lightning / hyper, "" = 50-step)
+    PIPELINE_PROFILE: str = "default"  # Memory/speed profile (default / throughput / low-memory / cpu)
+    PIPELINE_COMPILE_UNET: bool = False  # torch.compile the UNet (kernels cached in models/torch_compile)
+    PIPELINE_CPU_THREADS: int = 0  # Intra-op threads (0 = profile default)
+
+    # Upload-time face preprocessing (detection / embedding / BiSeNet on CPU workers)
+    PREPROCESS_ON_UPLOAD: bool = False
+    PREPROCESS_WORKERS: int = 1
+
     # JWT (required - must be set in .env)
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
 
+    # Auth performance
+    AUTH_CACHE_TTL: float = 30.0  # Seconds a resolved user is reused across requests
+    PASSWORD_HASH_WORKERS: int = 2  # bcrypt thread pool size
+
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8008
@@ -8,6 +8,7 @@ from sqlalchemy import select
 
 from core.database import get_db
 from core.security import decode_access_token
+from core.principal_cache import principal_cache
 from models.user import User
 
 
@@ -18,6 +19,9 @@ async def get_current_user_optional(
     """
     Get current user if authenticated, None otherwise.
     Used for endpoints that work both with and without authentication.
+
+    Resolved users are cached for AUTH_CACHE_TTL seconds; the returned object
+    is a detached snapshot (reload with db.get(User, user.id) to modify it).
     """
     if not authorization:
         return None
@@ -36,10 +40,16 @@ async def get_current_user_optional(
     if not user_id:
         return None
 
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
+    if user is None:
+        return None
 
-    return user
+    return principal_cache.put(user)
 
 
 async def get_current_user_required(
@@ -0,0 +1,165 @@
+"""
+Id -> file index for uploads and generation results
+
+SQLite (WAL) manifest plus a hash-sharded directory layout, so resolving an
+upload id or a task result is a single indexed lookup no matter how many
+files accumulate under uploads/ and outputs/.
+
+Layout:
+    uploads/<h[:2]>/<h[2:4]>/<file_id><ext>
+    outputs/<h[:2]>/<h[2:4]>/<batch_id>_<index>.png
+    outputs/<h[:2]>/<h[2:4]>/<batch_id>_<index>_<timestamp>/   (pipeline run folder)
+
+where h = sha1(id). The index is shared by the API process and Celery
+workers (same backend directory).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).parent.parent
+UPLOAD_DIR = BACKEND_DIR / "uploads"
+OUTPUT_DIR = BACKEND_DIR / "outputs"
+INDEX_PATH = BACKEND_DIR / "data" / "file_index.db"
+
+# Pre-index uploads were stored flat as uploads/<id><ext>
+LEGACY_EXTENSIONS = [".png", ".jpg", ".jpeg", ".webp"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    kind TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    task_id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    output_index INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    run_folder TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_results_batch_id ON results (batch_id);
+"""
+
+
+def shard_dir(base_dir: Path, key: str) -> Path:
+    """Two-level hash shard directory for an id (not created)"""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return base_dir / digest[:2] / digest[2:4]
+
+
+def to_url(path: Path, base_dir: Path, prefix: str) -> str:
+    """Static URL for a file under a mounted directory (e.g. /outputs/ab/cd/x.png)"""
+    return f"{prefix}/{Path(path).relative_to(base_dir).as_posix()}"
+
+
+class FileIndex:
+    """Thread-safe SQLite manifest of uploads and results"""
+
+    def __init__(self, db_path: Path = INDEX_PATH):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections are not shareable across threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ----- uploads -----
+
+    def upload_path_for(self, file_id: str, ext: str) -> Path:
+        """Sharded destination for a new upload (parent directory created)"""
+        directory = shard_dir(UPLOAD_DIR, file_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{file_id}{ext}"
+
+    def register_upload(self, file_id: str, path: Path, kind: Optional[str] = None):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (id, path, kind, created_at) VALUES (?, ?, ?, ?)",
+                (file_id, str(path), kind, time.time()),
+            )
+
+    def get_upload_path(self, file_id: str) -> Optional[Path]:
+        """Resolve an upload id to its file (None if unknown or deleted)"""
+        row = self._conn().execute(
+            "SELECT path FROM uploads WHERE id = ?", (file_id,)
+        ).fetchone()
+        if row is not None:
+            path = Path(row[0])
+            return path if path.exists() else None
+
+        # Uploads from before the index existed: probe the old flat layout once
+        for ext in LEGACY_EXTENSIONS:
+            path = UPLOAD_DIR / f"{file_id}{ext}"
+            if path.exists():
+                self.register_upload(file_id, path)
+                return path
+        return None
+
+    def get_upload_url(self, file_id: str) -> Optional[str]:
+        path = self.get_upload_path(file_id)
+        return to_url(path, UPLOAD_DIR, "/uploads") if path else None
+
+    def remove_upload(self, file_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM uploads WHERE id = ?", (file_id,))
+
+    # ----- results -----
+
+    def output_path_for(self, batch_id: str, output_index: int) -> Path:
+        """Sharded result path for a batch item (parent directory created)"""
+        directory = shard_dir(OUTPUT_DIR, batch_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{batch_id}_{output_index}.png"
+
+    def register_result(
+        self,
+        task_id: str,
+        batch_id: str,
+        output_index: int,
+        path: Path,
+        run_folder: Optional[Path] = None,
+    ):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(task_id, batch_id, output_index, path, run_folder, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (task_id, batch_id, output_index, str(path),
+                 str(run_folder) if run_folder else None, time.time()),
+            )
+
+    def get_result(self, task_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT batch_id, output_index, path, run_folder FROM results WHERE task_id = ?",
+            (task_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "batch_id": row[0],
+            "output_index": row[1],
+            "path": Path(row[2]),
+            "run_folder": Path(row[3]) if row[3] else None,
+        }
+
+
+# Global index instance
+file_index = FileIndex()
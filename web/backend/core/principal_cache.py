@@ -0,0 +1,92 @@
+"""
+Short-TTL cache of authenticated users keyed by token subject
+
+Avoids a users-table round trip on every authenticated request. Entries are
+dropped when a User row is updated or deleted through the ORM in this
+process; the TTL bounds staleness for changes made elsewhere (other
+workers, raw SQL).
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from core.config import settings
+from models.user import User
+
+
+class PrincipalCache:
+    """Thread-safe TTL cache of detached User snapshots"""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[str, Tuple[float, User]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _snapshot(user: User) -> User:
+        """Transient copy without the password hash (safe to share across sessions)"""
+        return User(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            hashed_password="",
+            is_active=user.is_active,
+            created_at=user.created_at,
+        )
+
+    def get(self, user_id: str) -> Optional[User]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user: User) -> User:
+        """Cache a user and return the shared snapshot"""
+        snapshot = self._snapshot(user)
+        if self.ttl <= 0:
+            return snapshot
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Drop expired entries first, then the oldest ones
+                now = time.monotonic()
+                for key in [k for k, (exp, _) in self._entries.items() if exp < now]:
+                    del self._entries[key]
+                while len(self._entries) >= self.max_size:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user.id] = (time.monotonic() + self.ttl, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache(ttl=settings.AUTH_CACHE_TTL)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    principal_cache.invalidate(target.id)
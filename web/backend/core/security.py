@@ -1,6 +1,11 @@
 """
 Security utilities for password hashing and JWT tokens
 """
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -23,6 +28,94 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+class HashMetrics:
+    """Latency stats for off-loop bcrypt work (queue wait + hashing time)"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)  # (wait_ms, run_ms)
+        self.count = 0
+        self.in_flight = 0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record(self, wait_ms: float, run_ms: float):
+        with self._lock:
+            self._recent.append((wait_ms, run_ms))
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+            count, in_flight = self.count, self.in_flight
+
+        def pct(values, q):
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+        waits = [w for w, _ in recent]
+        runs = [r for _, r in recent]
+        return {
+            "count": count,
+            "in_flight": in_flight,
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "wait_ms_p50": pct(waits, 0.5),
+            "wait_ms_p95": pct(waits, 0.95),
+            "hash_ms_p50": pct(runs, 0.5),
+            "hash_ms_p95": pct(runs, 0.95),
+            "hash_ms_max": round(max(runs), 2) if runs else 0.0,
+        }
+
+
+hash_metrics = HashMetrics()
+
+# Bounded pool so login bursts queue up instead of spawning threads (or blocking the event loop)
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt",
+)
+
+
+async def _run_hash_job(func, *args):
+    """Run a bcrypt call on the hash pool and record its latency"""
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            hash_metrics.record(
+                (started - submitted) * 1000,
+                (time.perf_counter() - started) * 1000,
+            )
+
+    hash_metrics.begin()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, job)
+    finally:
+        hash_metrics.end()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password without blocking the event loop"""
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash without blocking the event loop"""
+    return await _run_hash_job(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
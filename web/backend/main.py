@@ -24,6 +24,8 @@ from routers import generation, upload, history, settings, auth
 from services.websocket_manager import websocket_endpoint
 from core.database import init_db, close_db
 from pipeline_loader import warmup_pipeline
+from services.preprocess_service import preprocess_service
+from services.pipeline_service import postprocess_pool
 
 
 @asynccontextmanager
@@ -41,6 +43,8 @@ async def lifespan(app: FastAPI):
 
     yield
     # Shutdown
+    preprocess_service.shutdown()
+    postprocess_pool.shutdown(wait=False)
     await close_db()
 
 
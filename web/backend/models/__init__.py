@@ -5,6 +5,8 @@ from .schemas import (
     GenerationTask,
     TaskStatus,
     HistoryItem,
+    HistoryListItem,
+    HistoryPage,
     Settings,
     ProgressMessage,
     WebSocketMessage,
@@ -19,6 +21,8 @@ __all__ = [
     "GenerationTask",
     "TaskStatus",
     "HistoryItem",
+    "HistoryListItem",
+    "HistoryPage",
     "Settings",
     "ProgressMessage",
     "WebSocketMessage",
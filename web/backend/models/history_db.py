@@ -1,7 +1,7 @@
 """
 History database model
 """
-from sqlalchemy import Column, String, DateTime, Boolean, JSON, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Boolean, JSON, ForeignKey, Text, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -29,6 +29,16 @@ class HistoryDB(Base):
     # Relationship
     user = relationship("User", backref="history_items")
 
+    # Composite indexes backing keyset pagination (user_id, created_at DESC, id DESC)
+    __table_args__ = (
+        Index("ix_history_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index(
+            "ix_history_user_favorites",
+            "user_id", "created_at", "id",
+            postgresql_where=text("is_favorite IS TRUE"),
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -47,5 +57,18 @@ class HistoryDB(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
+    def to_list_dict(self):
+        """Slim projection for history lists (no params / prompt)"""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "face_image_url": self.face_image_url,
+            "reference_image_url": self.reference_image_url,
+            "result_urls": self.result_urls or [],
+            "count": self.count,
+            "is_favorite": self.is_favorite,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
     def __repr__(self):
         return f"<History {self.id}>"
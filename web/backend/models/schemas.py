@@ -2,10 +2,19 @@
 Pydantic schemas for API models
 """
 
+import sys
 from enum import Enum
-from typing import Optional, List, Any
+from pathlib import Path
+from typing import Optional, List, Any, Literal
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+# turbo_presets.py lives next to inpainting-pipeline.py
+PIPELINE_DIR = Path(__file__).parent.parent.parent.parent
+if str(PIPELINE_DIR) not in sys.path:
+    sys.path.insert(0, str(PIPELINE_DIR))
+
+from turbo_presets import TurboPreset, request_defaults
 
 
 class TaskStatus(str, Enum):
@@ -23,6 +32,11 @@ class GenerationParams(BaseModel):
     steps: int = Field(default=50, ge=1, le=100, description="Number of diffusion steps")
     guidance_scale: float = Field(default=7.5, ge=1.0, le=20.0, description="Guidance scale")
     denoise_strength: float = Field(default=0.92, ge=0.0, le=1.0, description="Denoising strength")
+    turbo: Optional[TurboPreset] = Field(default=None, description="Few-step mode: lcm, lightning, hyper (None = 50-step baseline)")
+    early_stop_threshold: float = Field(default=0.0, ge=0.0, le=1.0, description="Stop denoising once the masked latent delta stays below this (0 = off)")
+    early_stop_patience: int = Field(default=2, ge=1, le=10, description="Consecutive converged steps before stopping early")
+    cfg_cutoff: float = Field(default=1.0, ge=0.0, le=1.0, description="Fraction of steps run with CFG; later steps run conditional-only at half batch (1.0 = CFG throughout)")
+    unet_cache_interval: int = Field(default=0, ge=0, le=10, description="Run the full UNet every N steps and reuse deep features in between (0/1 = off)")
 
     # Face settings
     face_strength: float = Field(default=0.85, ge=0.0, le=1.5, description="Face strength")
@@ -40,6 +54,7 @@ class GenerationParams(BaseModel):
     mask_padding: int = Field(default=0, ge=-100, le=100, description="Mask padding pixels")
     include_hair: bool = Field(default=True, description="Include hair in mask")
     include_neck: bool = Field(default=False, description="Include neck in mask")
+    crop_aware_parsing: bool = Field(default=False, description="Parse only a padded square around the reference face at 512 (sharper masks for small faces)")
 
     # Pre-paste settings
     use_pre_paste: bool = Field(default=False, description="Pre-paste source face before inpainting")
@@ -60,6 +75,19 @@ class GenerationParams(BaseModel):
     # Prompt settings
     auto_prompt: bool = Field(default=False, description="Auto-generate prompt with Gemini Vision")
 
+    # Output settings
+    artifact_level: Literal["none", "result", "debug", "full"] = Field(default="result", description="Saved artifacts: none, result (+params.txt), debug (+intermediates), full (+input copies)")
+
+    @model_validator(mode="after")
+    def apply_turbo_defaults(self):
+        """Turbo mode: preset steps/guidance/strength unless set explicitly"""
+        if self.turbo is None:
+            return self
+        for name, value in request_defaults(self.turbo).items():
+            if name not in self.model_fields_set:
+                setattr(self, name, value)
+        return self
+
 
 class GenerationRequest(BaseModel):
     """Request for starting image generation"""
@@ -110,6 +138,24 @@ class HistoryItem(BaseModel):
     is_favorite: bool = False
 
 
+class HistoryListItem(BaseModel):
+    """Slim history entry for list views (full detail via GET /history/{id})"""
+    id: str
+    title: Optional[str] = None
+    face_image_url: str
+    reference_image_url: Optional[str] = None
+    result_urls: List[str]
+    count: Optional[int] = None
+    created_at: datetime
+    is_favorite: bool = False
+
+
+class HistoryPage(BaseModel):
+    """Cursor-paginated page of history entries"""
+    items: List[HistoryListItem]
+    next_cursor: Optional[str] = None
+
+
 class Settings(BaseModel):
     """User settings"""
     default_params: GenerationParams = Field(default_factory=GenerationParams)
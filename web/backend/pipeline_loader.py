@@ -7,6 +7,8 @@ import sys
 import importlib.util
 from pathlib import Path
 
+from core.config import settings
+
 # Add parent directory to path to import inpainting-pipeline.py
 BACKEND_DIR = Path(__file__).parent
 PIPELINE_DIR = BACKEND_DIR.parent.parent
@@ -40,7 +42,11 @@ def get_pipeline():
                 _pipeline = pipeline_module.AutoIDPhotoCompositor(
                     detection_method='opencv',
                     use_bisenet=True,
-                    use_faceid_plus=True
+                    use_faceid_plus=True,
+                    turbo=settings.PIPELINE_TURBO or None,
+                    profile=settings.PIPELINE_PROFILE,
+                    compile_unet=settings.PIPELINE_COMPILE_UNET,
+                    cpu_threads=settings.PIPELINE_CPU_THREADS or None
                 )
                 print("✅ Models loaded successfully! Ready for fast generation.")
             else:
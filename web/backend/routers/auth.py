@@ -8,7 +8,15 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 
 from core.database import get_db
-from core.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from core.security import (
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+    decode_access_token,
+    hash_metrics,
+)
+from core.principal_cache import principal_cache
+from core.deps import get_current_user_required
 from models.user import User
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -51,7 +59,7 @@ async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         name=user_data.name,
@@ -72,7 +80,7 @@ async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == user_data.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -99,6 +107,15 @@ async def logout():
     return {"message": "Logged out successfully"}
 
 
+@router.get("/metrics")
+async def auth_metrics(current_user: User = Depends(get_current_user_required)):
+    """Password hashing pool latency and principal cache stats (authenticated users only)"""
+    return {
+        "password_hashing": hash_metrics.snapshot(),
+        "principal_cache": principal_cache.stats(),
+    }
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
     token: Optional[str] = None,
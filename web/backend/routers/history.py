@@ -1,14 +1,17 @@
 """
 History management endpoints
 """
-from typing import List, Optional
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Query, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.orm import load_only
 
 from core.database import get_db
 from core.deps import get_current_user_optional
-from models import HistoryItem
+from models import HistoryItem, HistoryListItem, HistoryPage
 from models.user import User
 from models.history_db import HistoryDB
 
@@ -33,10 +36,10 @@ async def get_history(
     query = select(HistoryDB).where(HistoryDB.user_id == current_user.id)
 
     if favorites_only:
-        query = query.where(HistoryDB.is_favorite == True)
+        query = query.where(HistoryDB.is_favorite.is_(True))
 
-    # Sort by created_at descending
-    query = query.order_by(HistoryDB.created_at.desc())
+    # Sort by created_at descending (id as tie-breaker, matches the composite index)
+    query = query.order_by(HistoryDB.created_at.desc(), HistoryDB.id.desc())
     query = query.offset(offset).limit(limit)
 
     result = await db.execute(query)
@@ -45,6 +48,81 @@ async def get_history(
     return [item.to_dict() for item in items]
 
 
+def _encode_cursor(created_at: datetime, item_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), item_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Columns needed for the list projection (params / prompt are left out)
+_LIST_COLUMNS = (
+    HistoryDB.id,
+    HistoryDB.title,
+    HistoryDB.face_image_url,
+    HistoryDB.reference_image_url,
+    HistoryDB.result_urls,
+    HistoryDB.count,
+    HistoryDB.is_favorite,
+    HistoryDB.created_at,
+)
+
+
+@router.get("/list", response_model=HistoryPage)
+async def list_history(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    favorites_only: bool = Query(default=False),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_db),
+):
+    """Keyset-paginated history list (slim items - fetch detail via GET /{item_id})
+
+    Cost per page is constant regardless of page depth: the (user_id, created_at, id)
+    index is seeked to the cursor instead of skipping offset rows.
+    """
+
+    if not current_user:
+        return HistoryPage(items=[], next_cursor=None)
+
+    query = (
+        select(HistoryDB)
+        .options(load_only(*_LIST_COLUMNS))
+        .where(HistoryDB.user_id == current_user.id)
+    )
+
+    if favorites_only:
+        query = query.where(HistoryDB.is_favorite.is_(True))
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(HistoryDB.created_at, HistoryDB.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(HistoryDB.created_at.desc(), HistoryDB.id.desc()).limit(limit + 1)
+
+    result = await db.execute(query)
+    rows = result.scalars().all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+
+    return HistoryPage(
+        items=[item.to_list_dict() for item in rows],
+        next_cursor=next_cursor,
+    )
+
+
 @router.get("/{item_id}", response_model=HistoryItem)
 async def get_history_item(
     item_id: str,
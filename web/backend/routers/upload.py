@@ -5,23 +5,37 @@ Image upload endpoints
 import uuid
 import aiofiles
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 
-router = APIRouter()
+from core.config import settings
+from core.file_index import file_index, UPLOAD_DIR, to_url
+from services.preprocess_service import preprocess_service
 
-UPLOAD_DIR = Path(__file__).parent.parent / "uploads"
+router = APIRouter()
 
 
 class UploadResponse(BaseModel):
     id: str
     filename: str
     url: str
+    preprocess_status: Optional[str] = None  # "pending" when face preprocessing was scheduled
 
 
 @router.post("/image", response_model=UploadResponse)
-async def upload_image(file: UploadFile = File(...)):
-    """Upload a face image for processing"""
+async def upload_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    type: Optional[str] = Form(None),
+    client_id: Optional[str] = Form(None),
+):
+    """Upload a face image for processing
+
+    With PREPROCESS_ON_UPLOAD enabled, face images are preprocessed in the
+    background; completion is reported via a "preprocess_complete" WebSocket
+    message (when client_id is given) and GET /upload/{file_id}/preprocess.
+    """
 
     # Validate file type
     if not file.content_type or not file.content_type.startswith("image/"):
@@ -30,8 +44,8 @@ async def upload_image(file: UploadFile = File(...)):
     # Generate unique ID
     file_id = str(uuid.uuid4())
     ext = Path(file.filename or "image.png").suffix or ".png"
-    filename = f"{file_id}{ext}"
-    filepath = UPLOAD_DIR / filename
+    filepath = file_index.upload_path_for(file_id, ext)
+    filename = filepath.name
 
     # Save file
     try:
@@ -41,20 +55,42 @@ async def upload_image(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
+    file_index.register_upload(file_id, filepath, kind=type)
+
+    # Schedule face preprocessing (reference/background images don't need it)
+    preprocess_status = None
+    if settings.PREPROCESS_ON_UPLOAD and type != "reference":
+        preprocess_service.mark_pending(file_id)
+        background_tasks.add_task(preprocess_service.preprocess_upload, file_id, filepath, client_id)
+        preprocess_status = "pending"
+
     return UploadResponse(
         id=file_id,
         filename=filename,
-        url=f"/uploads/{filename}",
+        url=to_url(filepath, UPLOAD_DIR, "/uploads"),
+        preprocess_status=preprocess_status,
     )
 
 
+@router.get("/{file_id}/preprocess")
+async def get_preprocess_status(file_id: str):
+    """Get face preprocessing status for an uploaded file"""
+
+    status = preprocess_service.get_status(file_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No preprocessing scheduled for this file")
+
+    return {"id": file_id, **status}
+
+
 @router.delete("/{file_id}")
 async def delete_upload(file_id: str):
     """Delete an uploaded file"""
 
-    # Find and delete file
-    for filepath in UPLOAD_DIR.glob(f"{file_id}.*"):
+    filepath = file_index.get_upload_path(file_id)
+    if filepath is not None:
         filepath.unlink()
+        file_index.remove_upload(file_id)
         return {"status": "deleted", "id": file_id}
 
     raise HTTPException(status_code=404, detail="File not found")
@@ -1,6 +1,7 @@
 from .websocket_manager import WebSocketManager, websocket_manager
 from .task_manager import TaskManager, task_manager
 from .pipeline_service import PipelineService
+from .preprocess_service import PreprocessService, preprocess_service
 
 __all__ = [
     "WebSocketManager",
@@ -8,4 +9,6 @@ __all__ = [
     "TaskManager",
     "task_manager",
     "PipelineService",
+    "PreprocessService",
+    "preprocess_service",
 ]
@@ -5,8 +5,11 @@ Supports both local execution and Celery-based parallel GPU workers
 
 import subprocess
 import asyncio
+import concurrent.futures
+import threading
 import shutil
 import random
+import sys
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
@@ -14,14 +17,26 @@ from models import GenerationParams, TaskStatus, ProgressMessage, WebSocketMessa
 from .task_manager import task_manager
 from .websocket_manager import websocket_manager
 from core.config import settings
+from core.file_index import file_index, shard_dir, to_url
 from pipeline_loader import get_pipeline
+from .preprocess_service import ARTIFACT_DIR
 
 # Paths
 PIPELINE_DIR = Path(__file__).parent.parent.parent.parent
+
+# postprocess.py lives next to inpainting-pipeline.py
+if str(PIPELINE_DIR) not in sys.path:
+    sys.path.insert(0, str(PIPELINE_DIR))
+
+from postprocess import PostProcessBatch, PostProcessPool
+
 PIPELINE_SCRIPT = PIPELINE_DIR / "inpainting-pipeline.py"
 DEFAULT_BACKGROUND = PIPELINE_DIR / "inputs" / "background.png"
 VENV_PYTHON = PIPELINE_DIR / "venv" / "bin" / "python"  # Use venv Python for packages
 
+# Face swap / GFPGAN worker processes for the resident pipeline (started on first use)
+postprocess_pool = PostProcessPool(max_workers=settings.POSTPROCESS_WORKERS or None)
+
 
 class PipelineService:
     """Service for running the inpainting pipeline via subprocess"""
@@ -31,22 +46,16 @@ class PipelineService:
         self.output_dir.mkdir(exist_ok=True)
         self.upload_dir = Path(__file__).parent.parent / "uploads"
         self.upload_dir.mkdir(exist_ok=True)
+        # One batch at a time on the preloaded compositor (it holds per-run pipeline state)
+        self._resident_lock = threading.Lock()
 
     def _get_face_image_path(self, face_image_id: str) -> Optional[Path]:
         """Get the path to an uploaded face image"""
-        for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-            path = self.upload_dir / f"{face_image_id}{ext}"
-            if path.exists():
-                return path
-        return None
+        return file_index.get_upload_path(face_image_id)
 
     def _get_reference_image_path(self, reference_image_id: str) -> Optional[Path]:
         """Get the path to an uploaded reference/background image"""
-        for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-            path = self.upload_dir / f"{reference_image_id}{ext}"
-            if path.exists():
-                return path
-        return None
+        return file_index.get_upload_path(reference_image_id)
 
     def _get_background_path(self) -> Path:
         """Get default background image path"""
@@ -126,13 +135,16 @@ class PipelineService:
         else:
             background_path = self._get_background_path()
 
+        # Auto-prompt once per batch (history keeps the original params)
+        run_params = await self._resolve_batch_prompt(batch_id, task_ids, face_image_path, params)
+
         # Use Celery when enabled (for proper GPU worker distribution)
         if settings.USE_CELERY:
             await self._run_celery_batch(
                 batch_id=batch_id,
                 face_image_id=face_image_id,
                 reference_image_id=reference_image_id,
-                params=params,
+                params=run_params,
                 task_ids=task_ids,
             )
         elif parallel:
@@ -143,12 +155,21 @@ class PipelineService:
                     batch_id=batch_id,
                     face_image_path=face_image_path,
                     background_path=background_path,
-                    params=params,
+                    params=run_params,
                     index=i,
                 )
                 for i, task_id in enumerate(task_ids)
             ]
             await asyncio.gather(*tasks)
+        elif settings.USE_RESIDENT_PIPELINE and self._resident_supports(params):
+            # Preloaded compositor: next job is prepared on CPU while the current one denoises
+            await self._run_resident_batch(
+                batch_id=batch_id,
+                face_image_path=face_image_path,
+                background_path=background_path,
+                params=run_params,
+                task_ids=task_ids,
+            )
         else:
             # Sequential execution
             for i, task_id in enumerate(task_ids):
@@ -160,7 +181,7 @@ class PipelineService:
                     batch_id=batch_id,
                     face_image_path=face_image_path,
                     background_path=background_path,
-                    params=params,
+                    params=run_params,
                     index=i,
                 )
 
@@ -168,6 +189,252 @@ class PipelineService:
         if user_id:
             await self._add_to_history_db(batch_id, face_image_id, reference_image_id, params, task_ids, len(task_ids), parallel, user_id, title)
 
+    async def _resolve_batch_prompt(
+        self,
+        batch_id: str,
+        task_ids: List[str],
+        face_image_path: Path,
+        params: GenerationParams,
+    ) -> GenerationParams:
+        """Generate the auto-prompt once for the whole batch
+
+        Returns params with the prompt filled in and auto_prompt disabled, so
+        the pipeline processes don't each call the prompt backend. If the
+        backend is unavailable here, params are returned unchanged and each
+        process falls back to its own (cached) auto-prompt.
+        """
+        if not (params.auto_prompt or not params.prompt):
+            return params
+
+        try:
+            from prompt_generator import generate_prompt
+        except ImportError as e:
+            print(f"[Pipeline] prompt_generator unavailable: {e}")
+            return params
+
+        loop = asyncio.get_running_loop()
+        try:
+            generated_prompt = await loop.run_in_executor(None, generate_prompt, str(face_image_path))
+        except Exception as e:
+            print(f"[Pipeline] Batch prompt generation failed: {e}")
+            generated_prompt = None
+
+        if not generated_prompt:
+            return params
+
+        print(f"[Pipeline] Batch prompt ({len(task_ids)} tasks): {generated_prompt}")
+        for task_id in task_ids:
+            task_manager.update_task(task_id, generated_prompt=generated_prompt)
+        message = WebSocketMessage(
+            type="generated_prompt",
+            data={"prompt": generated_prompt}
+        )
+        await websocket_manager.broadcast_to_batch(batch_id, message)
+
+        return params.model_copy(update={"prompt": generated_prompt, "auto_prompt": False})
+
+    def _resident_supports(self, params: GenerationParams) -> bool:
+        """Whether the preloaded compositor was built for these params
+
+        Adapter mode is fixed when the compositor is loaded. Face swap and
+        enhancement run in the post-processing pool, except when swap
+        refinement is requested: that needs the compositor's own swapper
+        (refinement is a diffusion pass between swap and enhance).
+        """
+        pipeline = get_pipeline()
+        if pipeline is None:
+            return False
+        if params.adapter_mode != pipeline.get_current_mode():
+            return False
+        # The turbo LoRA is fused into the UNet at load time
+        resident_turbo = pipeline.turbo["name"] if getattr(pipeline, "turbo", None) else None
+        if params.turbo != resident_turbo:
+            return False
+        if params.use_face_swap and params.use_swap_refinement:
+            if pipeline.face_swapper is None:
+                return False
+            if params.use_face_enhance and pipeline.face_enhancer is None:
+                return False
+        return True
+
+    async def _run_resident_batch(
+        self,
+        batch_id: str,
+        face_image_path: Path,
+        background_path: Path,
+        params: GenerationParams,
+        task_ids: List[str],
+    ):
+        """Run a batch on the preloaded compositor as a two-stage pipeline
+
+        composite_batch prepares up to PIPELINE_LOOKAHEAD jobs (decode, detection,
+        BiSeNet, pre-paste, embeddings) on a background thread while the current
+        job is denoised, so the GPU does not wait on CPU preprocessing between jobs.
+        Face swaps are collected and run as one swap_many call once the batch's
+        diffusion is done (PostProcessBatch). Per-step previews are not available on this path.
+        """
+        from face_artifacts import FaceArtifactStore
+
+        pipeline = get_pipeline()
+        loop = asyncio.get_running_loop()
+        face_artifacts = None
+        if settings.PREPROCESS_ON_UPLOAD:
+            face_artifacts = await loop.run_in_executor(
+                None, FaceArtifactStore(str(ARTIFACT_DIR)).load_for_image, str(face_image_path)
+            )
+        prompt = params.prompt or "professional portrait, natural expression"
+        # Face swaps of the whole batch run as one swap_many call in the post-process pool
+        postprocess_batch = PostProcessBatch(postprocess_pool, len(task_ids))
+
+        jobs = []
+        for i, task_id in enumerate(task_ids):
+            seed = params.seed if params.seed >= 0 else random.randint(0, 2147483647)
+            jobs.append(dict(
+                background_path=str(background_path),
+                source_face_path=str(face_image_path),
+                prompt=prompt,
+                output_path=str(file_index.output_path_for(batch_id, i)),
+                face_strength=params.face_strength,
+                denoising_strength=params.denoise_strength,
+                num_inference_steps=params.steps,
+                guidance_scale=params.guidance_scale,
+                mask_expand=params.mask_expand,
+                mask_blur=params.mask_blur,
+                seed=seed,
+                include_hair=params.include_hair,
+                include_neck=params.include_neck,
+                face_blend_weight=params.face_blend_weight,
+                hair_blend_weight=params.hair_blend_weight,
+                mask_padding=params.mask_padding,
+                stop_at=params.stop_at,
+                shortcut_scale=params.shortcut_scale,
+                use_pre_paste=params.use_pre_paste,
+                pre_paste_denoising=params.pre_paste_denoising,
+                use_face_swap=params.use_face_swap,
+                use_face_enhance=params.use_face_enhance,
+                face_enhance_strength=params.face_enhance_strength,
+                use_swap_refinement=params.use_swap_refinement,
+                swap_refinement_strength=params.swap_refinement_strength,
+                artifact_level=params.artifact_level,
+                face_artifacts=face_artifacts,
+                postprocess_pool=postprocess_batch,
+                face_swap_model=params.face_swap_model,
+                early_stop_threshold=params.early_stop_threshold,
+                early_stop_patience=params.early_stop_patience,
+                unet_cache_interval=params.unet_cache_interval,
+                cfg_cutoff=params.cfg_cutoff,
+                crop_aware_parsing=params.crop_aware_parsing,
+            ))
+
+        async def start_task(index: int):
+            task_manager.update_task(
+                task_ids[index],
+                status=TaskStatus.PROCESSING,
+                total_steps=params.steps,
+                started_at=datetime.now(),
+            )
+            await self._send_progress(
+                task_ids[index], batch_id, TaskStatus.PROCESSING, 0,
+                total_steps=params.steps,
+                message="Starting generation..."
+            )
+
+        async def complete_task(index: int, result):
+            task_id = task_ids[index]
+            output_path = Path(jobs[index]["output_path"])
+
+            if isinstance(result, concurrent.futures.Future):
+                # Face swap / enhance running in the post-processing pool
+                try:
+                    status = await asyncio.wrap_future(result)
+                except Exception as e:
+                    status = {"status": "failed", "error": str(e)}
+                print(f"[Pipeline Resident] Post-process {task_id}: {status.get('status')} ({status.get('elapsed', 0)}s)")
+                if status.get("status") != "ready":
+                    result = None
+
+            if result is not None and output_path.exists():
+                file_index.register_result(task_id, batch_id, index, output_path)
+                result_url = to_url(output_path, self.output_dir, "/outputs")
+                task_manager.update_task(
+                    task_id,
+                    status=TaskStatus.COMPLETED,
+                    progress=100,
+                    current_step=params.steps,
+                    result_url=result_url,
+                    completed_at=datetime.now(),
+                )
+                await self._send_progress(
+                    task_id, batch_id, TaskStatus.COMPLETED, 100,
+                    current_step=params.steps,
+                    total_steps=params.steps,
+                    preview_url=result_url,
+                    message="Generation completed"
+                )
+            else:
+                task_manager.update_task(
+                    task_id,
+                    status=TaskStatus.FAILED,
+                    error="Pipeline returned no result",
+                    completed_at=datetime.now(),
+                )
+                await self._send_progress(
+                    task_id, batch_id, TaskStatus.FAILED, 0,
+                    message="Generation failed: Pipeline returned no result"
+                )
+
+        postprocessing = []
+
+        async def finish_task(index: int, result):
+            if isinstance(result, concurrent.futures.Future):
+                # Diffusion is done - report post-processing and let the engine move on
+                await self._send_progress(
+                    task_ids[index], batch_id, TaskStatus.PROCESSING, 99,
+                    current_step=params.steps,
+                    total_steps=params.steps,
+                    message="Post-processing..."
+                )
+                postprocessing.append(asyncio.create_task(complete_task(index, result)))
+            else:
+                await complete_task(index, result)
+
+            if index + 1 < len(task_ids) and not task_manager.is_batch_cancelled(batch_id):
+                await start_task(index + 1)
+
+        def run_batch():
+            from contextlib import closing
+
+            try:
+                with self._resident_lock, \
+                        closing(pipeline.composite_batch(jobs, lookahead=settings.PIPELINE_LOOKAHEAD)) as results:
+                    for index, result in results:
+                        asyncio.run_coroutine_threadsafe(finish_task(index, result), loop).result()
+                        if task_manager.is_batch_cancelled(batch_id):
+                            break
+            finally:
+                # Failed or cancelled jobs never reach the batch size - swap what was collected
+                postprocess_batch.flush()
+
+        await start_task(0)
+        try:
+            await loop.run_in_executor(None, run_batch)
+            await asyncio.gather(*postprocessing)
+        except Exception as e:
+            print(f"[Pipeline Resident] Error: {e}")
+            for task_id in task_ids:
+                task = task_manager.get_task(task_id)
+                if task and task.status in (TaskStatus.PENDING, TaskStatus.PROCESSING):
+                    task_manager.update_task(
+                        task_id,
+                        status=TaskStatus.FAILED,
+                        error=str(e),
+                        completed_at=datetime.now(),
+                    )
+                    await self._send_progress(
+                        task_id, batch_id, TaskStatus.FAILED, 0,
+                        message=f"Generation failed: {str(e)}"
+                    )
+
     async def _run_celery_batch(
         self,
         batch_id: str,
@@ -358,7 +625,7 @@ class PipelineService:
             )
 
             if result_path and result_path.exists():
-                result_url = f"/outputs/{result_path.name}"
+                result_url = to_url(result_path, self.output_dir, "/outputs")
                 # Get the last recorded step from the task
                 current_task = task_manager.get_task(task_id)
                 final_step = current_task.current_step if current_task and current_task.current_step > 0 else params.steps
@@ -406,8 +673,7 @@ class PipelineService:
     ) -> Optional[Path]:
         """Execute the inpainting pipeline - use subprocess for preview support"""
 
-        output_filename = f"{batch_id}_{output_index}.png"
-        output_path = self.output_dir / output_filename
+        output_path = file_index.output_path_for(batch_id, output_index)
 
         # Always use subprocess for consistent preview support
         # (Preloaded pipeline can't capture stdout for previews)
@@ -457,8 +723,12 @@ class PipelineService:
             # Run in thread pool to avoid blocking
             import concurrent.futures
             from PIL import Image
+            from face_artifacts import FaceArtifactStore
 
             def run_pipeline():
+                face_artifacts = None
+                if settings.PREPROCESS_ON_UPLOAD:
+                    face_artifacts = FaceArtifactStore(str(ARTIFACT_DIR)).load_for_image(str(face_image_path))
                 result = pipeline.composite_face_auto(
                     background_path=str(background_path),
                     source_face_path=str(face_image_path),
@@ -479,6 +749,12 @@ class PipelineService:
                     stop_at=params.stop_at,
                     shortcut_scale=params.shortcut_scale,
                     save_preview=True,
+                    face_artifacts=face_artifacts,
+                    early_stop_threshold=params.early_stop_threshold,
+                    early_stop_patience=params.early_stop_patience,
+                    unet_cache_interval=params.unet_cache_interval,
+                    cfg_cutoff=params.cfg_cutoff,
+                    crop_aware_parsing=params.crop_aware_parsing,
                 )
                 return result
 
@@ -489,6 +765,7 @@ class PipelineService:
 
             # Check if output exists
             if output_path.exists():
+                file_index.register_result(task_id, batch_id, output_index, output_path)
                 return output_path
             else:
                 raise Exception("Pipeline did not generate output file")
@@ -529,6 +806,31 @@ class PipelineService:
             "--stop-at", str(params.stop_at),
         ]
 
+        # Few-step mode (LoRA fused at load; steps/guidance already carry the preset defaults)
+        if params.turbo:
+            cmd.extend(["--turbo", params.turbo])
+
+        # Deployment memory/speed profile (attention backend, VAE tiling, CPU offload)
+        if settings.PIPELINE_PROFILE != "default":
+            cmd.extend(["--profile", settings.PIPELINE_PROFILE])
+        if settings.PIPELINE_COMPILE_UNET:
+            cmd.append("--compile-unet")
+        if settings.PIPELINE_CPU_THREADS:
+            cmd.extend(["--cpu-threads", str(settings.PIPELINE_CPU_THREADS)])
+
+        # Convergence-based early stopping
+        if params.early_stop_threshold > 0:
+            cmd.extend(["--early-stop-threshold", str(params.early_stop_threshold)])
+            cmd.extend(["--early-stop-patience", str(params.early_stop_patience)])
+
+        # Guidance truncation (conditional-only tail steps)
+        if params.cfg_cutoff < 1.0:
+            cmd.extend(["--cfg-cutoff", str(params.cfg_cutoff)])
+
+        # Cross-step UNet feature cache
+        if params.unet_cache_interval > 1:
+            cmd.extend(["--unet-cache-interval", str(params.unet_cache_interval)])
+
         # Add prompt handling
         if params.auto_prompt or not params.prompt:
             cmd.append("--auto-prompt")
@@ -557,6 +859,8 @@ class PipelineService:
             cmd.append("--no-hair")
         if params.include_neck:
             cmd.append("--include-neck")
+        if params.crop_aware_parsing:
+            cmd.append("--crop-aware-parsing")
 
         # Pre-paste mode (소스 얼굴 미리 붙여넣기)
         if params.use_pre_paste:
@@ -567,6 +871,13 @@ class PipelineService:
         if params.use_face_swap:
             cmd.append("--use-face-swap")
 
+        # Debug artifact level (intermediates are written off the generation thread)
+        cmd.extend(["--artifact-level", params.artifact_level])
+
+        # Reuse upload-time face artifacts when available
+        if settings.PREPROCESS_ON_UPLOAD and ARTIFACT_DIR.exists():
+            cmd.extend(["--face-artifacts-dir", str(ARTIFACT_DIR)])
+
         # Enable preview generation
         cmd.append("--save-preview")
 
@@ -589,6 +900,7 @@ class PipelineService:
         step = 0
         total_steps = params.steps
         progress = 0
+        result_file: Optional[Path] = None
 
         while True:
             # Check if task was cancelled
@@ -619,6 +931,23 @@ class PipelineService:
                 )
                 await websocket_manager.broadcast_to_batch(batch_id, message)
 
+            # Final result path (run_folder/5_result.png)
+            elif line_text.startswith("RESULT:"):
+                result_file = Path(line_text.replace("RESULT:", "").strip())
+                # Hand the result to the client now - the pipeline may still be
+                # flushing debug artifacts before it exits
+                if result_file.exists():
+                    shutil.copy(result_file, output_path)
+                    result_url = to_url(output_path, self.output_dir, "/outputs")
+                    task_manager.update_task(task_id, preview_url=result_url)
+                    await self._send_progress(
+                        task_id, batch_id, TaskStatus.PROCESSING, 99,
+                        current_step=step,
+                        total_steps=total_steps,
+                        preview_url=result_url,
+                        message="Result ready, finalizing...",
+                    )
+
             # Parse preview image path
             elif line_text.startswith("PREVIEW:"):
                 preview_abs_path = line_text.replace("PREVIEW:", "").strip()
@@ -678,40 +1007,33 @@ class PipelineService:
             print(f"[Pipeline] Error: {error_msg}")
             raise Exception(f"Pipeline failed: {error_msg[:200]}")
 
-        # Check if output exists, otherwise look in output directory for pipeline-created folders
-        if not output_path.exists():
-            if self.output_dir.exists():
-                # Find folders matching this batch output name
-                output_filename = output_path.name
-                output_name_prefix = output_filename.rsplit('.', 1)[0]  # Remove .png extension
-                matching_folders = [
-                    f for f in self.output_dir.iterdir()
-                    if f.is_dir() and f.name.startswith(output_name_prefix)
-                ]
-
-                # Sort by modification time and get the most recent
-                if matching_folders:
-                    recent_folder = sorted(
-                        matching_folders,
-                        key=lambda x: x.stat().st_mtime,
-                        reverse=True
-                    )[0]
-
-                    print(f"[Pipeline] Looking for result in: {recent_folder}")
-
-                    # Look for final result image - specifically 5_result.png (the actual output)
-                    final_result = recent_folder / "5_result.png"
-                    if final_result.exists():
-                        print(f"[Pipeline] Copying result: {final_result} -> {output_path}")
-                        shutil.copy(final_result, output_path)
-                    else:
-                        # Pipeline didn't complete - don't return intermediate files as final result
-                        print(f"[Pipeline] ERROR: Final result (5_result.png) not found in {recent_folder}")
-                        print(f"[Pipeline] Available files: {list(recent_folder.glob('*.png'))}")
-                        # Don't copy prepaste or other intermediate files as the result
-                        raise Exception("Pipeline did not complete - final result not generated")
+        # Older pipeline builds don't print RESULT: - look for the run folder,
+        # which is created next to output_path (same shard directory only)
+        if result_file is None and not output_path.exists():
+            output_name_prefix = output_path.stem
+            matching_folders = [
+                f for f in output_path.parent.iterdir()
+                if f.is_dir() and f.name.startswith(output_name_prefix + "_")
+            ]
+            if matching_folders:
+                result_file = max(matching_folders, key=lambda x: x.name) / "5_result.png"
 
-        return output_path if output_path.exists() else None
+        if result_file is not None and not output_path.exists():
+            if result_file.exists():
+                print(f"[Pipeline] Copying result: {result_file} -> {output_path}")
+                shutil.copy(result_file, output_path)
+            else:
+                # Pipeline didn't complete - don't return intermediate files as final result
+                print(f"[Pipeline] ERROR: Final result not found: {result_file}")
+                raise Exception("Pipeline did not complete - final result not generated")
+
+        if output_path.exists():
+            file_index.register_result(
+                task_id, batch_id, output_index, output_path,
+                run_folder=result_file.parent if result_file is not None else None,
+            )
+            return output_path
+        return None
 
     async def _add_to_history_db(
         self,
@@ -740,20 +1062,14 @@ class PipelineService:
                 break
 
         if result_urls:
-            face_ext = ".png"
-            for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-                if (self.upload_dir / f"{face_image_id}{ext}").exists():
-                    face_ext = ext
-                    break
+            face_image_url = file_index.get_upload_url(face_image_id) or f"/uploads/{face_image_id}.png"
 
             reference_image_url = None
             if reference_image_id:
-                reference_ext = ".png"
-                for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-                    if (self.upload_dir / f"{reference_image_id}{ext}").exists():
-                        reference_ext = ext
-                        break
-                reference_image_url = f"/uploads/{reference_image_id}{reference_ext}"
+                reference_image_url = (
+                    file_index.get_upload_url(reference_image_id)
+                    or f"/uploads/{reference_image_id}.png"
+                )
 
             # Get generated prompt from tasks (if auto-generated by Gemini)
             generated_prompt = None
@@ -782,7 +1098,7 @@ class PipelineService:
 
             history_item = {
                 "title": final_title,
-                "face_image_url": f"/uploads/{face_image_id}{face_ext}",
+                "face_image_url": face_image_url,
                 "face_image_id": face_image_id,
                 "reference_image_url": reference_image_url,
                 "reference_image_id": reference_image_id,
@@ -820,8 +1136,8 @@ class PipelineService:
             await asyncio.sleep(0.1)
 
         from PIL import Image
-        output_filename = f"{task_id}_regen.png"
-        output_path = self.output_dir / output_filename
+        output_path = shard_dir(self.output_dir, task_id) / f"{task_id}_regen.png"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         img = Image.new("RGB", (512, 512), color=(100, 100, 150))
         img.save(output_path)
 
@@ -829,5 +1145,5 @@ class PipelineService:
             task_id,
             status=TaskStatus.COMPLETED,
             progress=100,
-            result_url=f"/outputs/{output_filename}",
+            result_url=to_url(output_path, self.output_dir, "/outputs"),
         )
@@ -0,0 +1,120 @@
+"""
+Upload-time face preprocessing
+Runs detection / InsightFace embedding / BiSeNet parsing on a CPU process pool
+right after upload, so generation can reuse the results (face_artifacts.py)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from models import WebSocketMessage
+from .websocket_manager import websocket_manager
+from core.config import settings
+
+# Paths
+PIPELINE_DIR = Path(__file__).parent.parent.parent.parent
+ARTIFACT_DIR = Path(__file__).parent.parent / "data" / "face_artifacts"
+
+# Upload statuses kept for polling (oldest finished ones are evicted first)
+PREPROCESS_STATUS_CACHE_SIZE = 1024
+
+# face_artifacts.py lives next to inpainting-pipeline.py
+if str(PIPELINE_DIR) not in sys.path:
+    sys.path.insert(0, str(PIPELINE_DIR))
+
+from face_artifacts import preprocess_face_image
+import ort_sessions
+
+
+class PreprocessService:
+    """Schedules face preprocessing off the request path and tracks its status"""
+
+    def __init__(self):
+        self.artifact_dir = ARTIFACT_DIR
+        if settings.PREPROCESS_ON_UPLOAD:
+            self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # file_id -> status dict ("pending" | "processing" | "ready" | "failed"), insertion ordered
+        self._status: "OrderedDict[str, dict]" = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Lazily start the worker pool (models are loaded once per worker)"""
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop / CUDA state of the server
+            workers = max(1, settings.PREPROCESS_WORKERS)
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                # Split cores between workers so their ONNX Runtime sessions don't oversubscribe
+                initializer=ort_sessions.configure_worker,
+                initargs=(max(1, (os.cpu_count() or 1) // workers),),
+            )
+        return self._executor
+
+    def get_status(self, file_id: str) -> Optional[dict]:
+        """Get preprocessing status for an uploaded file"""
+        return self._status.get(file_id)
+
+    def mark_pending(self, file_id: str):
+        self._set_status(file_id, {"status": "pending"})
+
+    def _set_status(self, file_id: str, status: dict):
+        """Record a status, evicting the oldest finished entries beyond PREPROCESS_STATUS_CACHE_SIZE"""
+        self._status[file_id] = status
+        self._status.move_to_end(file_id)
+        while len(self._status) > PREPROCESS_STATUS_CACHE_SIZE:
+            finished = next(
+                (key for key, value in self._status.items()
+                 if value.get("status") not in ("pending", "processing")),
+                None,
+            )
+            if finished is None:
+                self._status.popitem(last=False)
+            else:
+                del self._status[finished]
+
+    async def preprocess_upload(
+        self,
+        file_id: str,
+        filepath: Path,
+        client_id: Optional[str] = None,
+    ):
+        """Compute face artifacts for an upload and notify the client when done"""
+        self._set_status(file_id, {"status": "processing"})
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(),
+                preprocess_face_image,
+                str(filepath),
+                str(self.artifact_dir),
+            )
+        except Exception as e:
+            print(f"[Preprocess] Failed for {file_id}: {e}")
+            result = {"status": "failed", "error": str(e)}
+
+        self._set_status(file_id, result)
+        print(f"[Preprocess] {file_id}: {result.get('status')} ({result.get('elapsed', 0)}s)")
+
+        if client_id:
+            message = WebSocketMessage(
+                type="preprocess_complete",
+                data={"image_id": file_id, **result},
+            )
+            await websocket_manager.send_personal(message, client_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global preprocess service instance
+preprocess_service = PreprocessService()
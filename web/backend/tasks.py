@@ -11,6 +11,8 @@ from typing import Optional, Dict, Any
 from celery import current_task
 
 from celery_app import celery_app
+from core.config import settings
+from core.file_index import file_index, to_url
 
 # Paths - relative to backend directory
 BACKEND_DIR = Path(__file__).parent
@@ -18,16 +20,13 @@ PIPELINE_DIR = BACKEND_DIR.parent.parent
 PIPELINE_SCRIPT = PIPELINE_DIR / "inpainting-pipeline.py"
 OUTPUT_DIR = BACKEND_DIR / "outputs"
 UPLOAD_DIR = BACKEND_DIR / "uploads"
+ARTIFACT_DIR = BACKEND_DIR / "data" / "face_artifacts"  # Upload-time face preprocessing results
 VENV_PYTHON = PIPELINE_DIR / "venv" / "bin" / "python"  # Use venv Python for packages
 
 
 def find_image_path(base_dir: Path, image_id: str) -> Optional[Path]:
-    """Find image file with any supported extension"""
-    for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-        path = base_dir / f"{image_id}{ext}"
-        if path.exists():
-            return path
-    return None
+    """Find an uploaded image via the file index"""
+    return file_index.get_upload_path(image_id)
 
 
 @celery_app.task(bind=True, name='tasks.generate_image')
@@ -82,10 +81,8 @@ def generate_image(
                 'task_id': task_id,
             }
 
-        # Prepare output
-        OUTPUT_DIR.mkdir(exist_ok=True)
-        output_filename = f"{batch_id}_{output_index}.png"
-        output_path = OUTPUT_DIR / output_filename
+        # Prepare output (sharded: outputs/<h[:2]>/<h[2:4]>/{batch_id}_{index}.png)
+        output_path = file_index.output_path_for(batch_id, output_index)
 
         # Determine seed
         seed = params.get('seed', -1)
@@ -111,6 +108,31 @@ def generate_image(
             "--stop-at", str(params.get('stop_at', 1.0)),
         ]
 
+        # Few-step mode (LoRA fused at load; steps/guidance already carry the preset defaults)
+        if params.get('turbo'):
+            cmd.extend(["--turbo", params['turbo']])
+
+        # Deployment memory/speed profile (attention backend, VAE tiling, CPU offload)
+        if settings.PIPELINE_PROFILE != "default":
+            cmd.extend(["--profile", settings.PIPELINE_PROFILE])
+        if settings.PIPELINE_COMPILE_UNET:
+            cmd.append("--compile-unet")
+        if settings.PIPELINE_CPU_THREADS:
+            cmd.extend(["--cpu-threads", str(settings.PIPELINE_CPU_THREADS)])
+
+        # Convergence-based early stopping
+        if params.get('early_stop_threshold', 0.0) > 0:
+            cmd.extend(["--early-stop-threshold", str(params['early_stop_threshold'])])
+            cmd.extend(["--early-stop-patience", str(params.get('early_stop_patience', 2))])
+
+        # Guidance truncation (conditional-only tail steps)
+        if params.get('cfg_cutoff', 1.0) < 1.0:
+            cmd.extend(["--cfg-cutoff", str(params['cfg_cutoff'])])
+
+        # Cross-step UNet feature cache
+        if params.get('unet_cache_interval', 0) > 1:
+            cmd.extend(["--unet-cache-interval", str(params['unet_cache_interval'])])
+
         # Add prompt handling
         auto_prompt = params.get('auto_prompt', False)
         prompt = params.get('prompt', '')
@@ -143,6 +165,8 @@ def generate_image(
             cmd.append("--no-hair")
         if params.get('include_neck', False):
             cmd.append("--include-neck")
+        if params.get('crop_aware_parsing', False):
+            cmd.append("--crop-aware-parsing")
 
         # Pre-paste mode (소스 얼굴 미리 붙여넣기)
         if params.get('use_pre_paste', False):
@@ -165,6 +189,13 @@ def generate_image(
             cmd.append("--use-swap-refinement")
             cmd.extend(["--swap-refinement-strength", str(params.get('swap_refinement_strength', 0.3))])
 
+        # Debug artifact level (intermediates are written off the generation thread)
+        cmd.extend(["--artifact-level", params.get('artifact_level', 'result')])
+
+        # Reuse upload-time face artifacts when available
+        if settings.PREPROCESS_ON_UPLOAD and ARTIFACT_DIR.exists():
+            cmd.extend(["--face-artifacts-dir", str(ARTIFACT_DIR)])
+
         # Enable preview generation
         cmd.append("--save-preview")
 
@@ -200,6 +231,7 @@ def generate_image(
         total_steps = params.get('steps', 50)
         preview_url = None
         progress = 0  # Initialize progress
+        result_file = None
 
         # Process output in real-time
         for line in process.stdout:
@@ -209,6 +241,27 @@ def generate_image(
 
             print(f"[Celery Worker {task_id}] {line}")
 
+            # Final result path (run_folder/5_result.png)
+            if line.startswith("RESULT:"):
+                result_file = Path(line.replace("RESULT:", "").strip())
+                # Hand the result over before the pipeline finishes flushing debug artifacts
+                if result_file.exists():
+                    import shutil
+                    shutil.copy(result_file, output_path)
+                    preview_url = to_url(output_path, OUTPUT_DIR, "/outputs")
+                    self.update_state(
+                        state='PROCESSING',
+                        meta={
+                            'task_id': task_id,
+                            'progress': 99,
+                            'current_step': current_step,
+                            'total_steps': total_steps,
+                            'preview_url': preview_url,
+                            'message': 'Result ready, finalizing...',
+                        }
+                    )
+                continue
+
             # Parse preview image path
             if line.startswith("PREVIEW:"):
                 preview_abs_path = line.replace("PREVIEW:", "").strip()
@@ -283,63 +336,36 @@ def generate_image(
                 'task_id': task_id,
             }
 
-        # Check result - pipeline creates subfolder with timestamp
-        # Output structure: outputs/{batch_id}_{index}_{timestamp}/5_result.png
+        # Check result - pipeline creates subfolder with timestamp next to output_path
+        # Output structure: outputs/<shard>/{batch_id}_{index}_{timestamp}/5_result.png
         import shutil
 
-        # First check if direct output exists
+        # Older pipeline builds don't print RESULT: - check this item's shard directory only
+        if result_file is None and not output_path.exists():
+            matching_folders = [
+                f for f in output_path.parent.iterdir()
+                if f.is_dir() and f.name.startswith(output_path.stem + "_")
+            ]
+            if matching_folders:
+                result_file = max(matching_folders, key=lambda x: x.name) / "5_result.png"
+
+        if not output_path.exists() and result_file is not None and result_file.exists():
+            # Copy to expected location for consistent URL
+            shutil.copy(result_file, output_path)
+
         if output_path.exists():
-            result_url = f"/outputs/{output_filename}"
+            file_index.register_result(
+                task_id, batch_id, output_index, output_path,
+                run_folder=result_file.parent if result_file is not None else None,
+            )
             return {
                 'status': 'completed',
-                'result_url': result_url,
+                'result_url': to_url(output_path, OUTPUT_DIR, "/outputs"),
                 'task_id': task_id,
                 'generated_prompt': generated_prompt,
                 'current_step': current_step or total_steps,
             }
 
-        # Look for output in subfolder (pipeline creates: {base_name}_{timestamp}/)
-        output_base = output_path.stem  # e.g., "batch_id_1"
-        matching_folders = sorted(
-            [f for f in OUTPUT_DIR.iterdir() if f.is_dir() and f.name.startswith(output_base)],
-            key=lambda x: x.stat().st_mtime,
-            reverse=True
-        )
-
-        for folder in matching_folders[:1]:  # Check most recent matching folder
-            result_file = folder / "5_result.png"
-            if result_file.exists():
-                # Copy to expected location for consistent URL
-                shutil.copy(result_file, output_path)
-                result_url = f"/outputs/{output_filename}"
-                return {
-                    'status': 'completed',
-                    'result_url': result_url,
-                    'task_id': task_id,
-                    'generated_prompt': generated_prompt,
-                    'current_step': current_step or total_steps,
-                }
-
-        # Fallback: check any recent output folders
-        if OUTPUT_DIR.exists():
-            folders = sorted(
-                [f for f in OUTPUT_DIR.iterdir() if f.is_dir()],
-                key=lambda x: x.stat().st_mtime,
-                reverse=True
-            )
-            for folder in folders[:3]:
-                result_file = folder / "5_result.png"
-                if result_file.exists():
-                    shutil.copy(result_file, output_path)
-                    result_url = f"/outputs/{output_filename}"
-                    return {
-                        'status': 'completed',
-                        'result_url': result_url,
-                        'task_id': task_id,
-                        'generated_prompt': generated_prompt,
-                        'current_step': current_step or total_steps,
-                    }
-
         return {
             'status': 'failed',
             'error': 'No output file generated',
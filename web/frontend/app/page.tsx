@@ -306,14 +306,14 @@ function HomePageContent() {
         if (isLoggedIn()) {
           // Fetch from API for logged-in users
           const token = getAuthToken()
-          const response = await fetch('http://localhost:8008/api/history/?limit=20', {
+          const response = await fetch('http://localhost:8008/api/history/list?limit=20', {
             headers: {
               'Authorization': `Bearer ${token}`,
             },
           })
           if (response.ok) {
             const data = await response.json()
-            setHistoryList(data)
+            setHistoryList(data.items)
           } else if (response.status === 401) {
             // Token expired
             localStorage.removeItem('token')
@@ -11,7 +11,7 @@ interface HistoryItem {
   reference_image_url?: string
   reference_image_id?: string
   result_urls: string[]
-  params: any
+  params?: any  // absent on /history/list entries; loaded via GET /history/{id}
   count?: number
   parallel?: boolean
   created_at: string
@@ -25,6 +25,7 @@ interface HistoryModalProps {
 }
 
 const LOCAL_HISTORY_KEY = 'fastface_history'
+const HISTORY_PAGE_SIZE = 20
 
 function getLocalHistory(): HistoryItem[] {
   if (typeof window === 'undefined') return []
@@ -53,24 +54,34 @@ function isLoggedIn(): boolean {
 export function HistoryModal({ isOpen, onClose, onRestore }: HistoryModalProps) {
   const [history, setHistory] = useState<HistoryItem[]>([])
   const [loading, setLoading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [editingId, setEditingId] = useState<string | null>(null)
   const [editingTitle, setEditingTitle] = useState('')
   const editInputRef = useRef<HTMLInputElement>(null)
 
+  // One keyset page of slim list entries (cursor = next_cursor of the previous page)
+  const fetchPage = (cursor?: string | null) => {
+    const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) })
+    if (cursor) params.set('cursor', cursor)
+    return fetch(`http://localhost:8008/api/history/list?${params.toString()}`, {
+      headers: {
+        'Authorization': `Bearer ${getAuthToken()}`,
+      },
+    })
+  }
+
   const fetchHistory = async () => {
     setLoading(true)
+    setNextCursor(null)
     try {
       if (isLoggedIn()) {
         // Fetch from API for logged-in users
-        const token = getAuthToken()
-        const response = await fetch('http://localhost:8008/api/history/?limit=20', {
-          headers: {
-            'Authorization': `Bearer ${token}`,
-          },
-        })
+        const response = await fetchPage()
         if (response.ok) {
           const data = await response.json()
-          setHistory(data)
+          setHistory(data.items)
+          setNextCursor(data.next_cursor)
         } else if (response.status === 401) {
           // Token expired, fall back to local
           localStorage.removeItem('token')
@@ -90,6 +101,44 @@ export function HistoryModal({ isOpen, onClose, onRestore }: HistoryModalProps)
     }
   }
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const response = await fetchPage(nextCursor)
+      if (response.ok) {
+        const data = await response.json()
+        setHistory((prev) => [...prev, ...data.items])
+        setNextCursor(data.next_cursor)
+      }
+    } catch (error) {
+      console.error('Failed to load more history:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
+  // List entries are slim; restore needs params, so load the full item first
+  const openItem = async (item: HistoryItem, index: number) => {
+    let full = item
+    if (isLoggedIn() && !item.params) {
+      try {
+        const response = await fetch(`http://localhost:8008/api/history/${item.id}`, {
+          headers: {
+            'Authorization': `Bearer ${getAuthToken()}`,
+          },
+        })
+        if (response.ok) {
+          full = await response.json()
+        }
+      } catch (error) {
+        console.error('Failed to fetch history item:', error)
+      }
+    }
+    onRestore?.(full, index)
+    onClose()
+  }
+
   useEffect(() => {
     if (isOpen) {
       fetchHistory()
@@ -227,10 +276,7 @@ export function HistoryModal({ isOpen, onClose, onRestore }: HistoryModalProps)
                 <div
                   key={`${item.id}-${index}`}
                   className="bg-[#242424] rounded-[18px] border border-[rgba(255,255,255,0.05)] p-4 hover:border-[rgba(255,255,255,0.15)] transition-colors cursor-pointer"
-                  onClick={() => {
-                    onRestore?.(item, index)
-                    onClose()
-                  }}
+                  onClick={() => openItem(item, index)}
                 >
                   <div className="flex gap-4">
                     {/* Images */}
@@ -315,15 +361,21 @@ export function HistoryModal({ isOpen, onClose, onRestore }: HistoryModalProps)
                         <p className="text-xs text-[#666] mt-1">
                           {new Date(item.created_at).toLocaleString()}
                         </p>
-                        <p className="text-xs text-[#888] mt-1 truncate">
-                          {item.params.prompt || 'No prompt'}
-                        </p>
+                        {item.params && (
+                          <p className="text-xs text-[#888] mt-1 truncate">
+                            {item.params.prompt || 'No prompt'}
+                          </p>
+                        )}
                       </div>
                       <div className="flex gap-2 text-xs text-[#666]">
-                        <span>Steps: {item.params.actual_steps || item.params.steps}</span>
-                        <span>•</span>
-                        <span>CFG: {item.params.guidance_scale}</span>
-                        {item.count && <><span>•</span><span>Count: {item.count}</span></>}
+                        {item.params && (
+                          <>
+                            <span>Steps: {item.params.actual_steps || item.params.steps}</span>
+                            <span>•</span>
+                            <span>CFG: {item.params.guidance_scale}</span>
+                          </>
+                        )}
+                        {item.count && <>{item.params && <span>•</span>}<span>Count: {item.count}</span></>}
                       </div>
                     </div>
 
@@ -343,6 +395,15 @@ export function HistoryModal({ isOpen, onClose, onRestore }: HistoryModalProps)
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={(e) => { e.stopPropagation(); loadMore(); }}
+                  disabled={loadingMore}
+                  className="py-2 rounded-lg text-xs text-[#888] hover:text-white hover:bg-white/5 transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              )}
             </div>
           )}
         </div>
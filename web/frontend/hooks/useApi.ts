@@ -1,6 +1,7 @@
 'use client'
 
 import { useState, useCallback } from 'react'
+import type { HistoryPage } from '@/lib/types'
 
 const API_BASE = 'http://localhost:8008/api'
 
@@ -173,15 +174,19 @@ export function useHistory() {
 
   const getHistory = useCallback(async (options?: {
     limit?: number
-    offset?: number
+    cursor?: string | null
     favorites_only?: boolean
   }) => {
     const params = new URLSearchParams()
     if (options?.limit) params.set('limit', String(options.limit))
-    if (options?.offset) params.set('offset', String(options.offset))
+    if (options?.cursor) params.set('cursor', options.cursor)
     if (options?.favorites_only) params.set('favorites_only', 'true')
 
-    return request(`/history?${params.toString()}`)
+    return request<HistoryPage>(`/history/list?${params.toString()}`, { includeAuth: true })
+  }, [request])
+
+  const getHistoryItem = useCallback(async (itemId: string) => {
+    return request(`/history/${itemId}`, { includeAuth: true })
   }, [request])
 
   const toggleFavorite = useCallback(async (itemId: string) => {
@@ -201,6 +206,7 @@ export function useHistory() {
 
   return {
     getHistory,
+    getHistoryItem,
     toggleFavorite,
     deleteItem,
     updateTitle,
@@ -4,6 +4,7 @@ import type {
   HealthResponse,
   Task,
   HistoryItem,
+  HistoryPage,
   UserSettings,
   GenerationParams,
 } from './types'
@@ -104,8 +105,14 @@ class ApiClient {
   }
 
   // History
-  async getHistory(): Promise<HistoryItem[]> {
-    return this.request('/history')
+  async getHistory(cursor?: string | null, limit = 20): Promise<HistoryPage> {
+    const params = new URLSearchParams({ limit: String(limit) })
+    if (cursor) params.set('cursor', cursor)
+    return this.request(`/history/list?${params.toString()}`)
+  }
+
+  async getHistoryItem(id: string): Promise<HistoryItem> {
+    return this.request(`/history/${id}`)
   }
 
   async saveToHistory(item: Omit<HistoryItem, 'id' | 'createdAt'>): Promise<HistoryItem> {
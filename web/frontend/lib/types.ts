@@ -128,6 +128,23 @@ export interface HistoryItem {
   prompt: string
 }
 
+// Slim entry from GET /history/list (full detail via GET /history/{id})
+export interface HistoryListItem {
+  id: string
+  title?: string
+  face_image_url: string
+  reference_image_url?: string
+  result_urls: string[]
+  count?: number
+  created_at: string
+  is_favorite: boolean
+}
+
+export interface HistoryPage {
+  items: HistoryListItem[]
+  next_cursor: string | null
+}
+
 // Settings
 export interface UserSettings {
   defaultParams: Partial<GenerationParams>